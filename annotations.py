@@ -0,0 +1,225 @@
+# Standardbibliotheken
+import csv
+import json
+import os
+
+# Drittanbieter-Bibliotheken
+import numpy as np
+import vtkmodules.vtkRenderingFreeType  # Schriftdarstellung für die Labels  # noqa: F401
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkCommonCore import reference, vtkCommand, vtkPoints
+from vtkmodules.vtkCommonDataModel import vtkKdTreePointLocator, vtkPolyData
+from vtkmodules.vtkFiltersSources import vtkCubeSource
+from vtkmodules.vtkRenderingCore import (
+    vtkActor, vtkBillboardTextActor3D, vtkGlyph3DMapper, vtkPropCollection, vtkPropPicker)
+
+# Farben für die Regionen
+REGION_COLORS = [(1, 0, 0), (0, 1, 0), (0, 0, 1)]
+
+# Standard-Annotationen des Thorax-Datensatzes
+DEFAULT_ANNOTATION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thorax_annotations.json")
+
+# Kantenlänge der Marker und Versatz zum Text, damit die Ecke neben dem Label liegt
+MARKER_SIZE = 5.0
+MARKER_OFFSET = -7.0
+
+# Label-Culling: maximale Anzahl, Entfernung relativ zum Fokusabstand und Rastergröße in Pixeln
+MAX_VISIBLE_LABELS = 40
+LABEL_DISTANCE_FACTOR = 2.0
+LABEL_CELL_SIZE = 48
+
+# Suchradius beim Picken relativ zur Markergröße
+PICK_RADIUS_FACTOR = 1.5
+
+
+def load_annotations(filepath):
+    """Lädt Annotationen aus JSON (Liste oder {"annotations": [...]}) oder CSV (name, x, y, z, description)."""
+    if filepath.lower().endswith(".csv"):
+        with open(filepath, newline="", encoding="utf-8") as csv_file:
+            rows = list(csv.DictReader(csv_file))
+        entries = [{
+            "name": row.get("name") or f"Annotation {number}",
+            "position": (row["x"], row["y"], row["z"]),
+            "description": row.get("description", ""),
+            **({"category": row["category"]} if row.get("category") else {}),
+        } for number, row in enumerate(rows, start=1)]
+    else:
+        with open(filepath, encoding="utf-8") as json_file:
+            data = json.load(json_file)
+        entries = data["annotations"] if isinstance(data, dict) else data
+
+    annotations = []
+    for entry in entries:
+        annotation = dict(entry)
+        annotation["position"] = tuple(float(value) for value in entry["position"])
+        annotation.setdefault("description", "")
+        annotations.append(annotation)
+    return annotations
+
+
+DEFAULT_ANNOTATIONS = load_annotations(DEFAULT_ANNOTATION_FILE)
+
+
+class AnnotationLayer:
+    """Zeichnet beliebig viele Annotationen mit einem instanzierten Glyph-Mapper und wenigen Labels.
+
+    Die Marker aller Annotationen teilen sich einen Actor. Beschriftet werden nur die
+    nächstgelegenen Annotationen, höchstens eine pro Bildschirmzelle. Picking läuft über
+    einen k-d-Baum der Markerpositionen.
+    """
+
+    def __init__(self, renderer, region_colors=REGION_COLORS, marker_size=MARKER_SIZE,
+                 max_labels=MAX_VISIBLE_LABELS):
+        self.renderer = renderer
+        self.region_colors = region_colors
+        self.marker_size = marker_size
+        self.max_labels = max_labels
+        self.annotations = []
+        self.positions = np.zeros((0, 3))
+        self.visible = True
+        self.hovered = None  # Index der Annotation unter dem Mauszeiger
+        self._label_state = None
+        self._observer = None
+
+        # Ein Würfel als Glyph für alle Marker
+        cube_source = vtkCubeSource()
+        cube_source.SetXLength(marker_size)
+        cube_source.SetYLength(marker_size)
+        cube_source.SetZLength(marker_size)
+
+        self.points = vtkPolyData()
+        self.mapper = vtkGlyph3DMapper()
+        self.mapper.SetInputData(self.points)
+        self.mapper.SetSourceConnection(cube_source.GetOutputPort())
+        self.mapper.ScalingOff()
+        self.mapper.OrientOff()
+        self.mapper.SetScalarModeToUsePointFieldData()
+        self.mapper.SelectColorArray("Colors")
+        self.mapper.SetColorModeToDirectScalars()
+        self.marker_actor = vtkActor()
+        self.marker_actor.SetMapper(self.mapper)
+
+        # Hardware-Picking nur auf dem Marker-Actor, die Zuordnung erfolgt über den k-d-Baum
+        self.picker = vtkPropPicker()
+        self.pick_list = vtkPropCollection()
+        self.pick_list.AddItem(self.marker_actor)
+        self.locator = vtkKdTreePointLocator()
+
+        self.label_actors = []  # Wiederverwendeter Pool von Text-Actors
+
+    def attach(self):
+        self.renderer.AddActor(self.marker_actor)
+        self._observer = self.renderer.AddObserver(vtkCommand.StartEvent, self._on_render_start)
+
+    def detach(self):
+        if self._observer is not None:
+            self.renderer.RemoveObserver(self._observer)
+            self._observer = None
+        self.renderer.RemoveActor(self.marker_actor)
+        for actor in self.label_actors:
+            self.renderer.RemoveActor(actor)
+        self.label_actors = []
+
+    def set_annotations(self, annotations):
+        """Übernimmt eine (große) Liste von Annotationen; Geometrie und Index werden einmalig aufgebaut."""
+        self.annotations = list(annotations)
+        self.hovered = None
+        self.positions = np.array([annotation["position"] for annotation in self.annotations],
+                                  dtype=np.float64).reshape(-1, 3)
+
+        points = vtkPoints()
+        points.SetData(numpy_support.numpy_to_vtk(self.positions + MARKER_OFFSET, deep=True))
+        colors = np.array([annotation.get("color", self.region_colors[i % len(self.region_colors)])
+                           for i, annotation in enumerate(self.annotations)], dtype=np.float64).reshape(-1, 3)
+        color_array = numpy_support.numpy_to_vtk((colors * 255).round().astype(np.uint8), deep=True)
+        color_array.SetName("Colors")
+
+        self.points = vtkPolyData()
+        self.points.SetPoints(points)
+        self.points.GetPointData().AddArray(color_array)
+        self.mapper.SetInputData(self.points)
+
+        if self.annotations:
+            self.locator.SetDataSet(self.points)
+            self.locator.BuildLocator()
+        self._label_state = None  # Labels beim nächsten Bild neu auswählen
+
+    def set_visible(self, visible):
+        """Schaltet Marker und Labels mit einem Aufruf um."""
+        self.visible = visible
+        self.marker_actor.SetVisibility(visible)
+        for actor in self.label_actors:
+            actor.SetVisibility(False)
+        self._label_state = None
+
+    def pick(self, x, y):
+        """Liefert den Index der Annotation unter der Display-Position (x, y) oder None."""
+        if not self.annotations or not self.visible:
+            return None
+        if not self.picker.PickProp(x, y, self.renderer, self.pick_list):
+            return None
+        distance = reference(0.0)
+        index = self.locator.FindClosestPointWithinRadius(
+            self.marker_size * PICK_RADIUS_FACTOR, self.picker.GetPickPosition(), distance)
+        return index if index >= 0 else None
+
+    def set_hovered(self, index):
+        if index != self.hovered:
+            self.hovered = index
+            self._label_state = None
+
+    def _on_render_start(self, obj, event):
+        self.update_labels()
+
+    def update_labels(self):
+        """Wählt die zu beschriftenden Annotationen nach Entfernung und Bildschirmdichte aus."""
+        camera = self.renderer.GetActiveCamera()
+        size = self.renderer.GetSize()
+        state = (camera.GetMTime(), size, self.visible, self.hovered)
+        if state == self._label_state:
+            return
+        self._label_state = state
+
+        chosen = self._select_labels(camera, size) if self.visible and self.annotations else []
+        while len(self.label_actors) < len(chosen):
+            actor = vtkBillboardTextActor3D()
+            actor.GetTextProperty().SetColor(1, 1, 1)  # Weißer Text
+            actor.GetTextProperty().SetFontSize(12)
+            self.renderer.AddActor(actor)
+            self.label_actors.append(actor)
+        for actor, index in zip(self.label_actors, chosen):
+            actor.SetInput(self.annotations[index]["name"])
+            actor.SetPosition(self.annotations[index]["position"])
+            actor.SetVisibility(True)
+        for actor in self.label_actors[len(chosen):]:
+            actor.SetVisibility(False)
+
+    def _select_labels(self, camera, size):
+        width, height = size
+        if width <= 0 or height <= 0:
+            return []
+
+        # Entfernungs-Culling relativ zum Abstand Kamera-Fokuspunkt
+        distances = np.linalg.norm(self.positions - np.array(camera.GetPosition()), axis=1)
+        candidates = np.flatnonzero(distances <= LABEL_DISTANCE_FACTOR * camera.GetDistance())
+
+        # Projektion aller Kandidaten in einem Schritt
+        matrix = camera.GetCompositeProjectionTransformMatrix(self.renderer.GetTiledAspectRatio(), -1, 1)
+        matrix = np.array([[matrix.GetElement(row, column) for column in range(4)] for row in range(4)])
+        homogeneous = np.c_[self.positions[candidates], np.ones(len(candidates))] @ matrix.T
+        w = homogeneous[:, 3]
+        in_front = w > 1e-9
+        ndc = homogeneous[:, :3] / np.where(in_front, w, 1.0)[:, None]
+        on_screen = in_front & np.all(np.abs(ndc) <= 1.0, axis=1)
+        candidates, ndc = candidates[on_screen], ndc[on_screen]
+
+        # Nächste zuerst, höchstens ein Label pro Rasterzelle
+        order = np.argsort(distances[candidates])
+        candidates, ndc = candidates[order], ndc[order]
+        cells = np.floor((ndc[:, :2] + 1.0) * 0.5 * np.array([width, height]) / LABEL_CELL_SIZE).astype(np.int64)
+        _, first = np.unique(cells[:, 0] * (height // LABEL_CELL_SIZE + 2) + cells[:, 1], return_index=True)
+        chosen = candidates[np.sort(first)][:self.max_labels].tolist()
+
+        if self.hovered is not None and self.hovered not in chosen:
+            chosen = [self.hovered] + chosen[:self.max_labels - 1]  # Annotation unter der Maus immer beschriften
+        return chosen
@@ -0,0 +1,333 @@
+"""Headless-Batch-Renderer: erzeugt Standardansichten und Schnittbilder für viele Studien parallel.
+
+Beispiel:
+    python batch_render.py daten/*.vti --output thumbnails --views front side top --slices 0.25 0.5 0.75
+"""
+
+# Standardbibliotheken
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+# Drittanbieter-Bibliotheken
+import vtk
+
+# Projektmodule
+from annotations import DEFAULT_ANNOTATION_FILE, AnnotationLayer, load_annotations
+from transfer_functions import COLOR_MAP_NAMES, DEFAULT_WINDOW_PRESET, WINDOW_PRESET_NAMES, create_transfer_function
+from volume_cache import VolumeCache, load_cached_vti
+from volume_io import extract_voxel_data, load_vti_file
+
+# Blickrichtung (von der Kamera zum Fokuspunkt) und View-Up je Standardansicht
+VIEW_DIRECTIONS = {
+    "front": ((0, 1, 0), (0, 0, 1)),
+    "back": ((0, -1, 0), (0, 0, 1)),
+    "side": ((-1, 0, 0), (0, 0, 1)),
+    "top": ((0, 0, -1), (0, 1, 0)),
+}
+
+DEFAULT_VIEWS = ("front", "side", "top")
+DEFAULT_SLICES = (0.5,)
+DEFAULT_SIZE = (512, 512)
+
+# Nach so vielen Studien wird ein Worker neu gestartet, damit sich kein Speicher ansammelt
+TASKS_PER_WORKER = 25
+
+
+def _limit_memory(memory_limit_mb):
+    """Begrenzt den Adressraum eines Worker-Prozesses (nur auf POSIX-Systemen verfügbar)."""
+    if not memory_limit_mb:
+        return
+    try:
+        import resource
+    except ImportError:
+        return  # z. B. Windows: kein Limit möglich
+    limit = int(memory_limit_mb) * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def create_render_window(size):
+    """Erzeugt ein Offscreen-Renderfenster."""
+    render_window = vtk.vtkRenderWindow()
+    render_window.SetOffScreenRendering(1)
+    render_window.SetSize(*size)
+    return render_window
+
+
+def create_volume(image_data, color_map_name, window_preset=DEFAULT_WINDOW_PRESET):
+    """Baut den Volumen-Actor mit denselben Transferfunktionen wie die GUI."""
+    volume_mapper = vtk.vtkSmartVolumeMapper()
+    volume_mapper.SetInputData(image_data)
+
+    volume = vtk.vtkVolume()
+    volume.SetMapper(volume_mapper)
+    create_transfer_function(extract_voxel_data(image_data), color_map_name, window_preset).apply(volume.GetProperty())
+    return volume
+
+
+def set_camera_view(renderer, view):
+    """Richtet die Kamera auf eine Standardansicht des gesamten Volumens aus."""
+    direction, view_up = VIEW_DIRECTIONS[view]
+    camera = renderer.GetActiveCamera()
+    camera.SetFocalPoint(0, 0, 0)
+    camera.SetPosition(-direction[0], -direction[1], -direction[2])
+    camera.SetViewUp(view_up)
+    renderer.ResetCamera()
+
+
+def save_png(render_window, filepath):
+    """Liest das gerenderte Bild aus und schreibt es als PNG."""
+    window_to_image = vtk.vtkWindowToImageFilter()
+    window_to_image.SetInput(render_window)
+    window_to_image.ReadFrontBufferOff()
+    window_to_image.Update()
+
+    writer = vtk.vtkPNGWriter()
+    writer.SetFileName(filepath)
+    writer.SetInputConnection(window_to_image.GetOutputPort())
+    writer.Write()
+
+
+def create_slice(image_data, slice_number):
+    """Erzeugt eine axiale Schnittdarstellung mit Fensterung über den Wertebereich."""
+    slice_mapper = vtk.vtkImageSliceMapper()
+    slice_mapper.SetInputData(image_data)
+    slice_mapper.SetOrientationToZ()
+    slice_mapper.SetSliceNumber(slice_number)
+
+    image_slice = vtk.vtkImageSlice()
+    image_slice.SetMapper(slice_mapper)
+    low, high = image_data.GetScalarRange()
+    image_slice.GetProperty().SetColorWindow(max(high - low, 1.0))
+    image_slice.GetProperty().SetColorLevel((high + low) / 2.0)
+    return image_slice
+
+
+def render_study(job):
+    """Rendert alle Ansichten einer Studie (läuft in einem Worker-Prozess)."""
+    started = time.perf_counter()
+    record = {"input": job["input"], "status": "ok", "outputs": [], "timings": {}}
+    output_name = job.get("output_name") or os.path.splitext(os.path.basename(job["input"]))[0]
+    output_dir = os.path.join(job["output"], output_name)
+    os.makedirs(output_dir, exist_ok=True)
+
+    try:
+        load_started = time.perf_counter()
+        if job.get("cache_dir"):
+            image_data = load_cached_vti(job["input"], VolumeCache(job["cache_dir"]))
+        else:
+            image_data = load_vti_file(job["input"])
+        if image_data is None or image_data.GetPointData().GetScalars() is None:
+            raise IOError("Keine Bilddaten gefunden.")
+        record["timings"]["load"] = time.perf_counter() - load_started
+        record["dimensions"] = list(image_data.GetDimensions())
+
+        render_window = create_render_window(job["size"])
+
+        # 3D-Ansichten
+        renderer = vtk.vtkRenderer()
+        renderer.SetBackground(job["background"])
+        renderer.AddVolume(create_volume(image_data, job["color_map"], job.get("window", DEFAULT_WINDOW_PRESET)))
+        annotation_layer = None
+        if job["labels"]:
+            # Instanzierte Marker; die Labels werden vor jedem Bild pro Ansicht ausgewählt
+            annotation_layer = AnnotationLayer(renderer)
+            annotation_layer.set_annotations(load_annotations(job["annotations"]))
+            annotation_layer.attach()
+        render_window.AddRenderer(renderer)
+
+        for view in job["views"]:
+            view_started = time.perf_counter()
+            set_camera_view(renderer, view)
+            render_window.Render()
+            filepath = os.path.join(output_dir, f"{view}.png")
+            save_png(render_window, filepath)
+            record["timings"][view] = time.perf_counter() - view_started
+            record["outputs"].append(filepath)
+        if annotation_layer is not None:
+            annotation_layer.detach()
+        render_window.RemoveRenderer(renderer)
+
+        # Feste axiale Schnitte (Anteil der z-Ausdehnung)
+        extent = image_data.GetExtent()
+        slice_renderer = vtk.vtkRenderer()
+        slice_renderer.SetBackground(0, 0, 0)
+        render_window.AddRenderer(slice_renderer)
+        for fraction in job["slices"]:
+            slice_started = time.perf_counter()
+            slice_number = int(round(extent[4] + fraction * (extent[5] - extent[4])))
+            image_slice = create_slice(image_data, slice_number)
+            slice_renderer.AddViewProp(image_slice)
+            slice_renderer.GetActiveCamera().ParallelProjectionOn()
+            slice_renderer.ResetCamera()
+            render_window.Render()
+            filepath = os.path.join(output_dir, f"slice_z{slice_number:04d}.png")
+            save_png(render_window, filepath)
+            slice_renderer.RemoveViewProp(image_slice)
+            record["timings"][f"slice_z{slice_number}"] = time.perf_counter() - slice_started
+            record["outputs"].append(filepath)
+        render_window.Finalize()
+    except Exception as error:  # Eine defekte Studie soll den ganzen Lauf nicht abbrechen
+        record["status"] = "error"
+        record["error"] = f"{type(error).__name__}: {error}"
+
+    record["timings"]["total"] = time.perf_counter() - started
+    record["worker_pid"] = os.getpid()
+    return record
+
+
+def collect_inputs(paths):
+    """Expandiert Verzeichnisse und Glob-Muster zu einer sortierten Liste von .vti Dateien."""
+    inputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            inputs.extend(glob.glob(os.path.join(path, "*.vti")))
+        elif any(char in path for char in "*?["):
+            inputs.extend(glob.glob(path))
+        else:
+            inputs.append(path)
+    return sorted(set(inputs))
+
+
+def output_names(inputs):
+    """Eindeutiger Ausgabeordner je Studie: Pfad relativ zum gemeinsamen Eingabeverzeichnis, ohne Endung.
+
+    So landen p1/ct.vti und p2/ct.vti in p1/ct und p2/ct statt im selben Ordner.
+    """
+    try:
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in inputs])
+    except ValueError:  # Verschiedene Laufwerke: kurzer Hash des absoluten Pfads
+        return {path: f"{os.path.splitext(os.path.basename(path))[0]}_"
+                      f"{hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:8]}" for path in inputs}
+    return {path: os.path.splitext(os.path.relpath(os.path.abspath(path), root))[0] for path in inputs}
+
+
+def _create_pool(workers, memory_limit_mb):
+    # "spawn", da wiederverwendete Worker (max_tasks_per_child) nicht mit fork funktionieren
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_limit_memory, initargs=(memory_limit_mb,),
+                               max_tasks_per_child=TASKS_PER_WORKER)
+
+
+def _run_isolated(job, memory_limit_mb):
+    """Führt einen Job allein in einem eigenen Worker aus; stürzt er ab, liegt es an diesem Job."""
+    with _create_pool(1, memory_limit_mb) as pool:
+        try:
+            return pool.submit(render_study, job).result()
+        except BrokenProcessPool:
+            return {"input": job["input"], "status": "error", "outputs": [], "timings": {},
+                    "error": "Worker-Prozess abgestürzt (Speicherbudget überschritten?)"}
+
+
+def run_batch(jobs, workers, memory_limit_mb=None, progress=None):
+    """Verteilt die Jobs auf einen Prozess-Pool.
+
+    Es laufen höchstens so viele Jobs wie Worker gleichzeitig. Stürzt ein Worker ab, werden nur die
+    gerade laufenden Jobs einzeln in einem eigenen Worker wiederholt (der Absturz zählt so nur für den
+    verursachenden Job); die übrigen Jobs laufen ohne Fehlversuch in einem neuen Pool weiter.
+    """
+    records = []
+    queue = deque(jobs)
+
+    def finish(record):
+        records.append(record)
+        if progress is not None:
+            progress(record, len(records), len(jobs))
+
+    while queue:
+        suspects = []
+        with _create_pool(workers, memory_limit_mb) as pool:
+            running = {}
+            while (queue or running) and not suspects:
+                while queue and len(running) < workers:
+                    job = queue.popleft()
+                    running[pool.submit(render_study, job)] = job
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = running.pop(future)
+                    try:
+                        finish(future.result())
+                    except BrokenProcessPool:
+                        suspects.append(job)
+            # Mit dem Pool sind auch die übrigen laufenden Jobs abgebrochen
+            suspects.extend(running.values())
+        for job in suspects:
+            finish(_run_isolated(job, memory_limit_mb))
+    return records
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rendert Standardansichten vieler Volumen ohne GUI.")
+    parser.add_argument("inputs", nargs="+", help=".vti Dateien, Verzeichnisse oder Glob-Muster")
+    parser.add_argument("--output", default="batch_output", help="Ausgabeverzeichnis für PNGs und Manifest")
+    parser.add_argument("--views", nargs="*", default=list(DEFAULT_VIEWS), choices=sorted(VIEW_DIRECTIONS))
+    parser.add_argument("--slices", nargs="*", type=float, default=list(DEFAULT_SLICES),
+                        help="Axiale Schnitte als Anteil der z-Ausdehnung (0..1)")
+    parser.add_argument("--size", nargs=2, type=int, default=list(DEFAULT_SIZE), metavar=("BREITE", "HÖHE"))
+    parser.add_argument("--color-map", default="Standard", choices=COLOR_MAP_NAMES)
+    parser.add_argument("--window", default=DEFAULT_WINDOW_PRESET, choices=WINDOW_PRESET_NAMES,
+                        help="Fenster-Preset (aus dem Histogramm der Studie berechnet)")
+    parser.add_argument("--background", nargs=3, type=float, default=[0.0, 0.0, 0.0])
+    parser.add_argument("--no-labels", action="store_true", help="3D-Labels nicht einblenden")
+    parser.add_argument("--annotations", default=DEFAULT_ANNOTATION_FILE, help="Annotationen als JSON oder CSV")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Anzahl Worker-Prozesse")
+    parser.add_argument("--memory-limit-mb", type=int, default=None, help="Speicherbudget pro Worker")
+    parser.add_argument("--cache-dir", default=None, help="Volumen-Cache für wiederholte Läufe verwenden")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        print("Keine Eingabedateien gefunden.", file=sys.stderr)
+        return 1
+    os.makedirs(args.output, exist_ok=True)
+
+    names = output_names(inputs)
+    jobs = [{
+        "input": os.path.abspath(path),
+        "output": os.path.abspath(args.output),
+        "output_name": names[path],
+        "views": args.views,
+        "slices": [min(max(fraction, 0.0), 1.0) for fraction in args.slices],
+        "size": tuple(args.size),
+        "color_map": args.color_map,
+        "window": args.window,
+        "background": tuple(args.background),
+        "labels": not args.no_labels,
+        "annotations": os.path.abspath(args.annotations),
+        "cache_dir": args.cache_dir,
+    } for path in inputs]
+
+    def report(record, done, total):
+        print(f"[{done}/{total}] {record['status']:5s} {record['input']} ({record['timings'].get('total', 0):.2f} s)")
+
+    started = time.perf_counter()
+    records = run_batch(jobs, max(1, args.workers), args.memory_limit_mb, report)
+    manifest = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "workers": args.workers,
+        "memory_limit_mb": args.memory_limit_mb,
+        "total_seconds": time.perf_counter() - started,
+        "studies": sorted(records, key=lambda record: record["input"]),
+    }
+    with open(os.path.join(args.output, "manifest.json"), "w", encoding="utf-8") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+
+    failed = sum(1 for record in records if record["status"] != "ok")
+    print(f"{len(records) - failed} von {len(records)} Studien gerendert, Manifest in {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
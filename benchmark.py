@@ -0,0 +1,270 @@
+"""Reproduzierbare Benchmarks für Laden, Histogramm, ROI und Rendering auf synthetischen CT-Volumen.
+
+Beispiel:
+    python benchmark.py --sizes 128 256 --dtypes int16 float32 --output results.json
+    python benchmark.py --compare results.json   # Vergleich mit einem früheren Lauf
+"""
+
+# Standardbibliotheken
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+# Drittanbieter-Bibliotheken
+import numpy as np
+import vtk
+from vtk.util import numpy_support
+
+# Projektmodule
+from histogram import DEFAULT_BINS, compute_histogram_counts
+from roi_stats import RoiStatistics, bounds_to_index_box, voxel_volume_view
+from transfer_functions import create_transfer_function
+from volume_io import extract_voxel_data, load_vti_file
+
+DEFAULT_SIZES = (128, 256, 512)
+DEFAULT_DTYPES = ("int16", "float32")
+DEFAULT_REPEAT = 3
+DEFAULT_RENDER_FRAMES = 20
+RENDER_SIZE = (512, 512)
+SEED = 42
+
+# Ab dieser relativen Verlangsamung meldet --compare eine Regression
+REGRESSION_THRESHOLD = 0.10
+
+
+def make_synthetic_ct(size, dtype="int16", seed=SEED):
+    """Erzeugt ein CT-ähnliches Volumen in Hounsfield-Einheiten (Luft, Weichteil, Lunge, Knochen)."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size].astype(np.float32) / size - 0.5
+
+    # Querschnitt: elliptischer Körper mit Rippenring und Wirbelsäule
+    body = (x / 0.42) ** 2 + (y / 0.32) ** 2 < 1
+    ribs = body & ((x / 0.40) ** 2 + (y / 0.30) ** 2 > 0.85)
+    spine = (x / 0.05) ** 2 + ((y - 0.22) / 0.05) ** 2 < 1
+
+    volume = np.empty((size, size, size), dtype=dtype)
+    for z in range(size):
+        # Lungenflügel werden zur Mitte des Volumens größer
+        radius = 0.16 * np.sin(np.pi * (z + 0.5) / size) + 0.02
+        lungs = ((x + 0.17) ** 2 + y ** 2 < radius ** 2) | ((x - 0.17) ** 2 + y ** 2 < radius ** 2)
+
+        plane = np.full((size, size), -1000.0, dtype=np.float32)
+        plane[body] = 40.0
+        plane[lungs] = -850.0
+        plane[ribs | spine] = 700.0
+        plane += rng.normal(0.0, 20.0, plane.shape).astype(np.float32)
+        volume[z] = plane
+
+    return numpy_to_image_data(volume, spacing=(0.8, 0.8, 1.0))
+
+
+def numpy_to_image_data(volume, spacing=(1.0, 1.0, 1.0), origin=(0.0, 0.0, 0.0)):
+    """Verpackt ein (z, y, x)-Array als vtkImageData."""
+    scalars = numpy_support.numpy_to_vtk(volume.reshape(-1), deep=True)
+    scalars.SetName("scalars")
+    image_data = vtk.vtkImageData()
+    image_data.SetDimensions(volume.shape[2], volume.shape[1], volume.shape[0])
+    image_data.SetSpacing(spacing)
+    image_data.SetOrigin(origin)
+    image_data.GetPointData().SetScalars(scalars)
+    return image_data
+
+
+def write_vti(image_data, filepath):
+    """Schreibt ein Volumen zlib-komprimiert wie die Originaldaten."""
+    writer = vtk.vtkXMLImageDataWriter()
+    writer.SetFileName(filepath)
+    writer.SetInputData(image_data)
+    writer.SetCompressorTypeToZLib()
+    writer.Write()
+
+
+def peak_memory_mb():
+    """Bisheriger Spitzenverbrauch (RSS) des Prozesses in MB."""
+    try:
+        import resource
+    except ImportError:
+        return None  # z. B. Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # macOS: Bytes, Linux: KB
+
+
+def time_call(function, repeat):
+    """Führt eine Funktion mehrfach aus und liefert Zeiten und das letzte Ergebnis."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - started)
+    return {"min": min(times), "median": statistics.median(times), "runs": times}, result
+
+
+def roi_statistics(image_data, bounds, edges):
+    """ROI-Statistik wie in VisualizationApp.calculate_roi_histogram (ohne Zwischenspeicher pro Schicht)."""
+    box = bounds_to_index_box(bounds, image_data.GetOrigin(), image_data.GetSpacing(), image_data.GetExtent())
+    return RoiStatistics(voxel_volume_view(image_data), edges, image_data.GetSpacing()).compute(box)
+
+
+def measure_render(image_data, frames):
+    """Misst die Bildzeiten des Volumen-Mappers in einem Offscreen-Fenster."""
+    volume_mapper = vtk.vtkSmartVolumeMapper()
+    volume_mapper.SetInputData(image_data)
+    volume = vtk.vtkVolume()
+    volume.SetMapper(volume_mapper)
+    create_transfer_function(voxel_volume_view(image_data)).apply(volume.GetProperty())
+
+    renderer = vtk.vtkRenderer()
+    renderer.AddVolume(volume)
+    render_window = vtk.vtkRenderWindow()
+    render_window.SetOffScreenRendering(1)
+    render_window.SetSize(*RENDER_SIZE)
+    render_window.AddRenderer(renderer)
+    renderer.ResetCamera()
+
+    # Das erste Bild enthält den Upload der Daten und wird getrennt ausgewiesen
+    started = time.perf_counter()
+    render_window.Render()
+    first_frame = time.perf_counter() - started
+
+    frame_times = []
+    for _ in range(frames):
+        renderer.GetActiveCamera().Azimuth(360.0 / frames)
+        started = time.perf_counter()
+        render_window.Render()
+        frame_times.append(time.perf_counter() - started)
+    render_window.Finalize()
+
+    frame_times.sort()
+    return {
+        "first_frame": first_frame,
+        "median": statistics.median(frame_times),
+        "p95": frame_times[min(len(frame_times) - 1, int(0.95 * len(frame_times)))],
+        "fps": 1.0 / statistics.median(frame_times),
+    }
+
+
+def run_case(size, dtype, repeat, frames, render):
+    """Führt alle Messungen für eine Volumengröße und einen Datentyp aus (in einem eigenen Prozess)."""
+    case = {"size": size, "dtype": dtype, "timings": {}, "peak_memory_mb": {}}
+
+    started = time.perf_counter()
+    image_data = make_synthetic_ct(size, dtype)
+    case["timings"]["generate"] = time.perf_counter() - started
+    case["peak_memory_mb"]["generate"] = peak_memory_mb()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        filepath = os.path.join(temp_dir, f"synthetic_{size}_{dtype}.vti")
+        write_vti(image_data, filepath)
+        case["file_size_mb"] = os.path.getsize(filepath) / (1024 * 1024)
+        del image_data
+
+        case["timings"]["load_vti_file"], image_data = time_call(lambda: load_vti_file(filepath), repeat)
+        case["peak_memory_mb"]["load_vti_file"] = peak_memory_mb()
+
+    case["timings"]["extract_voxel_data"], voxels = time_call(lambda: extract_voxel_data(image_data), repeat)
+
+    case["timings"]["calculate_histogram"], histogram = time_call(
+        lambda: compute_histogram_counts(voxels, DEFAULT_BINS), repeat)
+    case["peak_memory_mb"]["calculate_histogram"] = peak_memory_mb()
+
+    # Zentrale ROI mit halber Kantenlänge in Weltkoordinaten
+    bounds = image_data.GetBounds()
+    roi_bounds = [bounds[2 * axis + side] + (0.25 if side == 0 else -0.25) * (bounds[2 * axis + 1] - bounds[2 * axis])
+                  for axis in range(3) for side in (0, 1)]
+    case["timings"]["calculate_roi_histogram"], _ = time_call(
+        lambda: roi_statistics(image_data, roi_bounds, histogram.edges), repeat)
+    case["peak_memory_mb"]["calculate_roi_histogram"] = peak_memory_mb()
+
+    if render:
+        case["render"] = measure_render(image_data, frames)
+        case["peak_memory_mb"]["render"] = peak_memory_mb()
+    return case
+
+
+def environment_info():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "vtk": vtk.vtkVersion.GetVTKVersion(),
+    }
+
+
+def compare(results, baseline):
+    """Vergleicht die Median-Zeiten zweier Läufe und gibt Regressionen aus."""
+    reference = {(case["size"], case["dtype"]): case for case in baseline["cases"]}
+    regressions = 0
+    for case in results["cases"]:
+        base = reference.get((case["size"], case["dtype"]))
+        if base is None:
+            continue
+        metrics = {name: timing["median"] for name, timing in case["timings"].items() if isinstance(timing, dict)}
+        base_metrics = {name: timing["median"] for name, timing in base["timings"].items() if isinstance(timing, dict)}
+        if "render" in case and "render" in base:
+            metrics["render_frame"] = case["render"]["median"]
+            base_metrics["render_frame"] = base["render"]["median"]
+        for name, value in metrics.items():
+            if name not in base_metrics or base_metrics[name] <= 0:
+                continue
+            change = value / base_metrics[name] - 1.0
+            flag = "REGRESSION" if change > REGRESSION_THRESHOLD else ""
+            regressions += bool(flag)
+            print(f"{case['size']:4d}³ {case['dtype']:8s} {name:24s} {base_metrics[name]:9.4f}s -> {value:9.4f}s "
+                  f"({change:+6.1%}) {flag}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark für Laden, Histogramm, ROI und Rendering.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES))
+    parser.add_argument("--dtypes", nargs="+", default=list(DEFAULT_DTYPES))
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--frames", type=int, default=DEFAULT_RENDER_FRAMES)
+    parser.add_argument("--no-render", action="store_true", help="Rendering-Messung überspringen")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", default=None, help="Früheres Ergebnis zum Vergleich")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment_info(),
+        "settings": {"repeat": args.repeat, "frames": args.frames, "seed": SEED, "render_size": RENDER_SIZE},
+        "cases": [],
+    }
+
+    for size in args.sizes:
+        for dtype in args.dtypes:
+            # Jeder Fall in einem frischen Prozess, damit die Spitzenwerte des Speichers vergleichbar sind
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                case = pool.submit(run_case, size, dtype, args.repeat, args.frames, not args.no_render).result()
+            results["cases"].append(case)
+            summary = ", ".join(f"{name} {timing['median']:.3f}s" for name, timing in case["timings"].items()
+                                if isinstance(timing, dict))
+            print(f"{size}³ {dtype}: {summary}")
+
+    with open(args.output, "w", encoding="utf-8") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"Ergebnisse in {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            return 1 if compare(results, json.load(baseline_file)) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,412 @@
+"""Out-of-Core-Volumenformat: das Volumen wird in Bricks fester Größe mit Min/Max-Metadaten zerlegt.
+
+Beispiel:
+    python bricks.py scan.vti scan.bricks --brick-size 64
+"""
+
+# Standardbibliotheken
+import argparse
+import json
+import operator
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+# Drittanbieter-Bibliotheken
+import numpy as np
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkCommonDataModel import vtkImageData
+from vtkmodules.vtkCommonExecutionModel import vtkStreamingDemandDrivenPipeline
+from vtkmodules.vtkIOXML import vtkXMLImageDataReader
+
+# Projektmodule
+from histogram import DEFAULT_BINS, Histogram, compute_histogram_counts
+from lod import DEFAULT_FACTORS
+
+# Kantenlänge eines Bricks in Voxeln
+DEFAULT_BRICK_SIZE = 64
+
+# Größe des Brick-Caches (über THORAX_BRICK_CACHE_MB änderbar)
+DEFAULT_BRICK_CACHE_BYTES = int(os.environ.get("THORAX_BRICK_CACHE_MB", 1024)) * 1024 * 1024
+
+META_FILE = "meta.json"
+FORMAT_VERSION = 1
+
+
+def is_bricked_volume(path):
+    """Prüft, ob ein Pfad ein Brick-Verzeichnis oder dessen meta.json ist."""
+    if os.path.basename(path) == META_FILE:
+        return os.path.isfile(path)
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+
+class BrickCache:
+    """Threadsicherer LRU-Cache für gelesene Bricks mit Obergrenze in Bytes."""
+
+    def __init__(self, max_bytes=DEFAULT_BRICK_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            brick = self._entries.get(key)
+            if brick is not None:
+                self._entries.move_to_end(key)
+            return brick
+
+    def put(self, key, brick):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous.nbytes
+            self._entries[key] = brick
+            self.current_bytes += brick.nbytes
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+class BrickedLevel:
+    """Eine Auflösungsstufe, die sich wie ein (z, y, x)-Array indizieren lässt und nur benötigte Bricks liest."""
+
+    ndim = 3
+
+    def __init__(self, directory, metadata, level, cache):
+        self.directory = directory
+        self.cache = cache
+        self.factor = level["factor"]
+        self.shape = tuple(level["shape"])
+        self.dtype = np.dtype(metadata["dtype"])
+        self.brick_size = metadata["brick_size"]
+        self.spacing = tuple(value * self.factor for value in metadata["spacing"])
+        self.origin = tuple(metadata["origin"])
+        self.name = metadata["name"]
+        self.path = os.path.join(directory, level["file"])
+        self.bricks = {tuple(brick["index"]): brick for brick in level["bricks"]}
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self):
+        return self.size * self.dtype.itemsize
+
+    def value_range(self):
+        """Wertebereich aus den Brick-Metadaten, ohne Voxel zu lesen."""
+        return (min(brick["min"] for brick in self.bricks.values()),
+                max(brick["max"] for brick in self.bricks.values()))
+
+    def read_brick(self, index, use_cache=True):
+        """Liest einen Brick als (z, y, x)-Array, bevorzugt aus dem Cache."""
+        key = (self.path, index)
+        brick = self.cache.get(key) if use_cache else None
+        if brick is None:
+            entry = self.bricks[index]
+            shape = tuple(entry["shape"])
+            brick = np.fromfile(self.path, dtype=self.dtype, count=int(np.prod(shape)),
+                                offset=entry["offset"]).reshape(shape)
+            if use_cache:
+                self.cache.put(key, brick)
+        return brick
+
+    def read_box(self, z_range, y_range, x_range):
+        """Setzt einen Quader [start, stop) je Achse aus den überlappenden Bricks zusammen."""
+        ranges = (z_range, y_range, x_range)
+        out = np.empty(tuple(stop - start for start, stop in ranges), dtype=self.dtype)
+        if out.size == 0:
+            return out
+        size = self.brick_size
+        first = [start // size for start, _ in ranges]
+        last = [(stop - 1) // size for _, stop in ranges]
+        for bz in range(first[0], last[0] + 1):
+            for by in range(first[1], last[1] + 1):
+                for bx in range(first[2], last[2] + 1):
+                    brick = self.read_brick((bz, by, bx))
+                    source, target = [], []
+                    for axis, block in enumerate((bz, by, bx)):
+                        start, stop = ranges[axis]
+                        low = max(start, block * size)
+                        high = min(stop, block * size + brick.shape[axis])
+                        source.append(slice(low - block * size, high - block * size))
+                        target.append(slice(low - start, high - start))
+                    out[tuple(target)] = brick[tuple(source)]
+        return out
+
+    def __getitem__(self, key):
+        """Unterstützt Ganzzahlen und Slices mit positiver Schrittweite, z. B. level[k, j0:j1, i0:i1]."""
+        key = key if isinstance(key, tuple) else (key,)
+        if len(key) > 3:
+            raise IndexError("Zu viele Indizes für ein Volumen.")
+        key = key + (slice(None),) * (3 - len(key))
+
+        ranges, steps, squeeze = [], [], []
+        for axis, item in enumerate(key):
+            size = self.shape[axis]
+            if isinstance(item, slice):
+                start, stop, step = item.indices(size)
+                if step < 1:
+                    raise IndexError("Nur positive Schrittweiten werden unterstützt.")
+                ranges.append((start, max(start, stop)))
+                steps.append(step)
+            else:
+                index = operator.index(item)
+                if index < 0:
+                    index += size
+                if not 0 <= index < size:
+                    raise IndexError(f"Index {item} außerhalb der Achse {axis} mit Länge {size}.")
+                ranges.append((index, index + 1))
+                steps.append(1)
+                squeeze.append(axis)
+
+        out = self.read_box(*ranges)
+        if any(step != 1 for step in steps):
+            out = out[tuple(slice(None, None, step) for step in steps)]
+        return out.squeeze(axis=tuple(squeeze)) if squeeze else out
+
+    def histogram(self, bins=DEFAULT_BINS, value_range=None, progress_callback=None):
+        """Streamt die Bricks einzeln durch das Histogramm; konstante Bricks werden nicht gelesen."""
+        if value_range is None:
+            value_range = self.value_range()
+        low, high = float(value_range[0]), float(value_range[1])
+        if high <= low:
+            high = low + 1.0
+        counts = np.zeros(bins, dtype=np.int64)
+        edges = np.linspace(low, high, bins + 1)
+
+        for done, (index, entry) in enumerate(self.bricks.items(), start=1):
+            if entry["min"] == entry["max"]:
+                # Nur ein Wert im Brick: Anzahl direkt aus den Metadaten
+                if low <= entry["min"] <= high:
+                    bin_index = min(int((entry["min"] - low) * bins / (high - low)), bins - 1)
+                    counts[bin_index] += int(np.prod(entry["shape"]))
+            else:
+                # Am Cache vorbei, damit der Durchlauf den Arbeitssatz nicht verdrängt
+                counts += compute_histogram_counts(self.read_brick(index, use_cache=False), bins, (low, high)).counts
+            if progress_callback is not None:
+                progress_callback(done / len(self.bricks))
+        return Histogram(counts, edges)
+
+    def to_image_data(self):
+        """Liest die gesamte Stufe als vtkImageData (nur für Stufen, die in den Speicher passen)."""
+        array = self[:, :, :]
+        scalars = numpy_support.numpy_to_vtk(array.reshape(-1), deep=True)
+        scalars.SetName(self.name)
+        image_data = vtkImageData()
+        image_data.SetDimensions(self.shape[2], self.shape[1], self.shape[0])
+        image_data.SetSpacing(self.spacing)
+        image_data.SetOrigin(self.origin)
+        image_data.GetPointData().SetScalars(scalars)
+        return image_data
+
+
+class BrickedVolume:
+    """Brick-Volumen auf der Festplatte; Indizierung wirkt auf die volle Auflösung."""
+
+    ndim = 3
+
+    def __init__(self, path, cache=None):
+        self.directory = os.path.dirname(path) if os.path.basename(path) == META_FILE else path
+        with open(os.path.join(self.directory, META_FILE), encoding="utf-8") as meta_file:
+            self.metadata = json.load(meta_file)
+        if self.metadata.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Nicht unterstütztes Brick-Format: {self.metadata.get('version')}")
+        self.cache = cache if cache is not None else BrickCache()
+        self.levels = [BrickedLevel(self.directory, self.metadata, level, self.cache)
+                       for level in self.metadata["levels"]]
+
+    @property
+    def shape(self):
+        return self.levels[0].shape
+
+    @property
+    def dtype(self):
+        return self.levels[0].dtype
+
+    @property
+    def spacing(self):
+        return self.levels[0].spacing
+
+    @property
+    def origin(self):
+        return self.levels[0].origin
+
+    def __getitem__(self, key):
+        return self.levels[0][key]
+
+    def level(self, factor):
+        for level in self.levels:
+            if level.factor == factor:
+                return level
+        raise KeyError(factor)
+
+    def level_for_voxels(self, max_voxels):
+        """Feinste Stufe mit höchstens max_voxels Voxeln (sonst die gröbste)."""
+        for level in self.levels:
+            if level.size <= max_voxels:
+                return level
+        return self.levels[-1]
+
+    def histogram(self, bins=DEFAULT_BINS, progress_callback=None):
+        """Histogramm der vollen Auflösung, einmalig berechnet und neben den Bricks gespeichert."""
+        path = os.path.join(self.directory, f"histogram{bins}.npz")
+        try:
+            with np.load(path) as data:
+                return Histogram(data["counts"], data["edges"])
+        except (OSError, KeyError, ValueError):
+            pass
+        histogram = self.levels[0].histogram(bins, progress_callback=progress_callback)
+        try:
+            temp_path = f"{path}.tmp-{os.getpid()}.npz"
+            np.savez(temp_path, counts=histogram.counts, edges=histogram.edges)
+            os.replace(temp_path, path)
+        except OSError:
+            pass  # Schreibgeschütztes Verzeichnis: beim nächsten Mal erneut berechnen
+        return histogram
+
+
+def _write_level(directory, factor, shape, dtype, brick_size, read_block, progress_callback=None):
+    """Schreibt eine Stufe Brick für Brick; read_block(z0, z1, y0, y1, x0, x1) liefert die Quelldaten."""
+    filename = f"level{factor}.bin"
+    path = os.path.join(directory, filename)
+    temp_path = f"{path}.tmp-{os.getpid()}"
+    bricks = []
+    offset = 0
+    nz, ny, nx = shape
+    with open(temp_path, "wb") as level_file:
+        for z0 in range(0, nz, brick_size):
+            for y0 in range(0, ny, brick_size):
+                for x0 in range(0, nx, brick_size):
+                    brick = np.ascontiguousarray(read_block(
+                        z0, min(z0 + brick_size, nz), y0, min(y0 + brick_size, ny), x0, min(x0 + brick_size, nx)),
+                        dtype=dtype)
+                    brick.tofile(level_file)
+                    bricks.append({
+                        "index": [z0 // brick_size, y0 // brick_size, x0 // brick_size],
+                        "offset": offset,
+                        "shape": list(brick.shape),
+                        "min": brick.min().item(),
+                        "max": brick.max().item(),
+                    })
+                    offset += brick.nbytes
+            if progress_callback is not None:
+                progress_callback(min(1.0, (z0 + brick_size) / nz))
+    os.replace(temp_path, path)
+    return {"factor": factor, "shape": list(shape), "file": filename, "bricks": bricks}
+
+
+def _downsample(block, step, dtype):
+    """Mittelt step³-Blöcke wie vtkImageShrink3D mit Averaging (Reste am Rand entfallen)."""
+    nz, ny, nx = (size // step for size in block.shape)
+    block = block[:nz * step, :ny * step, :nx * step]
+    mean = block.reshape(nz, step, ny, step, nx, step).mean(axis=(1, 3, 5))
+    return mean.astype(dtype)
+
+
+def write_bricked_volume(directory, shape, dtype, read_block, spacing=(1.0, 1.0, 1.0), origin=(0.0, 0.0, 0.0),
+                         name="scalars", brick_size=DEFAULT_BRICK_SIZE, factors=DEFAULT_FACTORS,
+                         progress_callback=None):
+    """Schreibt ein Volumen samt gröberer Stufen, ohne es je vollständig im Speicher zu halten."""
+    os.makedirs(directory, exist_ok=True)
+    dtype = np.dtype(dtype)
+    stages = 1 + len(factors)
+    report = (lambda stage: (lambda fraction: progress_callback((stage + fraction) / stages))
+              if progress_callback is not None else None)
+
+    levels = [_write_level(directory, 1, tuple(shape), dtype, brick_size, read_block, report(0))]
+    metadata = {
+        "version": FORMAT_VERSION,
+        "dtype": dtype.str,
+        "brick_size": brick_size,
+        "spacing": list(spacing),
+        "origin": list(origin),
+        "name": name,
+        "levels": levels,
+    }
+
+    # Jede Stufe wird aus der vorherigen gemittelt, nicht erneut aus dem Originalvolumen
+    for stage, factor in enumerate(factors, start=1):
+        previous = BrickedLevel(directory, metadata, levels[-1], BrickCache())
+        step = max(1, factor // previous.factor)
+        level_shape = tuple(size // step for size in previous.shape)
+        if min(level_shape) < 1:
+            break
+        read_previous = lambda z0, z1, y0, y1, x0, x1, previous=previous, step=step: _downsample(
+            previous.read_box((z0 * step, z1 * step), (y0 * step, y1 * step), (x0 * step, x1 * step)), step, dtype)
+        levels.append(_write_level(directory, factor, level_shape, dtype, brick_size, read_previous, report(stage)))
+
+    metadata["scalar_range"] = [min(brick["min"] for brick in levels[0]["bricks"]),
+                                max(brick["max"] for brick in levels[0]["bricks"])]
+    meta_path = os.path.join(directory, META_FILE)
+    with open(f"{meta_path}.tmp", "w", encoding="utf-8") as meta_file:
+        json.dump(metadata, meta_file)
+    os.replace(f"{meta_path}.tmp", meta_path)
+    return BrickedVolume(directory)
+
+
+def write_bricks_from_array(array, directory, spacing=(1.0, 1.0, 1.0), origin=(0.0, 0.0, 0.0), **kwargs):
+    """Zerlegt ein (z, y, x)-Array oder eine Memory-Map in Bricks."""
+    read_block = lambda z0, z1, y0, y1, x0, x1: array[z0:z1, y0:y1, x0:x1]
+    return write_bricked_volume(directory, array.shape, array.dtype, read_block, spacing, origin, **kwargs)
+
+
+def convert_vti_to_bricks(filepath, directory, brick_size=DEFAULT_BRICK_SIZE, factors=DEFAULT_FACTORS,
+                          progress_callback=None):
+    """Konvertiert eine .vti Datei scheibenweise; es liegt nie mehr als eine Brick-Schicht im Speicher."""
+    reader = vtkXMLImageDataReader()
+    reader.SetFileName(filepath)
+    reader.UpdateInformation()
+    extent = reader.GetOutputInformation(0).Get(vtkStreamingDemandDrivenPipeline.WHOLE_EXTENT())
+    shape = (extent[5] - extent[4] + 1, extent[3] - extent[2] + 1, extent[1] - extent[0] + 1)
+
+    slab = {"range": None, "array": None}
+
+    def read_block(z0, z1, y0, y1, x0, x1):
+        # Der Reader dekodiert nur die angeforderte z-Schicht der Datei
+        if slab["range"] != (z0, z1):
+            reader.UpdateExtent((extent[0], extent[1], extent[2], extent[3], extent[4] + z0, extent[4] + z1 - 1))
+            output = reader.GetOutput()
+            scalars = numpy_support.vtk_to_numpy(output.GetPointData().GetScalars())
+            slab["range"] = (z0, z1)
+            slab["array"] = scalars.reshape(z1 - z0, shape[1], shape[2], -1)[..., 0]
+            slab["name"] = output.GetPointData().GetScalars().GetName() or "scalars"
+        return slab["array"][:, y0:y1, x0:x1]
+
+    # Die erste Schicht liefert Datentyp, Name und Geometrie und wird danach weiterverwendet
+    dtype = read_block(0, min(brick_size, shape[0]), 0, shape[1], 0, shape[2]).dtype
+    output = reader.GetOutput()
+    spacing = output.GetSpacing()
+    # Weltposition des ersten Voxels, damit die Brick-Indizes bei 0 beginnen
+    origin = tuple(output.GetOrigin()[axis] + extent[2 * axis] * spacing[axis] for axis in range(3))
+    return write_bricked_volume(directory, shape, dtype, read_block, spacing, origin, slab["name"],
+                                brick_size=brick_size, factors=factors, progress_callback=progress_callback)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Konvertiert eine .vti Datei in das Brick-Format.")
+    parser.add_argument("input", help=".vti Quelldatei")
+    parser.add_argument("output", help="Zielverzeichnis, z. B. scan.bricks")
+    parser.add_argument("--brick-size", type=int, default=DEFAULT_BRICK_SIZE)
+    parser.add_argument("--factors", nargs="*", type=int, default=list(DEFAULT_FACTORS),
+                        help="Verkleinerungsfaktoren der gröberen Stufen")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = lambda fraction: print(f"\r{fraction:6.1%}", end="", flush=True)
+    volume = convert_vti_to_bricks(args.input, args.output, args.brick_size, tuple(args.factors), report)
+    print(f"\n{len(volume.levels)} Stufen, {len(volume.levels[0].bricks)} Bricks in {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,295 @@
+"""Import von DICOM-Serien in den Volumen-Cache.
+
+Die Schichten einer Serie werden parallel dekodiert und direkt in ein vorab angelegtes,
+gemapptes Cache-Array geschrieben (ohne Zwischenkopie). Weitere Ladevorgänge lesen nur noch
+die Binärdatei aus dem Cache. Benötigt pydicom; komprimierte Transfer-Syntaxen zusätzlich
+ein passendes Dekoder-Plugin (z. B. pylibjpeg).
+
+Beispiel:
+    python dicom_ingest.py scans/patient_01 --workers 8
+"""
+
+# Standardbibliotheken
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Drittanbieter-Bibliotheken
+import numpy as np
+
+# Projektmodule
+from bricks import is_bricked_volume
+from instrumentation import tracer
+from volume_cache import DEFAULT_CACHE_DIR, VolumeCache, hash_array, wrap_as_image_data
+
+# Anzahl paralleler Dekodier-Threads (Dateizugriffe und NumPy-Operationen geben den GIL frei)
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Kennung "DICM" nach der 128 Byte langen Präambel
+DICOM_PREAMBLE_SIZE = 128
+DICOM_MAGIC = b"DICM"
+
+# Anzahl der Dateien, die is_dicom_series höchstens auf die Kennung prüft
+PROBE_FILE_COUNT = 8
+
+# Für die Sortierung und Geometrie benötigte Header-Felder (Pixeldaten werden dabei nicht gelesen)
+HEADER_TAGS = [
+    "SeriesInstanceUID", "SeriesDescription", "Rows", "Columns", "PixelSpacing", "SliceThickness",
+    "ImagePositionPatient", "ImageOrientationPatient", "SliceLocation", "InstanceNumber",
+    "BitsStored", "PixelRepresentation", "RescaleSlope", "RescaleIntercept", "NumberOfFrames",
+]
+
+# Header einer Schicht; position ist die Lage entlang der Schichtnormalen
+DicomSlice = namedtuple("DicomSlice", ["path", "position", "origin", "slope", "intercept"])
+
+# Eine Serie mit nach Position sortierten Schichten; spacing und origin in (x, y, z)
+DicomSeries = namedtuple("DicomSeries", ["uid", "description", "slices", "rows", "columns", "spacing", "origin",
+                                         "dtype"])
+
+
+def require_pydicom():
+    """Importiert das optionale pydicom erst beim ersten DICOM-Import (der Import kostet Startzeit)."""
+    try:
+        import pydicom
+    except ImportError:
+        raise ImportError("Für den DICOM-Import wird pydicom benötigt (pip install pydicom).") from None
+    return pydicom
+
+
+def _has_dicom_magic(path):
+    try:
+        with open(path, "rb") as dicom_file:
+            dicom_file.seek(DICOM_PREAMBLE_SIZE)
+            return dicom_file.read(len(DICOM_MAGIC)) == DICOM_MAGIC
+    except OSError:
+        return False
+
+
+def is_dicom_series(path):
+    """Prüft, ob ein Verzeichnis DICOM-Dateien enthält (anhand der Kennung, ohne pydicom)."""
+    if not os.path.isdir(path) or is_bricked_volume(path):
+        return False
+    probed = 0
+    for entry in os.scandir(path):
+        if not entry.is_file():
+            continue
+        if _has_dicom_magic(entry.path):
+            return True
+        probed += 1
+        if probed >= PROBE_FILE_COUNT:
+            break
+    return False
+
+
+def _read_header(path):
+    """Liest die Header-Felder einer Datei oder None, wenn es keine DICOM-Bilddatei ist."""
+    pydicom = require_pydicom()
+    try:
+        dataset = pydicom.dcmread(path, stop_before_pixels=True, specific_tags=HEADER_TAGS)
+    except (pydicom.errors.InvalidDicomError, OSError):
+        return None
+    if "Rows" not in dataset or "SeriesInstanceUID" not in dataset:
+        return None  # z. B. DICOMDIR oder Strukturbefunde
+    return dataset
+
+
+def _slice_normal(dataset):
+    orientation = dataset.get("ImageOrientationPatient")
+    if orientation is None or len(orientation) != 6:
+        return np.array([0.0, 0.0, 1.0])
+    row, column = np.array(orientation[:3], float), np.array(orientation[3:], float)
+    return np.cross(row, column)
+
+
+def _make_slice(path, dataset, normal):
+    """Bestimmt die Lage einer Schicht entlang der Normalen (Ersatzweise SliceLocation bzw. InstanceNumber)."""
+    if "ImagePositionPatient" in dataset:
+        origin = tuple(float(value) for value in dataset.ImagePositionPatient)
+        position = float(np.dot(origin, normal))
+    elif "SliceLocation" in dataset:
+        position = float(dataset.SliceLocation)
+        origin = (0.0, 0.0, position)
+    else:
+        position = float(dataset.get("InstanceNumber", 0)) * float(dataset.get("SliceThickness", 1.0))
+        origin = (0.0, 0.0, position)
+    return DicomSlice(path, position, origin, float(dataset.get("RescaleSlope", 1.0)),
+                      float(dataset.get("RescaleIntercept", 0.0)))
+
+
+def _series_dtype(first, slices):
+    """int16, wenn die skalierten Werte ganzzahlig sind und hineinpassen (typisch für CT), sonst float32."""
+    bits = int(first.get("BitsStored", 16))
+    signed = int(first.get("PixelRepresentation", 0)) == 1
+    stored = (-(1 << (bits - 1)), (1 << (bits - 1)) - 1) if signed else (0, (1 << bits) - 1)
+    info = np.iinfo(np.int16)
+    for dicom_slice in slices:
+        if not (dicom_slice.slope.is_integer() and dicom_slice.intercept.is_integer()):
+            return np.dtype(np.float32)
+        values = [dicom_slice.intercept + dicom_slice.slope * value for value in stored]
+        if min(values) < info.min or max(values) > info.max:
+            return np.dtype(np.float32)
+    return np.dtype(np.int16)
+
+
+def _build_series(uid, entries):
+    """Sortiert die Schichten einer Serie nach Position und leitet Spacing und Ursprung ab."""
+    first = entries[0][1]
+    if int(first.get("NumberOfFrames", 1)) > 1:
+        raise IOError("Mehrbild-DICOM (Enhanced CT/MR) wird nicht unterstützt.")
+    normal = _slice_normal(first)
+    slices = sorted((_make_slice(path, dataset, normal) for path, dataset in entries),
+                    key=lambda dicom_slice: dicom_slice.position)
+    rows, columns = int(first.Rows), int(first.Columns)
+    if any(int(dataset.Rows) != rows or int(dataset.Columns) != columns for _, dataset in entries):
+        raise IOError(f"Schichten der Serie {uid} haben unterschiedliche Bildgrößen.")
+
+    positions = np.array([dicom_slice.position for dicom_slice in slices])
+    gaps = np.diff(positions)
+    if len(gaps) and np.min(gaps) <= 0:
+        raise IOError(f"Serie {uid} enthält mehrere Schichten an derselben Position.")
+    slice_spacing = float(np.median(gaps)) if len(gaps) else float(first.get("SliceThickness", 1.0))
+    row_spacing, column_spacing = (float(value) for value in first.get("PixelSpacing", (1.0, 1.0)))
+    return DicomSeries(uid, str(first.get("SeriesDescription", "")), slices, rows, columns,
+                       (column_spacing, row_spacing, slice_spacing), slices[0].origin,
+                       _series_dtype(first, slices))
+
+
+def discover_series(directory, workers=DEFAULT_WORKERS):
+    """Findet die Serien eines Verzeichnisses (rekursiv); die Serie mit den meisten Schichten zuerst."""
+    require_pydicom()
+    paths = [os.path.join(root, name) for root, _, names in os.walk(directory) for name in sorted(names)]
+    with tracer.span("discover_dicom_series", "load", files=len(paths)):
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            headers = list(executor.map(_read_header, paths))
+
+    grouped = {}
+    for path, dataset in zip(paths, headers):
+        if dataset is not None:
+            grouped.setdefault(str(dataset.SeriesInstanceUID), []).append((path, dataset))
+    series = [_build_series(uid, entries) for uid, entries in grouped.items()]
+    return sorted(series, key=lambda item: len(item.slices), reverse=True)
+
+
+def series_key(series):
+    """Cache-Schlüssel aus Serien-UID sowie Pfad, Größe und Änderungszeit jeder Schicht."""
+    digest = hashlib.sha1(series.uid.encode("utf-8"))
+    for dicom_slice in series.slices:
+        stat = os.stat(dicom_slice.path)
+        digest.update(f"|{os.path.abspath(dicom_slice.path)}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _decode_slice(dicom_slice, out):
+    """Dekodiert eine Schicht und schreibt die skalierten Werte direkt in die Zielschicht des Volumens."""
+    pixels = require_pydicom().dcmread(dicom_slice.path).pixel_array
+    if pixels.shape != out.shape:
+        raise IOError(f"Unerwartete Bildgröße {pixels.shape} in {dicom_slice.path}.")
+    if dicom_slice.slope == 1.0 and dicom_slice.intercept == 0.0:
+        np.copyto(out, pixels, casting="unsafe")
+    else:
+        np.multiply(pixels, dicom_slice.slope, out=out, casting="unsafe")
+        np.add(out, dicom_slice.intercept, out=out, casting="unsafe")
+
+
+def decode_series(series, out, progress_callback=None, abort_callback=None, workers=DEFAULT_WORKERS):
+    """Dekodiert alle Schichten parallel in das Array out mit Form (Schichten, Zeilen, Spalten).
+
+    Liefert False, wenn der Vorgang über abort_callback abgebrochen wurde.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_decode_slice, dicom_slice, out[index])
+                   for index, dicom_slice in enumerate(series.slices)]
+        for done, future in enumerate(futures, 1):
+            if abort_callback is not None and abort_callback():
+                for pending in futures:
+                    pending.cancel()
+                return False
+            future.result()  # Reicht Dekodierfehler weiter
+            if progress_callback is not None:
+                progress_callback(done / len(futures))
+    return True
+
+
+def ingest_series(series, cache=None, progress_callback=None, abort_callback=None, workers=DEFAULT_WORKERS):
+    """Dekodiert eine Serie als vtkImageData; mit Cache direkt in die gemappte Binärdatei.
+
+    Liefert None, wenn der Vorgang abgebrochen wurde.
+    """
+    require_pydicom()
+    shape = (len(series.slices), series.rows, series.columns)
+    with tracer.span("decode_dicom_series", "load", slices=len(series.slices), workers=workers):
+        if cache is None:
+            array = np.empty(shape, dtype=series.dtype)
+            if not decode_series(series, array, progress_callback, abort_callback, workers):
+                return None
+            return wrap_as_image_data(array.reshape(-1), {
+                "name": "ImageScalars",
+                "extent": [0, series.columns - 1, 0, series.rows - 1, 0, len(series.slices) - 1],
+                "spacing": series.spacing,
+                "origin": series.origin,
+                "content_hash": hash_array(array),
+            })
+
+        key = series_key(series)
+        array = cache.allocate(key, shape, series.dtype)
+        image_data = None
+        try:
+            if decode_series(series, array, progress_callback, abort_callback, workers):
+                source = os.path.dirname(os.path.abspath(series.slices[0].path))
+                image_data = cache.commit(key, array, series.spacing, series.origin, "ImageScalars", source)
+        finally:
+            del array  # Schreibbare Map schließen; gerendert wird aus der Copy-on-write-Map des Caches
+            if image_data is None:  # Abgebrochen oder fehlgeschlagen
+                cache.discard(key)
+        return image_data
+
+
+def load_dicom_series(directory, cache=None, progress_callback=None, abort_callback=None, workers=DEFAULT_WORKERS):
+    """Lädt die größte Serie eines Verzeichnisses, aus dem Cache oder durch Dekodieren.
+
+    Liefert (vtkImageData, Cache-Schlüssel); ohne Cache ist der Schlüssel None.
+    """
+    series_list = discover_series(directory, workers)
+    if not series_list:
+        raise IOError(f"Keine DICOM-Bilddateien in {directory} gefunden.")
+    series = series_list[0]
+    key = series_key(series) if cache is not None else None
+    if key is not None:
+        image_data = cache.load(key)
+        if image_data is not None:
+            if progress_callback is not None:
+                progress_callback(1.0)
+            return image_data, key
+    return ingest_series(series, cache, progress_callback, abort_callback, workers), key
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Importiert eine DICOM-Serie in den Volumen-Cache")
+    parser.add_argument("input", help="Verzeichnis mit den DICOM-Dateien einer Serie")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Verzeichnis des Volumen-Caches")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Anzahl Dekodier-Threads")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    started = time.perf_counter()
+    image_data, key = load_dicom_series(args.input, VolumeCache(args.cache_dir), workers=args.workers)
+    print(json.dumps({
+        "key": key,
+        "dimensions": list(image_data.GetDimensions()),
+        "spacing": list(image_data.GetSpacing()),
+        "origin": list(image_data.GetOrigin()),
+        "scalar_range": list(image_data.GetScalarRange()),
+        "seconds": time.perf_counter() - started,
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
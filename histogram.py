@@ -0,0 +1,91 @@
+# Standardbibliotheken
+from collections import namedtuple
+
+# Drittanbieter-Bibliotheken
+import numpy as np
+
+# Standardanzahl der Bins (entspricht dem bisherigen ax.hist(..., bins=256))
+DEFAULT_BINS = 256
+
+# Anzahl Voxel pro Block, damit nie eine Kopie des ganzen Volumens entsteht
+CHUNK_SIZE = 1 << 22
+
+# Ergebnis einer Histogrammberechnung: Häufigkeiten und Bin-Grenzen
+Histogram = namedtuple("Histogram", ["counts", "edges"])
+
+
+def compute_histogram_counts(voxels, bins=DEFAULT_BINS, value_range=None, progress_callback=None):
+    """Berechnet die Bin-Häufigkeiten blockweise und vektorisiert mit np.bincount."""
+    values = np.asarray(voxels).reshape(-1)  # View, keine Kopie bei zusammenhängenden Daten
+
+    if value_range is None:
+        value_range = (float(values.min()), float(values.max())) if values.size else (0.0, 1.0)
+    low, high = float(value_range[0]), float(value_range[1])
+    if high <= low:
+        high = low + 1.0
+
+    edges = np.linspace(low, high, bins + 1)
+    counts = np.zeros(bins, dtype=np.int64)
+    scale = bins / (high - low)
+
+    for start in range(0, values.size, CHUNK_SIZE):
+        chunk = values[start:start + CHUNK_SIZE]
+        # Werte außerhalb des Bereichs werden wie bei np.histogram ignoriert
+        chunk = chunk[(chunk >= low) & (chunk <= high)]
+        indices = ((chunk.astype(np.float64) - low) * scale).astype(np.int64)
+        np.clip(indices, 0, bins - 1, out=indices)  # Maximalwert gehört in den letzten Bin
+        counts += np.bincount(indices, minlength=bins)
+        if progress_callback is not None:
+            progress_callback(min(1.0, (start + CHUNK_SIZE) / values.size))
+
+    return Histogram(counts, edges)
+
+
+def volume_key(image_data):
+    """Liefert einen Schlüssel, der ein vtkImageData-Objekt in seinem aktuellen Zustand identifiziert."""
+    return (image_data.GetAddressAsString("vtkImageData"), image_data.GetMTime())
+
+
+class HistogramCache:
+    """Hält berechnete Histogramme pro Volumen und Bin-Konfiguration vor."""
+
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, key, voxels, bins=DEFAULT_BINS, value_range=None):
+        """Gibt das gecachte Histogramm zurück oder berechnet es einmalig."""
+        cache_key = (key, bins, value_range)
+        if cache_key not in self._entries:
+            self._entries[cache_key] = compute_histogram_counts(voxels, bins, value_range)
+        return self._entries[cache_key]
+
+    def put(self, key, histogram, bins=DEFAULT_BINS, value_range=None):
+        """Legt ein bereits berechnetes Histogramm (z. B. aus dem Ladeprozess) im Cache ab."""
+        self._entries[(key, bins, value_range)] = histogram
+
+    def invalidate(self, key):
+        """Entfernt alle Einträge eines Volumens aus dem Cache."""
+        self._entries = {k: v for k, v in self._entries.items() if k[0] != key}
+
+    def clear(self):
+        self._entries.clear()
+
+
+def histogram_percentiles(histogram, percentiles):
+    """Schätzt Perzentile aus den Bin-Häufigkeiten (lineare Interpolation innerhalb der Bins)."""
+    cumulative = np.cumsum(histogram.counts)
+    total = cumulative[-1] if cumulative.size else 0
+    if total == 0:
+        return {q: float("nan") for q in percentiles}
+
+    result = {}
+    for q in percentiles:
+        target = q / 100.0 * total
+        index = int(np.searchsorted(cumulative, target, side="left"))
+        index = min(index, len(histogram.counts) - 1)
+        before = cumulative[index - 1] if index > 0 else 0
+        in_bin = histogram.counts[index]
+        fraction = (target - before) / in_bin if in_bin else 0.0
+        low, high = histogram.edges[index], histogram.edges[index + 1]
+        result[q] = float(low + fraction * (high - low))
+    return result
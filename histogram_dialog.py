@@ -0,0 +1,113 @@
+"""Histogramm-Dialog und ROI-Panel. Matplotlib wird erst mit diesem Modul geladen (beim ersten Öffnen)."""
+
+# Drittanbieter-Bibliotheken
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from PyQt5.QtWidgets import QDialog, QDockWidget, QHBoxLayout, QLabel, QRadioButton, QVBoxLayout, QWidget
+from PyQt5.QtCore import Qt
+
+
+class HistogramDialog(QDialog):
+    def __init__(self, all_histogram, roi_histogram=None):
+        super().__init__()
+        self.setWindowTitle("Histogramm")
+        self.setGeometry(100, 100, 800, 600)
+
+        # Es werden nur die vorberechneten Bin-Häufigkeiten übergeben, keine Rohvoxel
+        self.all_histogram = all_histogram
+        self.roi_histogram = roi_histogram
+
+        self.figure, self.ax = plt.subplots(figsize=(10, 6))
+        self.canvas = FigureCanvas(self.figure)
+
+        # Radiobuttons für Hintergrundfarbe
+        self.bg_white_radio = QRadioButton("Weiß")
+        self.bg_black_radio = QRadioButton("Schwarz")
+        self.bg_white_radio.setChecked(True)  # Standardmäßig Weiß
+        bg_layout = QHBoxLayout()
+        bg_layout.addWidget(QLabel("Hintergrund:"))
+        bg_layout.addWidget(self.bg_white_radio)
+        bg_layout.addWidget(self.bg_black_radio)
+
+        # Histogramm zeichnen (mit initialem weißen Hintergrund)
+        self.update_histogram()
+
+        layout = QVBoxLayout()
+        layout.addLayout(bg_layout)  # Radiobuttons zum Layout hinzufügen
+        layout.addWidget(self.canvas)
+        self.setLayout(layout)
+
+        # Die Radiobuttons sind exklusiv, ein Signal reicht für das Umschalten
+        self.bg_white_radio.toggled.connect(self.update_histogram)
+
+    def update_histogram(self):
+        """Aktualisiert das Histogramm mit der ausgewählten Hintergrundfarbe."""
+        bg_color = 'white' if self.bg_white_radio.isChecked() else 'black'
+        fg_color = 'white' if bg_color == 'black' else 'black'
+        self.figure.set_facecolor(bg_color)
+        self.ax.cla() #Vorheriges Histogramm löschen
+        self.ax.set_facecolor(bg_color)
+
+        # Vorberechnete Häufigkeiten als Treppenfunktion zeichnen statt neu zu binnen
+        self.ax.stairs(self.all_histogram.counts, self.all_histogram.edges, fill=True, color='blue', alpha=0.5, label="Gesamt")
+        if self.roi_histogram is not None:
+            self.ax.stairs(self.roi_histogram.counts, self.roi_histogram.edges, fill=True, color='red', alpha=0.7, label="ROI")
+
+        self.ax.set_title("Histogramm der Intensitätswerte", color=fg_color)
+        self.ax.set_xlabel("Intensitätswert", color=fg_color)
+        self.ax.set_ylabel("Häufigkeit", color=fg_color)
+        self.ax.tick_params(axis='x', colors=fg_color)
+        self.ax.tick_params(axis='y', colors=fg_color)
+        for spine in self.ax.spines.values():
+            spine.set_color(fg_color)
+        self.ax.grid(True, color=('grey' if bg_color == 'black' else 'lightgrey'))
+        self.ax.legend(labelcolor=fg_color)
+        self.canvas.draw()
+
+class RoiStatsPanel(QDockWidget):
+    """Nicht-modales Panel mit live aktualisierter ROI-Statistik und Histogramm."""
+
+    def __init__(self, parent=None):
+        super().__init__("ROI-Statistik", parent)
+        container = QWidget()
+        layout = QVBoxLayout(container)
+
+        self.stats_label = QLabel("Keine ROI ausgewählt")
+        self.stats_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        layout.addWidget(self.stats_label)
+
+        self.figure, self.ax = plt.subplots(figsize=(4, 3))
+        self.canvas = FigureCanvas(self.figure)
+        layout.addWidget(self.canvas)
+        self.ax.set_xlabel("Intensitätswert")
+        self.ax.set_ylabel("Häufigkeit")
+        self.roi_stairs = None
+
+        self.setWidget(container)
+
+    def show_stats(self, stats):
+        """Aktualisiert Kennwerte und Histogramm; das Diagramm wird nur neu befüllt, nicht neu aufgebaut."""
+        percentiles = ", ".join(f"P{q}: {value:.1f}" for q, value in stats.percentiles.items())
+        self.stats_label.setText(
+            f"Voxel: {stats.count}  ({stats.volume_mm3 / 1000:.1f} ml)\n"
+            f"Mittelwert: {stats.mean:.1f}  Std: {stats.std:.1f}\n"
+            f"Min: {stats.min:.1f}  Max: {stats.max:.1f}\n"
+            f"{percentiles}"
+        )
+        counts, edges = stats.histogram
+        if self.roi_stairs is None:
+            self.roi_stairs = self.ax.stairs(counts, edges, fill=True, color='red', alpha=0.7, label="ROI")
+        else:
+            self.roi_stairs.set_data(counts, edges)
+        self.ax.relim()
+        self.ax.set_ylim(0, max(1, counts.max()) * 1.05)
+        self.ax.set_xlim(edges[0], edges[-1])
+        self.canvas.draw_idle()
+
+    def show_empty(self):
+        """Zeigt eine leere ROI an; das Histogramm der vorherigen ROI wird entfernt."""
+        self.stats_label.setText("Die ROI enthält keine Voxel.")
+        if self.roi_stairs is not None:
+            self.roi_stairs.remove()  # Achsen und Beschriftungen bleiben erhalten
+            self.roi_stairs = None
+        self.canvas.draw_idle()
@@ -0,0 +1,176 @@
+# Standardbibliotheken
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# Drittanbieter-Bibliotheken
+import vtkmodules.vtkRenderingFreeType  # Schriftdarstellung für das Text-Overlay  # noqa: F401
+from vtkmodules.vtkCommonCore import vtkCommand
+from vtkmodules.vtkRenderingCore import vtkTextActor
+
+# Maximale Anzahl gespeicherter Ereignisse (ältere werden verworfen)
+MAX_EVENTS = 100000
+
+# Anzahl der Bilder, über die FPS und Latenz gemittelt werden
+FRAME_WINDOW = 30
+
+
+class Tracer:
+    """Sammelt Zeitspannen der Hot Paths und exportiert sie als JSON oder Chrome-Trace."""
+
+    def __init__(self, max_events=MAX_EVENTS):
+        self.events = deque(maxlen=max_events)  # append ist threadsicher
+        self.enabled = True
+        self.origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, category="app", **args):
+        """Misst die Dauer des umschlossenen Blocks."""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, started, time.perf_counter() - started, category, args)
+
+    def record(self, name, started, duration, category="app", args=None):
+        """Speichert ein Ereignis mit Startzeitpunkt (perf_counter) und Dauer in Sekunden."""
+        if self.enabled:
+            self.events.append({
+                "name": name,
+                "category": category,
+                "start": started - self.origin,
+                "duration": duration,
+                "thread": threading.get_ident(),
+                "args": args or {},
+            })
+
+    def summary(self):
+        """Fasst die Ereignisse pro Name zusammen (Anzahl, Summe, Mittel, Maximum in Sekunden)."""
+        result = {}
+        for event in list(self.events):
+            entry = result.setdefault(event["name"], {"count": 0, "total": 0.0, "max": 0.0})
+            entry["count"] += 1
+            entry["total"] += event["duration"]
+            entry["max"] = max(entry["max"], event["duration"])
+        for entry in result.values():
+            entry["mean"] = entry["total"] / entry["count"]
+        return result
+
+    def export_json(self, filepath):
+        """Schreibt alle Ereignisse und eine Zusammenfassung als JSON."""
+        with open(filepath, "w", encoding="utf-8") as trace_file:
+            json.dump({"events": list(self.events), "summary": self.summary()}, trace_file, indent=2)
+
+    def export_chrome_trace(self, filepath):
+        """Schreibt die Ereignisse im Chrome-Trace-Format (chrome://tracing, Perfetto)."""
+        pid = os.getpid()
+        trace_events = [{
+            "name": event["name"],
+            "cat": event["category"],
+            "ph": "X",  # Vollständiges Ereignis mit Dauer
+            "ts": event["start"] * 1e6,
+            "dur": event["duration"] * 1e6,
+            "pid": pid,
+            "tid": event["thread"],
+            "args": event["args"],
+        } for event in list(self.events)]
+        with open(filepath, "w", encoding="utf-8") as trace_file:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, trace_file)
+
+    def clear(self):
+        self.events.clear()
+        self.origin = time.perf_counter()
+
+
+# Gemeinsamer Tracer der Anwendung
+tracer = Tracer()
+
+
+def report_startup(marks, trace=tracer, stream=sys.stderr):
+    """Gibt die Startphasen aus einer Liste von (Name, perf_counter) aus und trägt sie im Trace ein.
+
+    Jede Phase reicht von der vorherigen bis zu ihrer eigenen Marke; geliefert werden die Dauern in Sekunden.
+    """
+    phases = OrderedDict()
+    for (_, previous), (name, current) in zip(marks, marks[1:]):
+        phases[name] = current - previous
+        trace.record(name, previous, current - previous, "startup")
+    total = marks[-1][1] - marks[0][1] if marks else 0.0
+    if stream is not None:
+        for name, duration in phases.items():
+            print(f"{name:<16} {duration * 1000:8.1f} ms", file=stream)
+        print(f"{'gesamt':<16} {total * 1000:8.1f} ms", file=stream)
+    return phases
+
+
+class FrameMonitor:
+    """Misst jedes Bild eines Renderfensters über Start-/EndEvent und blendet FPS und Latenz ein."""
+
+    def __init__(self, render_window, renderer, trace=tracer):
+        self.render_window = render_window
+        self.renderer = renderer
+        self.tracer = trace
+        self.frame_starts = deque(maxlen=FRAME_WINDOW)
+        self.frame_durations = deque(maxlen=FRAME_WINDOW)
+        self._frame_started = None
+        self._observers = []
+
+        # Text-Overlay in der linken unteren Ecke
+        self.overlay = vtkTextActor()
+        self.overlay.GetTextProperty().SetFontSize(14)
+        self.overlay.GetTextProperty().SetColor(1, 1, 0)
+        self.overlay.SetDisplayPosition(10, 10)
+        self.overlay.SetVisibility(False)
+        self.renderer.AddViewProp(self.overlay)
+
+    def attach(self):
+        self._observers = [
+            self.render_window.AddObserver(vtkCommand.StartEvent, self._on_start),
+            self.render_window.AddObserver(vtkCommand.EndEvent, self._on_end),
+        ]
+
+    def detach(self):
+        for tag in self._observers:
+            self.render_window.RemoveObserver(tag)
+        self._observers = []
+        self.renderer.RemoveViewProp(self.overlay)
+
+    def overlay_visible(self):
+        return bool(self.overlay.GetVisibility())
+
+    def set_overlay_visible(self, visible):
+        self.overlay.SetVisibility(visible)
+
+    def fps(self):
+        """Bildrate über die letzten Bilder (Abstand der Bildanfänge)."""
+        if len(self.frame_starts) < 2:
+            return 0.0
+        elapsed = self.frame_starts[-1] - self.frame_starts[0]
+        return (len(self.frame_starts) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def latency(self):
+        """Mittlere Renderdauer eines Bildes in Sekunden."""
+        return sum(self.frame_durations) / len(self.frame_durations) if self.frame_durations else 0.0
+
+    def _on_start(self, obj, event):
+        self._frame_started = time.perf_counter()
+        self.frame_starts.append(self._frame_started)
+
+    def _on_end(self, obj, event):
+        if self._frame_started is None:
+            return
+        duration = time.perf_counter() - self._frame_started
+        self.frame_durations.append(duration)
+        self.tracer.record("Frame", self._frame_started, duration, "render",
+                           {"renderer_seconds": self.renderer.GetLastRenderTimeInSeconds()})
+        self._frame_started = None
+        if self.overlay.GetVisibility():
+            # Der Text erscheint mit dem nächsten Bild
+            self.overlay.SetInput(f"{self.fps():5.1f} FPS | {self.latency() * 1000:6.1f} ms/Bild")
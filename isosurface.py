@@ -0,0 +1,239 @@
+# Standardbibliotheken
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+# Drittanbieter-Bibliotheken
+from PyQt5.QtCore import QThread, pyqtSignal
+from vtkmodules.vtkCommonDataModel import vtkPolyData
+from vtkmodules.vtkFiltersCore import (
+    vtkFlyingEdges3D, vtkPolyDataNormals, vtkQuadricDecimation, vtkWindowedSincPolyDataFilter)
+from vtkmodules.vtkIOXML import vtkXMLPolyDataReader, vtkXMLPolyDataWriter
+from vtkmodules.vtkRenderingCore import vtkActor, vtkPolyDataMapper
+
+# Projektmodule
+from instrumentation import tracer
+from volume_cache import DEFAULT_CACHE_DIR, get_content_hash
+
+# Schwellenwert in Hounsfield-Einheiten, Farbe und Opazität je Oberfläche
+IsoPreset = namedtuple("IsoPreset", ["value", "color", "opacity"])
+ISO_PRESETS = OrderedDict([
+    ("Lunge", IsoPreset(-500.0, (0.9, 0.6, 0.6), 0.35)),
+    ("Weichteil", IsoPreset(20.0, (0.9, 0.75, 0.6), 0.25)),
+    ("Knochen", IsoPreset(300.0, (1.0, 1.0, 0.9), 1.0)),
+])
+
+# Anteil der Dreiecke, die bei der Dezimierung entfernt werden (0 = keine Dezimierung)
+DEFAULT_REDUCTION = 0.5
+
+# Iterationen der Glättung (0 = keine Glättung)
+DEFAULT_SMOOTHING_ITERATIONS = 15
+
+# Verzeichnis für die Oberflächen auf der Festplatte und Anzahl der Netze im Speicher
+MESH_CACHE_DIR = os.path.join(DEFAULT_CACHE_DIR, "meshes")
+MAX_MEMORY_MESHES = 16
+
+
+def extract_isosurface(image_data, iso_value, reduction=DEFAULT_REDUCTION,
+                       smoothing_iterations=DEFAULT_SMOOTHING_ITERATIONS):
+    """Extrahiert eine Isofläche mit vtkFlyingEdges3D (mehrere Threads) und dezimiert/glättet sie optional."""
+    with tracer.span("flying_edges", "surface", iso_value=iso_value):
+        contour = vtkFlyingEdges3D()
+        contour.SetInputData(image_data)
+        contour.SetValue(0, iso_value)
+        contour.ComputeNormalsOff()  # Normalen erst nach Dezimierung und Glättung
+        contour.ComputeGradientsOff()
+        contour.ComputeScalarsOff()
+        contour.Update()
+        output = contour.GetOutputPort()
+
+    if reduction > 0:
+        with tracer.span("decimate", "surface"):
+            decimate = vtkQuadricDecimation()
+            decimate.SetInputConnection(output)
+            decimate.SetTargetReduction(reduction)
+            decimate.Update()
+            output = decimate.GetOutputPort()
+
+    if smoothing_iterations > 0:
+        with tracer.span("smooth", "surface"):
+            smooth = vtkWindowedSincPolyDataFilter()
+            smooth.SetInputConnection(output)
+            smooth.SetNumberOfIterations(smoothing_iterations)
+            smooth.SetPassBand(0.1)
+            smooth.NonManifoldSmoothingOn()
+            smooth.NormalizeCoordinatesOn()
+            smooth.Update()
+            output = smooth.GetOutputPort()
+
+    normals = vtkPolyDataNormals()
+    normals.SetInputConnection(output)
+    normals.SplittingOff()
+    normals.Update()
+
+    mesh = vtkPolyData()
+    mesh.ShallowCopy(normals.GetOutput())
+    return mesh
+
+
+def mesh_key(content_hash, iso_value, reduction, smoothing_iterations):
+    return f"{content_hash}_{iso_value:g}_{reduction:g}_{smoothing_iterations}"
+
+
+class MeshCache:
+    """Hält extrahierte Oberflächen im Speicher (LRU) und als .vtp Dateien auf der Festplatte."""
+
+    def __init__(self, cache_dir=MESH_CACHE_DIR, max_memory_meshes=MAX_MEMORY_MESHES):
+        self.cache_dir = cache_dir
+        self.max_memory_meshes = max_memory_meshes
+        self._meshes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key + ".vtp")
+
+    def get(self, key):
+        """Liefert ein Netz aus dem Speicher oder von der Festplatte, sonst None."""
+        with self._lock:
+            mesh = self._meshes.get(key)
+            if mesh is not None:
+                self._meshes.move_to_end(key)
+                return mesh
+
+        path = self.path_for(key)
+        if not os.path.exists(path):
+            return None
+        with tracer.span("read_mesh", "surface"):
+            reader = vtkXMLPolyDataReader()
+            reader.SetFileName(path)
+            reader.Update()
+        if reader.GetErrorCode():
+            return None
+        mesh = vtkPolyData()
+        mesh.ShallowCopy(reader.GetOutput())
+        self._remember(key, mesh)
+        try:
+            os.utime(path)  # Zugriffszeitpunkt für die LRU-Verdrängung des Volumen-Caches
+        except OSError:
+            pass
+        return mesh
+
+    def put(self, key, mesh):
+        self._remember(key, mesh)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Erst in eine temporäre Datei schreiben, damit nie halbe Netze gelesen werden
+            path = self.path_for(key)
+            temp_path = f"{path}.tmp-{os.getpid()}.vtp"
+            writer = vtkXMLPolyDataWriter()
+            writer.SetFileName(temp_path)
+            writer.SetInputData(mesh)
+            writer.SetDataModeToAppended()
+            writer.SetCompressorTypeToZLib()
+            if writer.Write():
+                os.replace(temp_path, path)
+        except OSError:
+            pass  # Ohne beschreibbares Verzeichnis bleibt nur der Speicher-Cache
+
+    def _remember(self, key, mesh):
+        with self._lock:
+            self._meshes[key] = mesh
+            self._meshes.move_to_end(key)
+            while len(self._meshes) > self.max_memory_meshes:
+                self._meshes.popitem(last=False)
+
+    def get_or_extract(self, image_data, iso_value, reduction=DEFAULT_REDUCTION,
+                       smoothing_iterations=DEFAULT_SMOOTHING_ITERATIONS):
+        """Liefert die Isofläche aus dem Cache oder extrahiert sie einmalig."""
+        key = mesh_key(get_content_hash(image_data), iso_value, reduction, smoothing_iterations)
+        mesh = self.get(key)
+        if mesh is None:
+            mesh = extract_isosurface(image_data, iso_value, reduction, smoothing_iterations)
+            self.put(key, mesh)
+        return mesh
+
+    def clear(self):
+        with self._lock:
+            self._meshes.clear()
+
+
+class SurfaceExtractor(QThread):
+    """Extrahiert die angeforderten Oberflächen im Hintergrund."""
+
+    extracted = pyqtSignal(object, str, object)  # vtkImageData, Name, vtkPolyData
+    failed = pyqtSignal(str)
+
+    def __init__(self, image_data, names, cache, reduction=DEFAULT_REDUCTION,
+                 smoothing_iterations=DEFAULT_SMOOTHING_ITERATIONS, parent=None):
+        super().__init__(parent)
+        self.image_data = image_data
+        self.names = list(names)
+        self.cache = cache
+        self.reduction = reduction
+        self.smoothing_iterations = smoothing_iterations
+
+    def run(self):
+        try:
+            for name in self.names:
+                with tracer.span("extract_surface", "surface", surface=name):
+                    mesh = self.cache.get_or_extract(self.image_data, ISO_PRESETS[name].value,
+                                                     self.reduction, self.smoothing_iterations)
+                self.extracted.emit(self.image_data, name, mesh)
+        except Exception as error:  # Fehler dürfen den Worker-Thread nicht stillschweigend beenden
+            self.failed.emit(str(error))
+
+
+class IsoSurfaceLayer:
+    """Verwaltet die Oberflächen-Actors im Renderer; Umschalten ändert nur die Sichtbarkeit."""
+
+    def __init__(self, renderer):
+        self.renderer = renderer
+        self.actors = {}
+        self.visible = set()
+        self.enabled = False
+
+    def has_mesh(self, name):
+        return name in self.actors
+
+    def set_mesh(self, name, mesh):
+        """Legt den Actor einer Oberfläche an (einmalig pro Volumen)."""
+        if name in self.actors:
+            self.renderer.RemoveActor(self.actors[name])
+        mapper = vtkPolyDataMapper()
+        mapper.SetInputData(mesh)
+        mapper.ScalarVisibilityOff()
+        actor = vtkActor()
+        actor.SetMapper(mapper)
+        preset = ISO_PRESETS[name]
+        actor.GetProperty().SetColor(preset.color)
+        actor.GetProperty().SetOpacity(preset.opacity)
+        self.actors[name] = actor
+        self.renderer.AddActor(actor)
+        self._update_visibility(name)
+
+    def set_visible(self, name, visible):
+        if visible:
+            self.visible.add(name)
+        else:
+            self.visible.discard(name)
+        self._update_visibility(name)
+
+    def set_enabled(self, enabled):
+        """Blendet alle Oberflächen des Modus ein oder aus, ohne die Auswahl zu verlieren."""
+        self.enabled = enabled
+        for name in self.actors:
+            self._update_visibility(name)
+
+    def missing(self):
+        """Ausgewählte Oberflächen, für die noch kein Netz vorliegt."""
+        return [name for name in ISO_PRESETS if name in self.visible and name not in self.actors]
+
+    def _update_visibility(self, name):
+        if name in self.actors:
+            self.actors[name].SetVisibility(self.enabled and name in self.visible)
+
+    def clear(self):
+        """Entfernt alle Actors, z. B. beim Wechsel der Studie."""
+        for actor in self.actors.values():
+            self.renderer.RemoveActor(actor)
+        self.actors = {}
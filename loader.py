@@ -0,0 +1,169 @@
+# Standardbibliotheken
+from collections import namedtuple
+
+# Drittanbieter-Bibliotheken
+from PyQt5.QtCore import QThread, pyqtSignal
+
+# Projektmodule
+from bricks import BrickedVolume, is_bricked_volume
+from dicom_ingest import is_dicom_series, load_dicom_series
+from histogram import DEFAULT_BINS, compute_histogram_counts
+from instrumentation import tracer
+from lod import DEFAULT_FACTORS, build_pyramid
+from preprocessing import run_preprocessing
+from volume_cache import load_cached_vti, source_key
+from volume_io import extract_voxel_data, load_vti_file
+
+# Ergebnis des Ladevorgangs, das an den Hauptthread übergeben wird
+LoadResult = namedtuple("LoadResult", ["filepath", "image_data", "histogram", "scalar_range", "pyramid", "bricked",
+                                       "preprocessing"], defaults=(None, ()))
+
+# Anteile des Fortschrittsbalkens für das Dekodieren und das Histogramm, der Rest entfällt auf die LOD-Pyramide
+READ_PROGRESS_SHARE = 0.7
+HISTOGRAM_PROGRESS_SHARE = 0.15
+
+# Anteil der Vorverarbeitung am Lesen, falls Schritte konfiguriert sind
+PREPROCESSING_PROGRESS_SHARE = 0.3
+
+# Maximale Voxelanzahl der Stufe, die bei Brick-Volumen für das Volumenrendering eingelesen wird
+RENDER_VOXEL_BUDGET = 256 ** 3
+
+
+class LoadCancelled(Exception):
+    """Wird ausgelöst, wenn der Benutzer das Laden abgebrochen hat."""
+
+
+class VolumeLoader(QThread):
+    """Lädt ein Volumen im Hintergrund und berechnet die abgeleiteten Daten."""
+
+    progress = pyqtSignal(int, str)  # Prozent, Statustext
+    loaded = pyqtSignal(object)  # LoadResult
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, filepath, bins=DEFAULT_BINS, cache=None, lod_factors=DEFAULT_FACTORS, preprocessing=(),
+                 preprocessing_cache=None, parent=None):
+        super().__init__(parent)
+        self.filepath = filepath
+        self.bins = bins
+        self.lod_factors = lod_factors
+        self.cache = cache  # Optionaler VolumeCache für schnelle Wiederholungsladevorgänge
+        self.preprocessing = tuple(preprocessing)  # PreprocessingStep-Folge zwischen Reader und Mapper
+        self.preprocessing_cache = preprocessing_cache
+        self._cancel_requested = False
+
+    def cancel(self):
+        """Fordert den Abbruch an; der Worker prüft das Flag zwischen den Blöcken."""
+        self._cancel_requested = True
+
+    def is_cancel_requested(self):
+        return self._cancel_requested
+
+    def run(self):
+        try:
+            result = self._load()
+        except LoadCancelled:
+            self.cancelled.emit()
+        except Exception as error:  # Fehler dürfen den Worker-Thread nicht stillschweigend beenden
+            self.failed.emit(str(error))
+        else:
+            self.loaded.emit(result)
+
+    def _load(self):
+        if is_bricked_volume(self.filepath):
+            return self._load_bricked()
+
+        dicom = is_dicom_series(self.filepath)
+        message = "Importiere DICOM-Serie..." if dicom else "Lese Datei..."
+        read_share = READ_PROGRESS_SHARE - (PREPROCESSING_PROGRESS_SHARE if self.preprocessing else 0.0)
+        self.progress.emit(0, message)
+        read_progress = lambda fraction: self.progress.emit(int(fraction * read_share * 100), message)
+        with tracer.span("read_volume", "load", filepath=self.filepath):
+            if dicom:
+                image_data, key = load_dicom_series(self.filepath, self.cache, read_progress, self.is_cancel_requested)
+            elif self.cache is not None:
+                image_data = load_cached_vti(self.filepath, self.cache, read_progress, self.is_cancel_requested)
+                key = source_key(self.filepath)
+            else:
+                image_data = load_vti_file(self.filepath, read_progress, self.is_cancel_requested)
+                key = None
+        if self._cancel_requested:
+            raise LoadCancelled()
+        if image_data is None or image_data.GetPointData().GetScalars() is None:
+            raise IOError(f"Keine Bilddaten in {self.filepath} gefunden.")
+
+        # Vorverarbeitung; Ergebnisse werden pro Schritt gecacht, der Schlüssel des letzten Schritts
+        # ersetzt den Quellschlüssel für Histogramm und Detailstufen
+        if self.preprocessing:
+            preprocess_progress = lambda fraction: self.progress.emit(
+                int((read_share + fraction * PREPROCESSING_PROGRESS_SHARE) * 100), "Vorverarbeitung...")
+            preprocess_progress(0.0)
+            with tracer.span("preprocess", "load", steps=[step.name for step in self.preprocessing]):
+                image_data, key = run_preprocessing(image_data, self.preprocessing, self.preprocessing_cache,
+                                                    preprocess_progress, self.is_cancel_requested)
+            if self._cancel_requested:
+                raise LoadCancelled()
+
+        # Gecachte Histogramme vermeiden, dass ein gemapptes Volumen komplett eingelesen wird
+        if self.cache is None:
+            key = None  # Schlüssel der Vorverarbeitung ohne Volumen-Cache nicht für Dateien verwenden
+        histogram = self.cache.load_histogram(key, self.bins) if key else None
+        if histogram is None:
+            self.progress.emit(int(READ_PROGRESS_SHARE * 100), "Berechne Histogramm...")
+            with tracer.span("compute_histogram", "load"):
+                voxel_data = extract_voxel_data(image_data)
+                histogram = compute_histogram_counts(voxel_data, self.bins, progress_callback=self._histogram_progress)
+            if key:
+                self.cache.store_histogram(key, histogram)
+        scalar_range = (float(histogram.edges[0]), float(histogram.edges[-1]))
+        if self._cancel_requested:
+            raise LoadCancelled()
+
+        # Auflösungspyramide für die interaktive Darstellung einmalig beim Laden erzeugen
+        self.progress.emit(int((READ_PROGRESS_SHARE + HISTOGRAM_PROGRESS_SHARE) * 100), "Erzeuge Detailstufen...")
+        with tracer.span("build_pyramid", "load"):
+            pyramid = build_pyramid(image_data, self.lod_factors, self.cache, key)
+
+        self.progress.emit(100, "Fertig")
+        return LoadResult(self.filepath, image_data, histogram, scalar_range, pyramid,
+                          preprocessing=self.preprocessing)
+
+    def _load_bricked(self):
+        """Öffnet ein Brick-Volumen; eingelesen werden nur die Stufen für das Volumenrendering.
+
+        Die Vorverarbeitung entfällt hier, da das Volumen nicht vollständig in den Speicher passt.
+        """
+        with tracer.span("open_bricked_volume", "load", filepath=self.filepath):
+            bricked = BrickedVolume(self.filepath)
+
+        # Histogramm der vollen Auflösung wird Brick für Brick gestreamt
+        self.progress.emit(0, "Berechne Histogramm...")
+        with tracer.span("compute_histogram", "load"):
+            histogram = bricked.histogram(self.bins, self._bricked_histogram_progress)
+        scalar_range = (float(histogram.edges[0]), float(histogram.edges[-1]))
+
+        # Gespeicherte Stufen ab der feinsten, die ins Budget passt, bilden die Auflösungspyramide
+        self.progress.emit(int(READ_PROGRESS_SHARE * 100), "Lese Detailstufen...")
+        with tracer.span("read_render_levels", "load"):
+            render_level = bricked.level_for_voxels(RENDER_VOXEL_BUDGET)
+            pyramid = []
+            for level in bricked.levels:
+                if level.factor < render_level.factor:
+                    continue
+                if self._cancel_requested:
+                    raise LoadCancelled()
+                pyramid.append((level.factor // render_level.factor, level.to_image_data()))
+
+        self.progress.emit(100, "Fertig")
+        return LoadResult(self.filepath, pyramid[0][1], histogram, scalar_range, pyramid, bricked)
+
+    def _bricked_histogram_progress(self, fraction):
+        if self._cancel_requested:
+            raise LoadCancelled()
+        self.progress.emit(int(fraction * READ_PROGRESS_SHARE * 100), "Berechne Histogramm...")
+
+    def _histogram_progress(self, fraction):
+        if self._cancel_requested:
+            raise LoadCancelled()
+        share = READ_PROGRESS_SHARE + fraction * HISTOGRAM_PROGRESS_SHARE
+        self.progress.emit(int(share * 100), "Berechne Histogramm...")
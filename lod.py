@@ -0,0 +1,157 @@
+# Drittanbieter-Bibliotheken
+from vtkmodules.vtkCommonCore import vtkCommand
+from vtkmodules.vtkCommonDataModel import vtkImageData
+from vtkmodules.vtkImagingCore import vtkImageShrink3D
+from vtkmodules.vtkRenderingVolumeOpenGL2 import vtkSmartVolumeMapper
+
+# Verkleinerungsfaktoren der Auflösungspyramide (1/2, 1/4, 1/8)
+DEFAULT_FACTORS = (2, 4, 8)
+
+# Ziel-Bildzeit während der Interaktion in Sekunden
+DEFAULT_TARGET_FRAME_TIME = 1.0 / 15
+
+# Schwellen relativ zur Ziel-Bildzeit für den Wechsel zu gröberen bzw. feineren Stufen
+COARSEN_THRESHOLD = 1.25
+REFINE_THRESHOLD = 0.5
+
+# Glättungsfaktor für die gemessenen Bildzeiten pro Stufe
+FRAME_TIME_SMOOTHING = 0.3
+
+
+def build_pyramid(image_data, factors=DEFAULT_FACTORS, cache=None, key=None):
+    """Erzeugt die Auflösungspyramide als Liste von (Faktor, vtkImageData), beginnend mit voller Auflösung."""
+    levels = [(1, image_data)]
+    for factor in factors:
+        cache_key = f"{key}.lod{factor}" if cache is not None and key else None
+        level_data = cache.load(cache_key) if cache_key else None
+
+        if level_data is None:
+            # Jede Stufe wird aus der vorherigen gemittelt, nicht erneut aus dem Originalvolumen
+            previous_factor, previous_data = levels[-1]
+            step = max(1, factor // previous_factor)
+            shrink = vtkImageShrink3D()
+            shrink.SetInputData(previous_data)
+            shrink.SetShrinkFactors(step, step, step)
+            shrink.AveragingOn()
+            shrink.Update()
+            level_data = vtkImageData()
+            level_data.ShallowCopy(shrink.GetOutput())
+            if cache_key:
+                cache.store(cache_key, level_data)
+
+        levels.append((factor, level_data))
+    return levels
+
+
+class LODController:
+    """Schaltet während der Interaktion auf gröbere Pyramidenstufen, um die Ziel-Bildzeit zu halten."""
+
+    def __init__(self, volume, pyramid, renderer, interactor, target_frame_time=DEFAULT_TARGET_FRAME_TIME):
+        self.volume = volume
+        self.renderer = renderer
+        self.interactor = interactor
+        self.target_frame_time = target_frame_time
+        self.factors = [factor for factor, _ in pyramid]
+
+        # Stufe 0 nutzt den vorhandenen Mapper, gröbere Stufen erhalten je einen eigenen Mapper
+        self.mappers = [volume.GetMapper()]
+        for factor, level_data in pyramid[1:]:
+            mapper = vtkSmartVolumeMapper()
+            mapper.SetInputData(level_data)
+            # Sonst passt der Mapper die Abtastschritte selbst an und ignoriert SetSampleDistance
+            mapper.AutoAdjustSampleDistancesOff()
+            mapper.SetSampleDistance(min(level_data.GetSpacing()))  # Ein Voxel der Stufe, wächst mit dem Faktor
+            self.mappers.append(mapper)
+
+        self.frame_times = [None] * len(self.mappers)
+        self.current_level = 0
+        self.interacting = False
+        self.listeners = []
+        self._observers = []
+
+    @property
+    def current_factor(self):
+        return self.factors[self.current_level]
+
+    def add_listener(self, callback):
+        """Registriert einen Callback(level, factor, frame_time), der bei jedem Stufenwechsel aufgerufen wird."""
+        self.listeners.append(callback)
+
+    def set_target_frame_time(self, seconds):
+        self.target_frame_time = seconds
+        self.interactor.SetDesiredUpdateRate(1.0 / seconds)
+
+    def attach(self):
+        """Verbindet den Controller mit Renderer und Interactor."""
+        self.interactor.SetDesiredUpdateRate(1.0 / self.target_frame_time)
+        self._observers.append((self.renderer, self.renderer.AddObserver(vtkCommand.EndEvent, self._on_render_end)))
+        for event in ("LeftButtonPressEvent", "MiddleButtonPressEvent", "RightButtonPressEvent"):
+            self._add_passive_observer(event, self._on_interaction_start)
+        for event in ("LeftButtonReleaseEvent", "MiddleButtonReleaseEvent", "RightButtonReleaseEvent"):
+            self._add_passive_observer(event, self._on_interaction_end)
+
+    def _add_passive_observer(self, event, callback):
+        # Passive Observer erhalten Maus-Events auch dann, wenn ein Interactor-Style den Fokus hält
+        tag = self.interactor.AddObserver(event, callback)
+        self.interactor.GetCommand(tag).PassiveObserverOn()
+        self._observers.append((self.interactor, tag))
+
+    def detach(self):
+        """Entfernt alle Observer und stellt den vollauflösenden Mapper wieder her."""
+        for obj, tag in self._observers:
+            obj.RemoveObserver(tag)
+        self._observers = []
+        self.interacting = False
+        self._set_level(0)
+
+    def _on_interaction_start(self, obj, event):
+        self.interacting = True
+        self._set_level(self._choose_start_level())
+
+    def _on_interaction_end(self, obj, event):
+        if not self.interacting:
+            return
+        self.interacting = False
+        self._set_level(0)
+        self.interactor.GetRenderWindow().Render()  # Volle Qualität nach dem Loslassen
+
+    def _choose_start_level(self):
+        """Wählt die feinste Stufe, deren gemessene oder geschätzte Bildzeit das Ziel einhält."""
+        for level, frame_time in enumerate(self.frame_times):
+            estimate = frame_time if frame_time is not None else self._estimate_frame_time(level)
+            if estimate is not None and estimate <= self.target_frame_time:
+                return level
+        return len(self.mappers) - 1  # Ohne passende Messung mit der gröbsten Stufe beginnen
+
+    def _estimate_frame_time(self, level):
+        """Schätzt die Bildzeit einer Stufe aus der nächstfeineren Messung (Aufwand ~ Faktor^2)."""
+        for finer in range(level - 1, -1, -1):
+            if self.frame_times[finer] is not None:
+                ratio = self.factors[level] / self.factors[finer]
+                return self.frame_times[finer] / (ratio * ratio)
+        return None
+
+    def _on_render_end(self, obj, event):
+        frame_time = self.renderer.GetLastRenderTimeInSeconds()
+        previous = self.frame_times[self.current_level]
+        self.frame_times[self.current_level] = frame_time if previous is None else (
+            (1 - FRAME_TIME_SMOOTHING) * previous + FRAME_TIME_SMOOTHING * frame_time)
+
+        if not self.interacting:
+            return
+        # Stufe für das nächste Bild anpassen
+        measured = self.frame_times[self.current_level]
+        if measured > self.target_frame_time * COARSEN_THRESHOLD and self.current_level < len(self.mappers) - 1:
+            self._set_level(self.current_level + 1)
+        elif measured < self.target_frame_time * REFINE_THRESHOLD and self.current_level > 0:
+            finer_time = self.frame_times[self.current_level - 1]
+            if finer_time is None or finer_time <= self.target_frame_time:
+                self._set_level(self.current_level - 1)
+
+    def _set_level(self, level):
+        if level == self.current_level and self.volume.GetMapper() is self.mappers[level]:
+            return
+        self.current_level = level
+        self.volume.SetMapper(self.mappers[level])
+        for callback in self.listeners:
+            callback(level, self.factors[level], self.frame_times[level])
@@ -1,94 +1,75 @@
 # Standardbibliotheken
+import time
+
+# Zeitmarken für --startup-timing; die erste Marke vor allen übrigen Importen
+STARTUP_MARKS = [("start", time.perf_counter())]
+
+import os
 import sys
 
 # Drittanbieter-Bibliotheken
 import numpy as np
-import matplotlib.pyplot as plt
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, QWidget, QPushButton, 
-    QComboBox, QSlider, QLabel, QDialog, QMessageBox, QRadioButton
+    QComboBox, QSlider, QLabel, QDialog, QMessageBox, QProgressBar,
+    QFileDialog, QCheckBox
 )
-from PyQt5.QtCore import Qt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+STARTUP_MARKS.append(("import_qt", time.perf_counter()))
 
-# VTK-Bibliotheken
-import vtk
+# VTK-Bibliotheken: nur die benötigten Module statt des gesamten vtk-Pakets
+import vtkmodules.vtkInteractionStyle  # Standard-Interaktorstil (Trackball)  # noqa: F401
+import vtkmodules.vtkRenderingFreeType  # Schriftdarstellung (Labels, Overlay)  # noqa: F401
+import vtkmodules.vtkRenderingOpenGL2  # OpenGL-Backend der Render-Fenster  # noqa: F401
 from vtkmodules.qt.QVTKRenderWindowInteractor import QVTKRenderWindowInteractor
-from vtk.numpy_interface import dataset_adapter as dsa  # type: ignore
-
-# Funktion zum Laden der .vti Datei
-def load_vti_file(filepath):
-    """Lädt die .vti Datei mit den medizinischen Bilddaten."""
-    reader = vtk.vtkXMLImageDataReader()
-    reader.SetFileName(filepath)
-    reader.Update()
-    return reader.GetOutput()
-
-# Funktion, um die Voxel-Daten in ein NumPy-Array zu konvertieren
-def extract_voxel_data(image_data):
-    """Extrahiert die Voxel-Daten als NumPy-Array."""
-    point_data = image_data.GetPointData().GetScalars()
-    np_array = dsa.WrapDataObject(image_data).PointData[point_data.GetName()]
-    return np_array
-
-class HistogramDialog(QDialog):
-    def __init__(self, all_histogram_values, roi_histogram_values=None):
-        super().__init__()
-        self.setWindowTitle("Histogramm")
-        self.setGeometry(100, 100, 800, 600)
+from vtkmodules.vtkCommonCore import vtkCommand
+from vtkmodules.vtkCommonDataModel import vtkPolyData
+from vtkmodules.vtkRenderingCore import vtkRenderer
+STARTUP_MARKS.append(("import_vtk", time.perf_counter()))
+
+# Projektmodule
+from annotations import DEFAULT_ANNOTATIONS, REGION_COLORS, AnnotationLayer, load_annotations
+from histogram import DEFAULT_BINS, HistogramCache, volume_key
+from instrumentation import FrameMonitor, report_startup, tracer
+from isosurface import ISO_PRESETS, IsoSurfaceLayer, MeshCache, SurfaceExtractor
+from loader import VolumeLoader
+from mpr_view import AXIAL, MPRView
+from preprocessing import PreprocessingCache
+from region_detection import RegionDetector
+from roi_stats import RoiStatistics, bounds_to_index_box
+from lod import DEFAULT_TARGET_FRAME_TIME, LODController
+from session import SessionManager, Study
+from transfer_functions import COLOR_MAP_NAMES, DEFAULT_WINDOW_PRESET, WINDOW_PRESET_NAMES
+from volume_cache import VolumeCache
+from volume_io import extract_voxel_data
+STARTUP_MARKS.append(("import_project", time.perf_counter()))
+
+# Standard-Datensatz im Projektverzeichnis
+DATA_FILE = "coronacases_org_004.vti"
+
+# Darstellungsmodi; Oberflächen sind für schwächere Rechner (Student-Modus) gedacht
+RENDER_MODES = ["Volumen", "Oberflächen"]
+SURFACE_MODE = 1
+
+# Maximale Anzahl von Einträgen in der Legende
+MAX_LEGEND_ENTRIES = 20
+
+# Verzögerung der Hover-Abfrage über den Annotationen
+HOVER_INTERVAL_MS = 50
+
+# Mindestabstand der ROI-Aktualisierungen beim Ziehen der Box
+ROI_UPDATE_INTERVAL_MS = 50
+
+# Mindestabstand der Bilder beim Ziehen von Fensterlage und -breite
+WINDOW_UPDATE_INTERVAL_MS = 30
+
+# Ziel-Bildzeit während der Interaktion (über THORAX_TARGET_FPS konfigurierbar)
+TARGET_FRAME_TIME = 1.0 / float(os.environ["THORAX_TARGET_FPS"]) if "THORAX_TARGET_FPS" in os.environ else DEFAULT_TARGET_FRAME_TIME
 
-        self.figure, self.ax = plt.subplots(figsize=(10, 6))
-        self.canvas = FigureCanvas(self.figure)  # Create the canvas here
-
-        # Radiobuttons für Hintergrundfarbe
-        self.bg_white_radio = QRadioButton("Weiß")
-        self.bg_black_radio = QRadioButton("Schwarz")
-        self.bg_white_radio.setChecked(True)  # Standardmäßig Weiß
-        bg_layout = QHBoxLayout()
-        bg_layout.addWidget(QLabel("Hintergrund:"))
-        bg_layout.addWidget(self.bg_white_radio)
-        bg_layout.addWidget(self.bg_black_radio)
-
-        # Histogramm zeichnen (mit initialem weißen Hintergrund)
-        self.update_histogram(all_histogram_values, roi_histogram_values)
-
-        self.canvas = FigureCanvas(self.figure)
-        layout = QVBoxLayout()
-        layout.addLayout(bg_layout)  # Radiobuttons zum Layout hinzufügen
-        layout.addWidget(self.canvas)
-        self.setLayout(layout)
-
-        # Verbinde Radiobuttons mit Update-Funktion
-        self.bg_white_radio.toggled.connect(lambda: self.update_histogram(all_histogram_values, roi_histogram_values))
-        self.bg_black_radio.toggled.connect(lambda: self.update_histogram(all_histogram_values, roi_histogram_values))
-
-        self.canvas.draw()
-
-    def update_histogram(self, all_histogram_values, roi_histogram_values):
-        """Aktualisiert das Histogramm mit der ausgewählten Hintergrundfarbe."""
-        bg_color = 'white' if self.bg_white_radio.isChecked() else 'black'
-        self.figure.set_facecolor(bg_color)
-        self.ax.set_facecolor(bg_color)
-        self.ax.cla() #Vorheriges Histogramm löschen
-
-        self.ax.hist(all_histogram_values, bins=256, color='blue', alpha=0.5, label="Gesamt")
-        if roi_histogram_values is not None:
-            self.ax.hist(roi_histogram_values, bins=256, color='red', alpha=0.7, label="ROI")
-
-        self.ax.set_title("Histogramm der Intensitätswerte", color=('white' if bg_color == 'black' else 'black')) 
-        self.ax.set_xlabel("Intensitätswert", color=('white' if bg_color == 'black' else 'black')) 
-        self.ax.set_ylabel("Häufigkeit", color=('white' if bg_color == 'black' else 'black')) 
-        self.ax.tick_params(axis='x', colors=('white' if bg_color == 'black' else 'black')) 
-        self.ax.tick_params(axis='y', colors=('white' if bg_color == 'black' else 'black')) 
-        self.ax.spines['bottom'].set_color(('white' if bg_color == 'black' else 'black')) 
-        self.ax.spines['top'].set_color(('white' if bg_color == 'black' else 'black'))    
-        self.ax.spines['left'].set_color(('white' if bg_color == 'black' else 'black'))   
-        self.ax.spines['right'].set_color(('white' if bg_color == 'black' else 'black'))  
-        self.ax.grid(True, color=('grey' if bg_color == 'black' else 'lightgrey')) 
-        self.ax.legend(labelcolor=('white' if bg_color == 'black' else 'black')) 
-        self.canvas.draw()    
 
 class VisualizationApp(QMainWindow):
+    first_painted = pyqtSignal()  # Nach dem ersten Zeichnen und der Initialisierung des Renderfensters
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Medizinische Visualisierung")
@@ -111,17 +92,51 @@ class VisualizationApp(QMainWindow):
         self.layout.addWidget(self.vtk_widget)
 
         # VTK Renderer und Interactor
-        self.renderer = vtk.vtkRenderer()
+        self.renderer = vtkRenderer()
         self.vtk_widget.GetRenderWindow().AddRenderer(self.renderer)
         self.interactor = self.vtk_widget.GetRenderWindow().GetInteractor()
         # Farben für die Regionen
-        self.region_colors = [(1, 0, 0), (0, 1, 0), (0, 0, 1)]  
+        self.region_colors = list(REGION_COLORS)
 
         # Buttons
         self.load_button = QPushButton("Lade Daten")
         self.layout.addWidget(self.load_button)
         self.load_button.clicked.connect(self.load_data)
 
+        # Weitere Studien laden und zwischen geladenen Studien wechseln
+        self.open_button = QPushButton("Studie öffnen...")
+        self.layout.addWidget(self.open_button)
+        self.open_button.clicked.connect(self.open_study)
+
+        self.open_dicom_button = QPushButton("DICOM-Serie öffnen...")
+        self.layout.addWidget(self.open_dicom_button)
+        self.open_dicom_button.clicked.connect(self.open_dicom_series)
+
+        # Vorverarbeitung zwischen Reader und Mapper/Schnitt-Widget
+        self.preprocessing_button = QPushButton("Vorverarbeitung...")
+        self.layout.addWidget(self.preprocessing_button)
+        self.preprocessing_button.clicked.connect(self.open_preprocessing_dialog)
+
+        self.study_selector = QComboBox(self)
+        self.study_selector.currentIndexChanged.connect(self.on_study_selected)
+        self.layout.addWidget(self.study_selector)
+        self.study_selector.hide()  # Erst mit geladenen Studien sichtbar
+
+        self.memory_label = QLabel()
+        self.layout.addWidget(self.memory_label)
+        self.memory_label.hide()  # Erst mit geladenen Studien sichtbar
+
+        # Fortschrittsanzeige für das Laden im Hintergrund
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.layout.addWidget(self.progress_bar)
+        self.progress_bar.hide()  # Nur während des Ladens sichtbar
+
+        self.cancel_load_button = QPushButton("Laden abbrechen")
+        self.cancel_load_button.clicked.connect(self.cancel_loading)
+        self.layout.addWidget(self.cancel_load_button)
+        self.cancel_load_button.hide()  # Nur während des Ladens sichtbar
+
         self.unload_button = QPushButton("Entlade Daten")
         self.layout.addWidget(self.unload_button)
         self.unload_button.clicked.connect(self.unload_data)
@@ -132,6 +147,11 @@ class VisualizationApp(QMainWindow):
         self.layout.addWidget(self.histogram_button)
         self.histogram_button.hide()  # Standardmäßig ausgeblendet
 
+        # Anzeige der aktuell gerenderten Detailstufe
+        self.lod_label = QLabel()
+        self.layout.addWidget(self.lod_label)
+        self.lod_label.hide()  # Erst nach dem Laden sichtbar
+
         # Slider für Slice-Steuerung
         self.slice_slider = QSlider(Qt.Horizontal)
         self.slice_slider.setMinimum(0)
@@ -144,12 +164,63 @@ class VisualizationApp(QMainWindow):
 
         # Dropdown für Farbschema
         self.color_selector = QComboBox(self)
-        self.color_selector.addItems(["Standard", "Graustufen", "Heiß/Kalt"])
+        self.color_selector.addItems(COLOR_MAP_NAMES)
         self.color_selector.currentIndexChanged.connect(self.update_color_map)
         self.layout.addWidget(QLabel("Farbschema:"))
         self.layout.addWidget(self.color_selector)
         self.color_selector.hide()  # Standardmäßig ausgeblendet
 
+        # Fenster-Presets (aus dem Histogramm berechnet) und Regler für Fensterlage und -breite
+        self.window_selector = QComboBox(self)
+        self.window_selector.addItems(WINDOW_PRESET_NAMES)
+        self.window_selector.setCurrentText(DEFAULT_WINDOW_PRESET)
+        self.window_selector.currentIndexChanged.connect(self.update_window_preset)
+        self.layout.addWidget(QLabel("Fenster:"))
+        self.layout.addWidget(self.window_selector)
+        self.window_selector.hide()  # Standardmäßig ausgeblendet
+
+        window_layout = QHBoxLayout()
+        self.level_slider = QSlider(Qt.Horizontal)
+        self.width_slider = QSlider(Qt.Horizontal)
+        self.level_slider.valueChanged.connect(self.update_window_level)
+        self.width_slider.valueChanged.connect(self.update_window_level)
+        window_layout.addWidget(QLabel("Lage:"))
+        window_layout.addWidget(self.level_slider)
+        window_layout.addWidget(QLabel("Breite:"))
+        window_layout.addWidget(self.width_slider)
+        self.window_widget = QWidget()
+        self.window_widget.setLayout(window_layout)
+        self.layout.addWidget(self.window_widget)
+        self.window_widget.hide()  # Nur im Doktor-Modus sichtbar
+        self.transfer_function = None  # Aktuell angehängte Transferfunktion
+
+        # Beim Ziehen wird höchstens alle WINDOW_UPDATE_INTERVAL_MS gerendert
+        self.window_render_timer = QTimer(self)
+        self.window_render_timer.setSingleShot(True)
+        self.window_render_timer.setInterval(WINDOW_UPDATE_INTERVAL_MS)
+        self.window_render_timer.timeout.connect(self.render)
+
+        # Darstellungsmodus und Auswahl der Isoflächen
+        self.render_mode_selector = QComboBox(self)
+        self.render_mode_selector.addItems(RENDER_MODES)
+        self.render_mode_selector.currentIndexChanged.connect(self.update_render_mode)
+        self.layout.addWidget(QLabel("Darstellung:"))
+        self.layout.addWidget(self.render_mode_selector)
+        self.render_mode_selector.hide()  # Standardmäßig ausgeblendet
+
+        surface_layout = QHBoxLayout()
+        self.surface_checkboxes = {}
+        for name in ISO_PRESETS:
+            checkbox = QCheckBox(name)
+            checkbox.setChecked(name != "Weichteil")  # Weichteil verdeckt die Lunge
+            checkbox.toggled.connect(lambda checked, name=name: self.toggle_surface(name, checked))
+            surface_layout.addWidget(checkbox)
+            self.surface_checkboxes[name] = checkbox
+        self.surface_widget = QWidget()
+        self.surface_widget.setLayout(surface_layout)
+        self.layout.addWidget(self.surface_widget)
+        self.surface_widget.hide()  # Nur im Oberflächenmodus sichtbar
+
         # ROI-Button
         self.roi_button = QPushButton("ROI markieren")
         self.roi_button.clicked.connect(self.enable_roi_selection)
@@ -162,35 +233,120 @@ class VisualizationApp(QMainWindow):
         self.layout.addWidget(self.label_toggle_button)
         self.label_toggle_button.hide()  # Standardmäßig ausgeblendet
 
+        # Annotationen aus einer Datei (JSON oder CSV) laden
+        self.annotation_button = QPushButton("Annotationen laden...")
+        self.annotation_button.clicked.connect(self.load_annotation_file)
+        self.layout.addWidget(self.annotation_button)
+        self.annotation_button.hide()  # Standardmäßig ausgeblendet
+
+        # Name und Beschreibung der Annotation unter dem Mauszeiger
+        self.annotation_info_label = QLabel()
+        self.annotation_info_label.setWordWrap(True)
+        self.layout.addWidget(self.annotation_info_label)
+        self.annotation_info_label.hide()
+
         # Legenden-Button
         self.legend_button = QPushButton("Legende ein/ausblenden")
         self.legend_button.clicked.connect(self.toggle_legend)
         self.layout.addWidget(self.legend_button)
         self.legend_button.hide()  # Standardmäßig ausgeblendet
 
-        # Initialisiere VTK-Interactor
-        self.interactor.Initialize()
-
-        # Volumen-Daten
+        # Instrumentierung: FPS-Anzeige und Trace-Export
+        self.fps_button = QPushButton("FPS-Anzeige ein/ausblenden")
+        self.fps_button.clicked.connect(self.toggle_fps_overlay)
+        self.layout.addWidget(self.fps_button)
+        self.fps_button.hide()  # Standardmäßig ausgeblendet
+
+        self.trace_button = QPushButton("Trace exportieren")
+        self.trace_button.clicked.connect(self.export_trace)
+        self.layout.addWidget(self.trace_button)
+        self.trace_button.hide()  # Standardmäßig ausgeblendet
+
+        # Multiplanare Schnittansichten (axial, koronal, sagittal)
+        self.mpr_button = QPushButton("Schnittansichten ein/ausblenden")
+        self.mpr_button.clicked.connect(self.toggle_mpr_view)
+        self.layout.addWidget(self.mpr_button)
+        self.mpr_button.hide()  # Standardmäßig ausgeblendet
+
+        self.mpr_view = MPRView(self)
+        self.mpr_view.slice_settled.connect(self.on_slice_settled)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.mpr_view)
+        self.mpr_view.hide()  # Über den Button einblendbar
+
+        # Misst jedes gerenderte Bild über Start-/EndEvent des Renderfensters
+        self.frame_monitor = FrameMonitor(self.vtk_widget.GetRenderWindow(), self.renderer)
+        self.frame_monitor.attach()
+        self.frame_monitor.set_overlay_visible(os.environ.get("THORAX_FPS_OVERLAY") == "1")
+
+        # Der VTK-Interactor (OpenGL-Kontext) wird erst nach dem ersten Zeichnen des Fensters initialisiert
+        self.render_window_initialized = False
+        self.first_paint_done = False
+
+        # Volumen-Daten der aktiven Studie
+        self.session = SessionManager()
+        self.study = None
         self.volume = None
+        self.lod_controller = None
         self.slice_widget = None
-        self.reader = None
-        self.text_actors = []  # Liste für die Region-Beschriftungen
+        self.image_data = None
+        self.source = None  # vtkTrivialProducer, der image_data in die Pipeline einspeist
+        self.loader = None  # Hintergrund-Thread für das Laden
+        try:
+            self.volume_cache = VolumeCache()
+        except OSError:
+            self.volume_cache = None  # Ohne beschreibbares Cache-Verzeichnis wird direkt gelesen
+        # Vorverarbeitungsschritte für neu geladene Studien; Zwischenergebnisse pro Schritt gecacht
+        self.preprocessing = ()
+        self.preprocessing_cache = PreprocessingCache(self.volume_cache)
+        # Isoflächen: Netze werden pro Volumen und Schwellenwert zwischengespeichert
+        self.mesh_cache = MeshCache()
+        self.surface_layer = IsoSurfaceLayer(self.renderer)
+        for name, checkbox in self.surface_checkboxes.items():
+            self.surface_layer.set_visible(name, checkbox.isChecked())
+        self.surface_extractor = None
+
+        # Alle Marker in einem instanzierten Actor, Labels werden nach Entfernung und Dichte ausgewählt
+        self.annotation_layer = AnnotationLayer(self.renderer, self.region_colors)
+        self.labels_added = False
+        self.hover_position = None
+        self.click_position = None
+        self.hover_timer = QTimer(self)
+        self.hover_timer.setSingleShot(True)
+        self.hover_timer.setInterval(HOVER_INTERVAL_MS)
+        self.hover_timer.timeout.connect(self.update_hover)
+        for event, callback in (("MouseMoveEvent", self.on_mouse_move),
+                                ("LeftButtonPressEvent", self.on_left_button_press),
+                                ("LeftButtonReleaseEvent", self.on_left_button_release)):
+            tag = self.interactor.AddObserver(event, callback)
+            self.interactor.GetCommand(tag).PassiveObserverOn()  # Auch während ein Style den Fokus hält
         self.legend_labels = []  # Liste für Legenden-Beschreibungen
 
+        # Automatische Regionserkennung; ersetzt die Standard-Annotationen, solange keine Datei geladen wurde
+        self.region_detector = None
+        self.custom_annotations = False
+
         # ROI-Tools
-        self.roi_widget = vtk.vtkBoxWidget()
+        self.roi_widget = None  # vtkBoxWidget, erst beim ersten Aktivieren angelegt
         self.roi_enabled = False
+        self.voxels = None  # (z, y, x)-View auf die Voxel-Daten, ohne Kopie
+        self.roi_statistics = None
+
+        # Drosselt die ROI-Aktualisierung während der Box-Interaktion
+        self.roi_update_timer = QTimer(self)
+        self.roi_update_timer.setSingleShot(True)
+        self.roi_update_timer.setInterval(ROI_UPDATE_INTERVAL_MS)
+        self.roi_update_timer.timeout.connect(self.calculate_roi_histogram)
+
+        # Nicht-modales Panel für die ROI-Statistik (lädt Matplotlib, daher erst bei Bedarf)
+        self.roi_panel = None
 
-        # Histogrammdaten
-        self.histogram_values = []
+        # Histogrammdaten (nur Bin-Häufigkeiten, keine geflachte Voxelkopie)
+        self.histogram_cache = HistogramCache()
+        self.histogram = None
+        self.roi_histogram = None
 
         # Defining the annotations attribute
-        self.annotations = [
-            {"name": "Region 1", "position": (50, 50, 50), "description": "Lunge: Sauerstoffaufnahme und Gasaustausch."},
-            {"name": "Region 2", "position": (100, 100, 100), "description": "Herz: Blutpumpe für den Körper."},
-            {"name": "Region 3", "position": (160, 150, 150), "description": "Rippen: Schutz des Brustkorbs und der Organe."},
-        ]
+        self.annotations = [dict(annotation) for annotation in DEFAULT_ANNOTATIONS]
 
     def on_mode_selected(self, index):
         """Funktion zum Aktualisieren der UI basierend auf dem ausgewählten Modus."""
@@ -198,8 +354,15 @@ class VisualizationApp(QMainWindow):
             self.renderer.SetBackground(0.5, 0.7, 1.0)  # Hintergrundfarbe für Student
             self.slice_slider.show()  # Slice-Steuerung im Student-Modus anzeigen
             self.color_selector.show()
+            self.window_selector.show()
             self.label_toggle_button.show()
             self.legend_button.show()  # Legende im Student-Modus anzeigen
+            self.annotation_button.show()
+            self.fps_button.show()
+            self.trace_button.show()
+            self.mpr_button.show()
+            self.render_mode_selector.show()
+            self.render_mode_selector.setCurrentIndex(SURFACE_MODE)  # Leichtgewichtige Darstellung
             self.create_legend()  # Legende erstellen
             self.hide_all_mode_specific_widgets()  # Alle Widgets ausblenden
         elif index == 2:  # Doktor-Modus
@@ -207,29 +370,48 @@ class VisualizationApp(QMainWindow):
             self.histogram_button.show()  # Histogramm im Doktor-Modus anzeigen
             self.slice_slider.show()  # Slice-Steuerung im Doktor-Modus anzeigen
             self.color_selector.show()  # Farbauswahl im Doktor-Modus anzeigen
+            self.window_selector.show()
+            self.window_widget.show()  # Fensterlage/-breite im Doktor-Modus anzeigen
             self.roi_button.show()  # ROI im Doktor-Modus anzeigen
             self.label_toggle_button.show()  # Labels-Toggle-Button im Doktor-Modus anzeigen
+            self.annotation_button.show()
             self.legend_button.hide()  # Legende im Doktor-Modus ausblenden
+            self.fps_button.show()
+            self.trace_button.show()
+            self.mpr_button.show()
+            self.render_mode_selector.show()
+            self.render_mode_selector.setCurrentIndex(0)  # Volumenrendering
         else:
             self.renderer.SetBackground(0.5, 0.5, 0.5)  # Hintergrundfarbe für keinen Modus
             self.slice_slider.hide()
             self.color_selector.hide()
+            self.window_selector.hide()
+            self.window_widget.hide()
             self.label_toggle_button.hide()
+            self.annotation_button.hide()
             self.legend_button.hide()  # Legende ausblenden
+            self.fps_button.hide()
+            self.trace_button.hide()
+            self.mpr_button.hide()
+            self.render_mode_selector.hide()
+            self.surface_widget.hide()
             self.hide_all_mode_specific_widgets()  # Alle Widgets ausblenden
 
-        self.vtk_widget.GetRenderWindow().Render()
+        self.render()
 
     def create_legend(self):
         """Erstellt eine Legende mit den Region-Namen und den ausführlichen Beschreibungen."""
         legend_layout = QVBoxLayout()
 
         # Legende für jede Region erstellen
-        for annotation in self.annotations:
+        for annotation in self.annotations[:MAX_LEGEND_ENTRIES]:
             label = QLabel(annotation["name"])
             label.mousePressEvent = lambda event, ann=annotation: self.show_description(ann)
             legend_layout.addWidget(label)
             self.legend_labels.append(label)
+        if len(self.annotations) > MAX_LEGEND_ENTRIES:
+            # Große Annotationssätze werden über Hover und Klick im 3D-Fenster erkundet
+            legend_layout.addWidget(QLabel(f"... und {len(self.annotations) - MAX_LEGEND_ENTRIES} weitere"))
 
         # Einen Container für die Legende erstellen
         legend_widget = QWidget()
@@ -249,7 +431,7 @@ class VisualizationApp(QMainWindow):
         else:
             self.legend_widget.show()
 
-        self.vtk_widget.GetRenderWindow().Render()
+        self.render()
 
     def hide_all_mode_specific_widgets(self):
         """Versteckt alle spezifischen Widgets (für Student und Doktor-Modus)."""
@@ -260,44 +442,275 @@ class VisualizationApp(QMainWindow):
         #self.label_toggle_button.hide()
 
     def load_data(self):
-        self.reader = vtk.vtkXMLImageDataReader()
-        self.reader.SetFileName("coronacases_org_004.vti")
-        self.reader.Update()
-
-        volume_mapper = vtk.vtkSmartVolumeMapper()
-        volume_mapper.SetInputConnection(self.reader.GetOutputPort())
-
-        self.volume = vtk.vtkVolume()
-        self.volume.SetMapper(volume_mapper)
-        self.volume.GetProperty().SetColor(self.get_color_transfer_function("Standard"))
-        self.volume.GetProperty().SetScalarOpacity(self.get_opacity_transfer_function())  # Hier wird die Opazität gesetzt
-
-        self.renderer.AddVolume(self.volume)
-        self.renderer.ResetCamera()
-        self.vtk_widget.GetRenderWindow().Render()
-
-        # Weitere Initialisierungen...
-        self.initialize_slice_viewer()
-        self.load_button.setEnabled(False)
-        self.unload_button.show()
+        """Lädt den Standard-Datensatz."""
+        self.load_study(DATA_FILE)
+
+    def open_study(self):
+        """Wählt eine weitere Studie über einen Dateidialog aus."""
+        filepath, _ = QFileDialog.getOpenFileName(self, "Studie öffnen", "", "VTK-Bilddaten (*.vti);;Brick-Volumen (meta.json)")
+        if filepath:
+            if os.path.basename(filepath) == "meta.json":
+                filepath = os.path.dirname(filepath)  # Brick-Volumen werden über ihr Verzeichnis geladen
+            self.load_study(filepath)
+
+    def open_dicom_series(self):
+        """Wählt ein Verzeichnis mit einer DICOM-Serie aus; der Import läuft im Hintergrund."""
+        directory = QFileDialog.getExistingDirectory(self, "DICOM-Serie öffnen")
+        if directory:
+            self.load_study(directory)
+
+    def load_study(self, filepath):
+        """Wechselt zu einer bereits geladenen Studie oder startet das Laden in einem Hintergrund-Thread."""
+        with tracer.span("load_data", filepath=filepath):
+            if self.loader is not None and self.loader.isRunning():
+                return
 
-        # 3D-Beschriftungen hinzufügen
-        self.add_3d_labels()
+            filepath = os.path.abspath(filepath)
+            study = self.session.get(filepath)
+            if study is not None and not self.needs_preprocessing(study):
+                self.activate_study(study)  # Ohne erneutes Lesen von der Festplatte
+                return
 
-        # Histogrammdaten generieren
-        self.calculate_histogram()
+            self.load_button.setEnabled(False)
+            self.open_button.setEnabled(False)
+            self.open_dicom_button.setEnabled(False)
+            self.preprocessing_button.setEnabled(False)
+            self.progress_bar.setValue(0)
+            self.progress_bar.setFormat("%p%")
+            self.progress_bar.show()
+            self.cancel_load_button.show()
+
+            self.loader = VolumeLoader(filepath, DEFAULT_BINS, self.volume_cache, preprocessing=self.preprocessing,
+                                       preprocessing_cache=self.preprocessing_cache, parent=self)
+            self.loader.progress.connect(self.on_load_progress)
+            self.loader.loaded.connect(self.on_volume_loaded)
+            self.loader.failed.connect(self.on_load_failed)
+            self.loader.cancelled.connect(self.on_load_cancelled)
+            self.loader.start()
+
+    def needs_preprocessing(self, study):
+        """Prüft, ob eine geladene Studie mit anderen Vorverarbeitungsschritten erzeugt wurde."""
+        return study.bricked is None and study.preprocessing != self.preprocessing
+
+    def open_preprocessing_dialog(self):
+        """Konfiguriert die Vorverarbeitung; die aktive Studie wird ab dem ersten geänderten Schritt neu berechnet."""
+        from preprocessing_dialog import PreprocessingDialog
+
+        dialog = PreprocessingDialog(self.preprocessing, self)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        self.preprocessing = dialog.steps()
+        if self.study is not None and self.needs_preprocessing(self.study):
+            self.load_study(self.study.filepath)  # Die bisherige Fassung bleibt bis zum Ende sichtbar
+
+    def cancel_loading(self):
+        """Bricht einen laufenden Ladevorgang ab."""
+        if self.loader is not None and self.loader.isRunning():
+            self.loader.cancel()
+            self.cancel_load_button.setEnabled(False)
+
+    def on_load_progress(self, percent, message):
+        self.progress_bar.setValue(percent)
+        self.progress_bar.setFormat(f"{message} %p%")
+
+    def on_load_failed(self, message):
+        self.finish_loading()
+        QMessageBox.warning(self, "Fehler beim Laden", message)
+
+    def on_load_cancelled(self):
+        self.finish_loading()
+
+    def finish_loading(self):
+        """Setzt die Ladeanzeige zurück."""
+        self.progress_bar.hide()
+        self.cancel_load_button.hide()
+        self.cancel_load_button.setEnabled(True)
+        self.load_button.setEnabled(True)
+        self.open_button.setEnabled(True)
+        self.open_dicom_button.setEnabled(True)
+        self.preprocessing_button.setEnabled(True)
+
+    def on_volume_loaded(self, result):
+        """Nimmt das im Hintergrund geladene Volumen in die Sitzung auf und zeigt es an."""
+        with tracer.span("attach_volume"):
+            study = Study(result)
+
+            # Im Worker berechnetes Histogramm übernehmen, damit es nicht erneut berechnet wird
+            self.histogram_cache.put(volume_key(result.image_data), result.histogram, DEFAULT_BINS)
+
+            evicted = self.session.add(study)
+            self.finish_loading()
+            self.activate_study(study)
+
+            # Am längsten ungenutzte Studien über dem Speicherbudget freigeben
+            for old_study in evicted:
+                self.release_study(old_study)
+            self.update_study_selector()
+
+    def activate_study(self, study):
+        """Hängt eine geladene Studie an Renderer, Schnittansichten und Histogramm an."""
+        with tracer.span("activate_study", filepath=study.filepath):
+            if study is self.study:
+                return
+            self.detach_active_study()
+            self.session.get(study.filepath)  # Als zuletzt genutzt markieren
+
+            self.study = study
+            self.image_data = study.image_data
+            self.voxels = study.voxels
+            self.source = study.source
+            self.volume = study.volume
+            self.apply_transfer_function()
+
+            self.renderer.AddVolume(self.volume)
+            self.renderer.ResetCamera()
+            self.update_render_mode(self.render_mode_selector.currentIndex())
+
+            # Detailstufen-Steuerung für flüssige Interaktion (pro Studie einmal angelegt)
+            if study.lod_controller is None:
+                study.lod_controller = LODController(study.volume, study.pyramid, self.renderer, self.interactor, TARGET_FRAME_TIME)
+                study.lod_controller.add_listener(self.on_lod_level_changed)
+            self.lod_controller = study.lod_controller
+            self.lod_controller.attach()
+            self.on_lod_level_changed(0, 1, None)
+            self.lod_label.show()
+
+            # Weitere Initialisierungen...
+            self.mpr_view.set_volume(self.voxels, study.spacing, study.scalar_range)
+            self.initialize_slice_viewer()
+            self.unload_button.show()
+
+            # Erkannte Regionen als Annotationen übernehmen oder die Erkennung starten
+            self.update_region_annotations()
+            self.request_regions()
+
+            # 3D-Beschriftungen einmalig hinzufügen (rendert das Fenster)
+            if not self.labels_added:
+                self.add_3d_labels()
+            else:
+                self.render()
+
+            # Histogrammdaten übernehmen
+            self.calculate_histogram()
+            self.update_study_selector()
+
+    def detach_active_study(self):
+        """Löst die aktive Studie von der Darstellung; sie bleibt in der Sitzung geladen."""
+        if self.study is None:
+            return
+        if self.lod_controller:
+            self.lod_controller.detach()
+            self.lod_controller = None
+            self.lod_label.hide()
 
-    def unload_data(self):
         if self.volume:
             self.renderer.RemoveVolume(self.volume)
             self.volume = None
+        self.transfer_function = None
+        self.surface_layer.clear()
 
         if self.slice_widget:
             self.slice_widget.Off()
             self.slice_widget = None
 
+        if self.roi_enabled:
+            self.enable_roi_selection()  # ROI deaktivieren
+        self.mpr_view.clear_volume()
+
+        # Keine Verweise auf die Daten der Studie im Fenster zurücklassen
+        self.study = None
+        self.image_data = None
+        self.source = None
+        self.voxels = None
+        self.histogram = None
+        self.roi_histogram = None
+
+    def release_study(self, study):
+        """Gibt eine aus der Sitzung entfernte Studie samt abgeleiteter Daten frei."""
+        if study.image_data is not None:
+            self.histogram_cache.invalidate(volume_key(study.image_data))
+        study.release()
+
+    def on_study_selected(self, index):
+        filepath = self.study_selector.itemData(index)
+        study = self.session.get(filepath) if filepath else None
+        if study is not None and self.needs_preprocessing(study):
+            self.load_study(filepath)
+        elif study is not None and study is not self.study:
+            self.activate_study(study)
+
+    def update_study_selector(self):
+        """Aktualisiert die Studienauswahl und die Speicheranzeige pro Studie."""
+        report = self.session.memory_report()
+        self.study_selector.blockSignals(True)
+        self.study_selector.clear()
+        for entry in report["studies"]:
+            self.study_selector.addItem(f"{entry['name']} ({entry['total'] / 2 ** 20:.0f} MB)", entry["filepath"])
+            self.study_selector.setItemData(
+                self.study_selector.count() - 1,
+                f"Volumen: {entry['volume'] / 2 ** 20:.1f} MB\n"
+                f"Detailstufen: {entry['pyramid'] / 2 ** 20:.1f} MB\n"
+                f"Histogramm: {entry['histogram'] / 1024:.1f} KB\n"
+                f"Regionen: {entry['regions'] / 2 ** 20:.1f} MB",
+                Qt.ToolTipRole)
+        if self.study is not None:
+            self.study_selector.setCurrentIndex(self.study_selector.findData(self.study.filepath))
+        else:
+            self.study_selector.setCurrentIndex(-1)
+        self.study_selector.blockSignals(False)
+
+        self.study_selector.setVisible(len(self.session) > 0)
+        self.memory_label.setVisible(len(self.session) > 0)
+        self.memory_label.setText(f"Speicher: {report['total'] / 2 ** 20:.0f} MB von {report['budget'] / 2 ** 20:.0f} MB "
+                                  f"({len(self.session)} Studien)")
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.first_paint_done:
+            self.first_paint_done = True
+            QTimer.singleShot(0, self.on_first_paint)  # Nach dem Zeichnen, nicht mittendrin
+
+    def on_first_paint(self):
+        """Das Fenster ist sichtbar; erst jetzt werden die OpenGL-Kontexte angelegt."""
+        STARTUP_MARKS.append(("first_paint", time.perf_counter()))
+        self.initialize_render_window()
+        STARTUP_MARKS.append(("render_window", time.perf_counter()))
+        self.first_painted.emit()
+
+    def initialize_render_window(self):
+        """Initialisiert Interactor und Schnittansichten einmalig."""
+        if self.render_window_initialized:
+            return
+        self.render_window_initialized = True
+        with tracer.span("initialize_render_window", "startup"):
+            self.interactor.Initialize()
+            self.mpr_view.initialize()
+
+    def render(self):
+        """Rendert das 3D-Fenster und erfasst die Dauer im Trace."""
+        self.initialize_render_window()  # Falls vor dem ersten Zeichnen gerendert wird
+        with tracer.span("Render", "render"):
+            self.vtk_widget.GetRenderWindow().Render()
+
+    def on_lod_level_changed(self, level, factor, frame_time):
+        """Zeigt die aktuell verwendete Detailstufe an."""
+        resolution = "volle Auflösung" if factor == 1 else f"1/{factor} Auflösung"
+        timing = f" ({frame_time * 1000:.0f} ms)" if frame_time is not None else ""
+        self.lod_label.setText(f"Detailstufe: {resolution}{timing}")
+
+    def unload_data(self):
+        """Entfernt die aktive Studie aus der Sitzung und gibt alle Verweise darauf frei."""
+        study = self.study
+        if study is None:
+            return
+        self.detach_active_study()
+        self.session.remove(study.filepath)
+        self.release_study(study)
+        self.update_study_selector()
+        self.update_region_annotations()
+
         self.renderer.ResetCamera()
-        self.vtk_widget.GetRenderWindow().Render()
+        self.render()
 
         self.load_button.setEnabled(True)
         self.unload_button.hide()
@@ -307,159 +720,373 @@ class VisualizationApp(QMainWindow):
         self.histogram_button.hide()
 
     def initialize_slice_viewer(self):
-        self.slice_widget = vtk.vtkImagePlaneWidget()
+        from vtkmodules.vtkInteractionWidgets import vtkImagePlaneWidget  # Erst mit dem ersten Volumen laden
+
+        self.slice_widget = vtkImagePlaneWidget()
         self.slice_widget.SetInteractor(self.interactor)
-        self.slice_widget.SetInputConnection(self.reader.GetOutputPort())
+        self.slice_widget.SetInputConnection(self.source.GetOutputPort())
         self.slice_widget.SetPlaneOrientationToZAxes()
         self.slice_widget.SetSliceIndex(50)
         self.slice_widget.DisplayTextOn()
         self.slice_widget.On()
 
-        extent = self.reader.GetOutput().GetExtent()
+        # Der Slider arbeitet auf den Voxel-Indizes der vollen Auflösung (auch bei Brick-Volumen)
+        extent = self.study.extent
         self.slice_slider.setMinimum(extent[4])
         self.slice_slider.setMaximum(extent[5])
         self.slice_slider.setValue(50)
 
     def update_slice(self, value):
-        if self.slice_widget:
-            self.slice_widget.SetSliceIndex(value)
-            self.vtk_widget.GetRenderWindow().Render()
+        """Leitet die Slider-Position an die Schnittansichten weiter; die 3D-Ansicht folgt erst nach dem Scrollen."""
+        with tracer.span("update_slice"):
+            if self.slice_widget:
+                self.mpr_view.set_slice(AXIAL, value)
+
+    def on_slice_settled(self, plane, index):
+        """Zieht die Schnittebene im 3D-Fenster nach, sobald das Scrollen ruht."""
+        if plane != AXIAL or not self.slice_widget:
+            return
+        self.slice_slider.blockSignals(True)
+        self.slice_slider.setValue(index)
+        self.slice_slider.blockSignals(False)
+        # Über die Weltkoordinate, da das 3D-Fenster eine gröbere Stufe zeigen kann
+        self.slice_widget.SetSlicePosition(self.study.origin[2] + index * self.study.spacing[2])
+        self.render()
+
+    def update_render_mode(self, index):
+        """Schaltet zwischen Volumenrendering und Isoflächen um."""
+        with tracer.span("update_render_mode"):
+            surfaces = index == SURFACE_MODE
+            self.surface_widget.setVisible(surfaces)
+            self.surface_layer.set_enabled(surfaces)
+            if self.volume:
+                self.volume.SetVisibility(not surfaces)
+            if surfaces:
+                self.request_surfaces()
+            self.render()
+
+    def toggle_surface(self, name, checked):
+        """Blendet eine Isofläche ein/aus; sie wird nur beim ersten Einblenden extrahiert."""
+        self.surface_layer.set_visible(name, checked)
+        if checked and self.surface_layer.enabled:
+            self.request_surfaces()
+        self.render()
+
+    def request_surfaces(self):
+        """Startet die Extraktion fehlender Oberflächen im Hintergrund."""
+        if self.image_data is None:
+            return
+        if self.surface_extractor is not None and self.surface_extractor.isRunning():
+            return  # Nach dem Ende wird erneut geprüft
+        missing = self.surface_layer.missing()
+        if not missing:
+            return
+        for name in missing:
+            self.surface_checkboxes[name].setText(f"{name} (wird berechnet...)")
+        self.surface_extractor = SurfaceExtractor(self.image_data, missing, self.mesh_cache, parent=self)
+        self.surface_extractor.extracted.connect(self.on_surface_extracted)
+        self.surface_extractor.failed.connect(self.on_surface_failed)
+        self.surface_extractor.finished.connect(self.request_surfaces)
+        self.surface_extractor.start()
+
+    def on_surface_extracted(self, image_data, name, mesh):
+        self.surface_checkboxes[name].setText(name)
+        if image_data is not self.image_data:
+            return  # Inzwischen wurde die Studie gewechselt
+        self.surface_layer.set_mesh(name, mesh)
+        self.render()
+
+    def on_surface_failed(self, message):
+        for name in self.surface_layer.missing():
+            self.surface_checkboxes[name].setText(name)
+            self.surface_checkboxes[name].setChecked(False)  # Kein erneuter Versuch ohne Benutzeraktion
+        QMessageBox.warning(self, "Oberflächen", message)
+
+    def request_regions(self):
+        """Startet die Regionserkennung der aktiven Studie im Hintergrund, falls noch nicht geschehen."""
+        if self.study is None or self.study.regions is not None:
+            return
+        if self.region_detector is not None and self.region_detector.isRunning():
+            return  # Nach dem Ende wird erneut geprüft
+        self.region_detector = RegionDetector(self.study.filepath, self.study.pyramid, parent=self)
+        self.region_detector.detected.connect(self.on_regions_detected)
+        self.region_detector.failed.connect(self.on_regions_failed)
+        self.region_detector.finished.connect(self.request_regions)
+        self.region_detector.start()
+
+    def on_regions_detected(self, filepath, region_map):
+        study = self.session.peek(filepath)
+        if study is None:
+            return  # Studie wurde inzwischen freigegeben
+        study.regions = region_map  # Labelvolumen bleibt bei der Studie
+        if study is self.study:
+            self.update_region_annotations()
+            self.render()
+        self.update_study_selector()
+
+    def on_regions_failed(self, filepath, message):
+        study = self.session.peek(filepath)
+        if study is not None and study.regions is None:
+            study.regions = False  # Kein erneuter Versuch für diese Studie
+        self.statusBar().showMessage(f"Regionserkennung fehlgeschlagen: {message}", 10000)
+
+    def update_region_annotations(self):
+        """Zeigt die erkannten Regionen der aktiven Studie an, sonst die Standard-Annotationen."""
+        if self.custom_annotations:
+            return  # Vom Benutzer geladene Annotationen haben Vorrang
+        regions = self.study.regions if self.study is not None else None
+        if regions and regions.regions:
+            self.set_annotations(regions.to_annotations())
+        else:
+            self.set_annotations([dict(annotation) for annotation in DEFAULT_ANNOTATIONS])
+
+    def toggle_mpr_view(self):
+        """Schaltet die Schnittansichten ein/aus."""
+        self.mpr_view.setVisible(not self.mpr_view.isVisible())
 
     def update_color_map(self, index):
-        color_map = ["Standard", "Graustufen", "Heiß/Kalt"]
-        if self.volume:
-            self.volume.GetProperty().SetColor(self.get_color_transfer_function(color_map[index]))
-            self.vtk_widget.GetRenderWindow().Render()
+        with tracer.span("update_color_map"):
+            if self.volume:
+                self.apply_transfer_function(keep_window=True)
+                self.render()
+
+    def update_window_preset(self, index):
+        with tracer.span("update_window_preset"):
+            if self.volume:
+                self.apply_transfer_function()
+                self.render()
+
+    def apply_transfer_function(self, keep_window=False):
+        """Hängt die zwischengespeicherten Funktionen von Preset und Farbschema an das aktive Volumen."""
+        if self.study is None:
+            return
+        function = self.study.transfer_functions.get(self.window_selector.currentText(),
+                                                     self.color_selector.currentText())
+        if keep_window and self.transfer_function is not None:
+            function.set_window(*self.transfer_function.window)  # Gezogenes Fenster beim Farbwechsel behalten
+        function.apply(self.volume.GetProperty())
+        self.transfer_function = function
+
+        # Regler auf das Fenster setzen, ohne erneut auszulösen
+        low, high = self.study.scalar_range
+        for slider, minimum, maximum, value in (
+                (self.level_slider, low, high, function.level),
+                (self.width_slider, 1, high - low, function.width)):
+            slider.blockSignals(True)
+            slider.setRange(int(np.floor(minimum)), int(np.ceil(maximum)))
+            slider.setValue(int(round(value)))
+            slider.blockSignals(False)
+
+    def update_window_level(self, value):
+        """Verschiebt das Fenster der aktiven Transferfunktion an Ort und Stelle."""
+        if self.transfer_function is None:
+            return
+        self.transfer_function.set_level_width(self.level_slider.value(), self.width_slider.value())
+        if not self.window_render_timer.isActive():
+            self.window_render_timer.start()
 
     def enable_roi_selection(self):
         if not self.roi_enabled:
+            if self.image_data is None or self.histogram is None:
+                QMessageBox.information(self, "Kein Volumen geladen", "Bitte laden Sie zuerst ein Volumen.")
+                return
+            if self.roi_widget is None:
+                self.create_roi_tools()
             self.roi_widget.SetInteractor(self.interactor)
             self.roi_widget.SetPlaceFactor(1.0)
-            self.roi_widget.SetInputData(self.reader.GetOutput())
+            self.roi_widget.SetInputData(self.image_data)
             self.roi_widget.PlaceWidget()
             self.roi_widget.On()
             self.roi_enabled = True
             self.roi_button.setText("ROI deaktivieren")
-            self.roi_widget.AddObserver(vtk.vtkCommand.EndInteractionEvent, self.roi_interaction_ended) # Observer hinzufügen
+
+            # Statistik-Engine arbeitet auf Views des bereits gewrappten Voxel-Arrays
+            self.roi_statistics = RoiStatistics(self.voxels, self.histogram.edges, self.study.spacing)
+            self.roi_panel.show()
+            self.calculate_roi_histogram()
         else:
             self.roi_widget.Off()
             self.roi_enabled = False
             self.roi_button.setText("ROI markieren")
-
+            self.roi_update_timer.stop()
+            self.roi_statistics = None
+            self.roi_panel.hide()
+
+    def create_roi_tools(self):
+        """Legt Box-Widget und ROI-Panel beim ersten Aktivieren an (Matplotlib wird erst hier geladen)."""
+        from vtkmodules.vtkInteractionWidgets import vtkBoxWidget
+        from histogram_dialog import RoiStatsPanel
+
+        self.roi_widget = vtkBoxWidget()
+        self.roi_widget.AddObserver(vtkCommand.InteractionEvent, self.roi_interaction_changed)
+        self.roi_widget.AddObserver(vtkCommand.EndInteractionEvent, self.roi_interaction_ended)
+        self.roi_panel = RoiStatsPanel(self)
+        self.addDockWidget(Qt.RightDockWidgetArea, self.roi_panel)
+
+    def roi_interaction_changed(self, obj, event):
+        """Wird während des Ziehens der ROI aufgerufen; die Aktualisierung erfolgt gedrosselt."""
+        if not self.roi_update_timer.isActive():
+            self.roi_update_timer.start()
 
     def roi_interaction_ended(self, obj, event):
         """Wird aufgerufen, wenn die ROI-Interaktion beendet ist."""
+        self.roi_update_timer.stop()
         if self.volume:
             self.calculate_roi_histogram()
 
     def calculate_roi_histogram(self):
-        """Berechnet das Histogramm der Intensitätswerte innerhalb der ROI."""
+        """Berechnet Histogramm und Kennwerte innerhalb der ROI und zeigt sie im ROI-Panel an."""
+        with tracer.span("calculate_roi_histogram"):
+            if not self.volume or self.roi_widget is None or not self.roi_widget.GetEnabled() \
+                    or self.roi_statistics is None:
+                return None
 
-        if self.volume and self.roi_widget.GetEnabled(): # Überprüfe ob das Volumen geladen und der Widget aktiv ist
-            polydata = vtk.vtkPolyData()
+            polydata = vtkPolyData()
             self.roi_widget.GetPolyData(polydata)
-
-            if polydata.GetNumberOfPoints() == 0:
-                QMessageBox.warning(self,"Keine ROI ausgewählt", "Bitte wählen Sie eine ROI aus, die Daten enthält.")
-                return
-
-            bounds = polydata.GetBounds()
-
-            image_data = self.reader.GetOutput()
-
-            # Extrahiere die ROI-Daten
-            extract = vtk.vtkExtractVOI()
-            extract.SetInputData(image_data)
-            extract.SetVOI(int(bounds[0]), int(bounds[1]), int(bounds[2]), int(bounds[3]), int(bounds[4]), int(bounds[5]))
-            extract.Update()
-
-            if extract.GetOutput().GetNumberOfPoints() == 0:
-                QMessageBox.warning(self,"Keine ROI ausgewählt", "Bitte wählen Sie eine ROI aus, die Daten enthält.")
-                return
-
-            roi_voxel_data = extract_voxel_data(extract.GetOutput())
-            self.roi_histogram_values = roi_voxel_data.flatten()
-            self.show_histogram()
-        else:
-            QMessageBox.information(self, "Kein Volumen geladen", "Bitte laden Sie zuerst ein Volumen.")                
+            box = None
+            if polydata.GetNumberOfPoints() > 0:
+                # Weltkoordinaten der Box unter Beachtung von Origin und Spacing in Voxel-Indizes umrechnen
+                box = bounds_to_index_box(polydata.GetBounds(), self.study.origin,
+                                          self.study.spacing, self.study.extent)
+            if box is None:
+                self.roi_histogram = None
+                self.roi_panel.show_empty()
+                return None
+
+            stats = self.roi_statistics.compute(box)
+            self.roi_histogram = stats.histogram  # Wird im Histogramm-Dialog mit angezeigt
+            self.roi_panel.show_stats(stats)
+            return stats
 
     def calculate_histogram(self):
         """Berechnet das Histogramm der gesamten Intensitätswerte."""
-        image_data = self.reader.GetOutput()
+        image_data = self.image_data
         voxel_data = extract_voxel_data(image_data)
-        self.histogram_values = voxel_data.flatten()
-        self.roi_histogram_values = None #Zurücksetzen der ROI-Werte
+        # Einmalig pro Volumen und Bin-Konfiguration berechnet, danach aus dem Cache
+        self.histogram = self.histogram_cache.get(volume_key(image_data), voxel_data, DEFAULT_BINS)
+        self.roi_histogram = None #Zurücksetzen der ROI-Werte
 
     def show_histogram(self):
         """Zeigt das Histogramm mit optionalen ROI-Daten an."""
-        dialog = HistogramDialog(self.histogram_values, self.roi_histogram_values)
-        dialog.exec_()
-    
-    def get_color_transfer_function(self, color_map_name):
-        """Gibt die Farbtransferschemen basierend auf dem Namen zurück."""
-        if color_map_name == "Graustufen":
-            color_transfer_function = vtk.vtkColorTransferFunction()
-            color_transfer_function.AddRGBPoint(0, 0.0, 0.0, 0.0)
-            color_transfer_function.AddRGBPoint(255, 1.0, 1.0, 1.0)
-            return color_transfer_function
-        elif color_map_name == "Heiß/Kalt":
-            color_transfer_function = vtk.vtkColorTransferFunction()
-            color_transfer_function.AddRGBPoint(0.0, 0.0, 0.0, 0.0)  # Blau
-            color_transfer_function.AddRGBPoint(500, 1.0, 0.5, 0.3) 
-
-            return color_transfer_function
-        else:  # Standard-Farbschema
-            color_transfer_function = vtk.vtkColorTransferFunction()
-            color_transfer_function.AddRGBPoint(0, 0.0, 0.0, 0.0)
-            color_transfer_function.AddRGBPoint(255, 0.0, 1.0, 1.0)
-
-            return color_transfer_function
-
-    def get_opacity_transfer_function(self):
-        """Gibt die Opazitäts-Transferfunktion zurück."""
-        opacity_transfer_function = vtk.vtkPiecewiseFunction()
-        opacity_transfer_function.AddPoint(0, 0.0)   # Niedrigste Intensität: vollständig transparent
-        opacity_transfer_function.AddPoint(255, 1.0) # Höchste Intensität: vollständig undurchsichtig
-        return opacity_transfer_function
+        with tracer.span("show_histogram"):
+            if self.histogram is None:
+                QMessageBox.information(self, "Kein Volumen geladen", "Bitte laden Sie zuerst ein Volumen.")
+                return
+            from histogram_dialog import HistogramDialog  # Lädt Matplotlib beim ersten Öffnen
 
+            dialog = HistogramDialog(self.histogram, self.roi_histogram)
+            dialog.exec_()
+    
     def add_3d_labels(self):
         """Zeigt 3D-Labels mit farbigen Ecken an."""
-        for i, annotation in enumerate(self.annotations):
-            # Text-Actor
-            text_actor = vtk.vtkBillboardTextActor3D()
-            text_actor.SetInput(annotation["name"])
-            text_actor.SetPosition(annotation["position"])
-            text_actor.GetTextProperty().SetColor(1, 1, 1)  # Weißer Text
-            text_actor.GetTextProperty().SetFontSize(12)
-            self.renderer.AddActor(text_actor)
-            self.text_actors.append(text_actor)
-
-            # Farbige Ecke (vtkCubeSource für eine einfache Ecke)
-            cube_source = vtk.vtkCubeSource()
-            cube_source.SetXLength(5)  # Größe der Ecke anpassen
-            cube_source.SetYLength(5)
-            cube_source.SetZLength(5)
-            cube_source.Update()
-
-            mapper = vtk.vtkPolyDataMapper()
-            mapper.SetInputData(cube_source.GetOutput())
-
-            actor = vtk.vtkActor()
-            actor.SetMapper(mapper)
-            actor.GetProperty().SetColor(self.region_colors[i % len(self.region_colors)])  # Farbe aus der Liste
-            actor.SetPosition(annotation["position"][0]-7, annotation["position"][1]-7, annotation["position"][2]-7) # Ecke etwas versetzen, damit sie neben dem Text ist.
-
-            self.renderer.AddActor(actor)
-            self.text_actors.append(actor) # Füge auch die Ecke der Liste hinzu, für das toggle
-
-        self.vtk_widget.GetRenderWindow().Render()
+        self.annotation_layer.set_annotations(self.annotations)
+        self.annotation_layer.attach()
+        self.labels_added = True
+        self.render()
 
     def toggle_labels(self):
         """Schaltet die Sichtbarkeit der 3D-Beschriftungen ein/aus."""
-        for actor in self.text_actors:
-            actor.SetVisibility(not actor.GetVisibility())
-        self.vtk_widget.GetRenderWindow().Render()
-
+        self.annotation_layer.set_visible(not self.annotation_layer.visible)  # Marker und Labels gemeinsam
+        self.render()
+
+    def load_annotation_file(self):
+        """Lädt einen Annotationssatz aus einer JSON- oder CSV-Datei."""
+        filepath, _ = QFileDialog.getOpenFileName(
+            self, "Annotationen laden", "", "Annotationen (*.json *.csv)")
+        if not filepath:
+            return
+        try:
+            with tracer.span("load_annotations", filepath=filepath):
+                annotations = load_annotations(filepath)
+        except (OSError, ValueError, KeyError) as error:
+            QMessageBox.warning(self, "Annotationen", f"Datei konnte nicht gelesen werden: {error}")
+            return
+        self.custom_annotations = True
+        self.set_annotations(annotations)
+        self.render()
+
+    def set_annotations(self, annotations):
+        """Übernimmt neue Annotationen in Labels und Legende."""
+        self.annotations = annotations
+        self.annotation_layer.set_annotations(self.annotations)
+        if hasattr(self, "legend_widget"):
+            # Legende mit den neuen Annotationen neu aufbauen
+            visible = self.legend_widget.isVisible()
+            self.legend_widget.deleteLater()
+            self.legend_labels = []
+            self.create_legend()
+            self.legend_widget.setVisible(visible)
+
+    def on_mouse_move(self, obj, event):
+        """Merkt sich die Mausposition; das Picking erfolgt gedrosselt."""
+        if not self.labels_added or (self.lod_controller and self.lod_controller.interacting):
+            return  # Während Kamerabewegungen kein Hover
+        self.hover_position = self.interactor.GetEventPosition()
+        if not self.hover_timer.isActive():
+            self.hover_timer.start()
+
+    def update_hover(self):
+        """Zeigt die Annotation unter dem Mauszeiger an."""
+        if self.hover_position is None:
+            return
+        with tracer.span("pick_annotation"):
+            index = self.annotation_layer.pick(*self.hover_position)
+        if index == self.annotation_layer.hovered:
+            return
+        self.annotation_layer.set_hovered(index)
+        if index is None:
+            self.annotation_info_label.hide()
+        else:
+            annotation = self.annotations[index]
+            self.annotation_info_label.setText(f"{annotation['name']}: {annotation['description']}")
+            self.annotation_info_label.show()
+        self.render()
+
+    def on_left_button_press(self, obj, event):
+        self.click_position = self.interactor.GetEventPosition()
+
+    def on_left_button_release(self, obj, event):
+        """Ein Klick ohne Mausbewegung auf einen Marker öffnet die Beschreibung."""
+        position = self.interactor.GetEventPosition()
+        if not self.labels_added or position != self.click_position:
+            return
+        index = self.annotation_layer.pick(*position)
+        if index is not None:
+            self.show_description(self.annotations[index])
+
+
+    def toggle_fps_overlay(self):
+        """Schaltet die FPS-/Latenz-Anzeige im Renderfenster ein/aus."""
+        self.frame_monitor.set_overlay_visible(not self.frame_monitor.overlay_visible())
+        self.render()
+
+    def export_trace(self):
+        """Exportiert den Sitzungs-Trace als JSON oder im Chrome-Trace-Format."""
+        chrome_filter = "Chrome-Trace (*.json)"
+        filepath, selected_filter = QFileDialog.getSaveFileName(
+            self, "Trace exportieren", "trace.json", f"{chrome_filter};;JSON (*.json)")
+        if not filepath:
+            return
+        try:
+            if selected_filter == chrome_filter:
+                tracer.export_chrome_trace(filepath)
+            else:
+                tracer.export_json(filepath)
+        except OSError as error:
+            QMessageBox.warning(self, "Export fehlgeschlagen", str(error))
+
+    def closeEvent(self, event):
+        """Beendet einen laufenden Ladevorgang, bevor das Fenster geschlossen wird."""
+        if self.loader is not None and self.loader.isRunning():
+            self.loader.cancel()
+            self.loader.wait()
+        if self.surface_extractor is not None:
+            self.surface_extractor.wait()
+        if self.region_detector is not None:
+            self.region_detector.wait()
+        self.detach_active_study()  # Beendet den Vorauslade-Thread
+        self.session.clear()
+        super().closeEvent(event)
 
     def show_description(self, annotation):
         """Zeigt die ausführliche Beschreibung der Region an."""
@@ -471,7 +1098,13 @@ class VisualizationApp(QMainWindow):
         description_dialog.exec_()
         
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    # --startup-timing: Startphasen bis zum ersten Bild ausgeben und sofort beenden
+    startup_timing = "--startup-timing" in sys.argv
+    app = QApplication([arg for arg in sys.argv if arg != "--startup-timing"])
+    STARTUP_MARKS.append(("qt_application", time.perf_counter()))
     window = VisualizationApp()
+    STARTUP_MARKS.append(("create_window", time.perf_counter()))
+    if startup_timing:
+        window.first_painted.connect(lambda: (report_startup(STARTUP_MARKS), app.quit()))
     window.show()
     app.exec_()
@@ -0,0 +1,338 @@
+# Standardbibliotheken
+import threading
+from collections import OrderedDict
+
+# Drittanbieter-Bibliotheken
+import numpy as np
+from PyQt5.QtWidgets import QApplication, QDockWidget, QGridLayout, QLabel, QSlider, QVBoxLayout, QWidget
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+from vtkmodules.util import numpy_support
+
+# VTK-Bibliotheken
+import vtkmodules.vtkRenderingOpenGL2  # OpenGL-Backend der Render-Fenster  # noqa: F401
+from vtkmodules.qt.QVTKRenderWindowInteractor import QVTKRenderWindowInteractor
+from vtkmodules.vtkCommonDataModel import vtkImageData
+from vtkmodules.vtkInteractionStyle import vtkInteractorStyleImage
+from vtkmodules.vtkRenderingCore import vtkImageActor, vtkRenderer
+
+# Projektmodule
+from instrumentation import tracer
+
+# Schnittebenen, Indexachse im (z, y, x)-Array
+AXIAL, CORONAL, SAGITTAL = 0, 1, 2
+PLANE_NAMES = ("Axial", "Koronal", "Sagittal")
+
+# Anzahl zwischengespeicherter Schnittbilder über alle Ebenen
+SLICE_BUFFER_SIZE = 96
+
+# Vorausgeladene Schnitte in Scrollrichtung bzw. entgegen der Scrollrichtung
+PREFETCH_AHEAD = 8
+PREFETCH_BEHIND = 2
+
+# Bildwiederholrate, falls der Bildschirm keine liefert
+FALLBACK_REFRESH_RATE = 60.0
+
+# Ruhezeit nach dem letzten Sliderereignis, bevor die 3D-Ansicht nachgezogen wird
+SETTLE_DELAY_MS = 250
+
+
+def extract_slice(voxels, plane, index):
+    """Liefert einen Schnitt des (z, y, x)-Arrays als zusammenhängende 2D-Kopie (Zeilen = zweite Bildachse).
+
+    Auch axiale Schnitte werden kopiert: ein View auf eine Memory-Map würde die Seiten erst beim Anzeigen
+    einlesen, und die Vorauslese im Ringpuffer wäre wirkungslos.
+    """
+    if plane == AXIAL:
+        image = voxels[index, :, :]  # (y, x)
+    elif plane == CORONAL:
+        image = voxels[:, index, :]  # (z, x)
+    else:
+        image = voxels[:, :, index]  # (z, y)
+    return np.array(image, copy=True, order="C")
+
+
+def slice_count(voxels, plane):
+    return voxels.shape[plane]
+
+
+def slice_spacing(spacing, plane):
+    """Pixelabstand (Spalten, Zeilen) eines Schnitts aus dem Spacing (x, y, z) des Volumens."""
+    if plane == AXIAL:
+        return spacing[0], spacing[1]
+    if plane == CORONAL:
+        return spacing[0], spacing[2]
+    return spacing[1], spacing[2]
+
+
+class SliceRingBuffer:
+    """Begrenzter, threadsicherer Zwischenspeicher für Schnittbilder; die ältesten Einträge fallen heraus."""
+
+    def __init__(self, capacity=SLICE_BUFFER_SIZE):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, plane, index):
+        with self._lock:
+            image = self._entries.get((plane, index))
+            if image is not None:
+                self._entries.move_to_end((plane, index))
+            return image
+
+    def put(self, plane, index, image):
+        with self._lock:
+            self._entries[(plane, index)] = image
+            self._entries.move_to_end((plane, index))
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SlicePrefetcher(threading.Thread):
+    """Lädt im Hintergrund die Nachbarschnitte der zuletzt angezeigten Position in den Ringpuffer."""
+
+    def __init__(self, voxels, buffer, ahead=PREFETCH_AHEAD, behind=PREFETCH_BEHIND):
+        super().__init__(name="SlicePrefetcher", daemon=True)
+        self.voxels = voxels
+        self.buffer = buffer
+        self.ahead = ahead
+        self.behind = behind
+        self._condition = threading.Condition()
+        self._target = None  # (plane, index, direction)
+        self._stopped = False
+
+    def request(self, plane, index, direction):
+        """Setzt die neue Position; eine laufende Vorauslese-Runde wird zugunsten der neuen abgebrochen."""
+        with self._condition:
+            self._target = (plane, index, direction or 1)
+            self._condition.notify()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+    def run(self):
+        while True:
+            with self._condition:
+                while self._target is None and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                target = self._target
+                self._target = None
+
+            plane, index, direction = target
+            for candidate in self._candidates(plane, index, direction):
+                with self._condition:
+                    if self._stopped or self._target is not None:
+                        break  # Neue Position angefordert
+                if (plane, candidate) in self.buffer:
+                    continue
+                with tracer.span("prefetch_slice", "mpr", plane=PLANE_NAMES[plane], index=candidate):
+                    self.buffer.put(plane, candidate, extract_slice(self.voxels, plane, candidate))
+
+    def _candidates(self, plane, index, direction):
+        """Reihenfolge der vorauszuladenden Schnitte: zuerst in Scrollrichtung, dann dahinter."""
+        last = slice_count(self.voxels, plane) - 1
+        order = [index + direction * step for step in range(1, self.ahead + 1)]
+        order += [index - direction * step for step in range(1, self.behind + 1)]
+        return [candidate for candidate in order if 0 <= candidate <= last]
+
+
+class SlicePane(QWidget):
+    """Ein 2D-Schnittfenster mit eigenem Renderfenster, unabhängig vom 3D-Volumen-Renderer."""
+
+    def __init__(self, plane, parent=None):
+        super().__init__(parent)
+        self.plane = plane
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.title = QLabel(PLANE_NAMES[plane])
+        layout.addWidget(self.title)
+
+        self.vtk_widget = QVTKRenderWindowInteractor(self)
+        layout.addWidget(self.vtk_widget)
+
+        self.slider = QSlider(Qt.Horizontal)
+        layout.addWidget(self.slider)
+
+        self.renderer = vtkRenderer()
+        self.renderer.SetBackground(0, 0, 0)
+        self.renderer.GetActiveCamera().ParallelProjectionOn()
+        self.vtk_widget.GetRenderWindow().AddRenderer(self.renderer)
+        self.vtk_widget.GetRenderWindow().GetInteractor().SetInteractorStyle(vtkInteractorStyleImage())
+
+        # Das Bild wird in-place ausgetauscht, die Pipeline bleibt bestehen
+        self.image_data = vtkImageData()
+        self.image_actor = vtkImageActor()
+        self.image_actor.GetMapper().SetInputData(self.image_data)
+        self.image_actor.SetVisibility(False)
+        self.renderer.AddActor(self.image_actor)
+        self._array = None  # Hält das gewrappte Array am Leben
+
+    def initialize(self):
+        self.vtk_widget.Initialize()
+
+    def set_window_level(self, window, level):
+        self.image_actor.GetProperty().SetColorWindow(window)
+        self.image_actor.GetProperty().SetColorLevel(level)
+
+    def show_image(self, image, spacing, reset_camera=False):
+        """Zeigt ein 2D-Array (Zeilen, Spalten) ohne weitere Kopie an."""
+        self._array = image
+        scalars = numpy_support.numpy_to_vtk(image.reshape(-1), deep=False)
+        rows, columns = image.shape
+        self.image_data.SetDimensions(columns, rows, 1)
+        self.image_data.SetSpacing(spacing[0], spacing[1], 1.0)
+        self.image_data.GetPointData().SetScalars(scalars)
+        self.image_data.Modified()
+        self.image_actor.SetVisibility(True)
+        if reset_camera:
+            self.renderer.ResetCamera()
+        self.render()
+
+    def clear(self):
+        self.image_actor.SetVisibility(False)
+        self._array = None
+        self.render()
+
+    def render(self):
+        if not self.isVisible():
+            return  # Verdeckte Fenster werden beim Einblenden nachgezogen
+        with tracer.span("RenderSlice", "render", plane=PLANE_NAMES[self.plane]):
+            self.vtk_widget.GetRenderWindow().Render()
+
+
+class MPRView(QDockWidget):
+    """Multiplanare Rekonstruktion mit axialer, koronaler und sagittaler Ansicht.
+
+    Sliderereignisse werden gesammelt und höchstens einmal pro Bildschirmaktualisierung
+    angewendet. Dabei werden nur die 2D-Fenster gerendert; slice_settled meldet die
+    Position erst, wenn das Scrollen ruht.
+    """
+
+    slice_settled = pyqtSignal(int, int)  # Ebene, Index
+
+    def __init__(self, parent=None):
+        super().__init__("Schnittansichten", parent)
+        container = QWidget()
+        layout = QGridLayout(container)
+        self.panes = [SlicePane(plane, container) for plane in (AXIAL, CORONAL, SAGITTAL)]
+        for column, pane in enumerate(self.panes):
+            layout.addWidget(pane, 0, column)
+            pane.slider.valueChanged.connect(lambda value, plane=pane.plane: self.request_slice(plane, value))
+        self.setWidget(container)
+
+        self.voxels = None
+        self.spacing = (1.0, 1.0, 1.0)
+        self.buffer = SliceRingBuffer()
+        self.prefetcher = None
+        self.current = [None, None, None]
+        self._pending = {}
+        self._unsettled = set()  # Ebenen, deren Position noch nicht gemeldet wurde
+
+        # Sammelt Sliderereignisse auf die Bildwiederholrate des Bildschirms
+        screen = QApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen is not None and screen.refreshRate() > 0 else FALLBACK_REFRESH_RATE
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.setInterval(max(1, int(1000 / refresh_rate)))
+        self.frame_timer.timeout.connect(self.apply_pending)
+
+        self.settle_timer = QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.setInterval(SETTLE_DELAY_MS)
+        self.settle_timer.timeout.connect(self.emit_settled)
+
+    def initialize(self):
+        for pane in self.panes:
+            pane.initialize()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        for pane in self.panes:
+            pane.render()
+
+    def set_volume(self, voxels, spacing, scalar_range):
+        """Übernimmt das (z, y, x)-Array des geladenen Volumens und zeigt jeweils den mittleren Schnitt."""
+        self.clear_volume()
+        self.voxels = voxels
+        self.spacing = spacing
+        low, high = scalar_range
+        self.prefetcher = SlicePrefetcher(voxels, self.buffer)
+        self.prefetcher.start()
+
+        for pane in self.panes:
+            pane.set_window_level(max(high - low, 1.0), (high + low) / 2.0)
+            pane.slider.blockSignals(True)
+            pane.slider.setRange(0, slice_count(voxels, pane.plane) - 1)
+            pane.slider.setValue(slice_count(voxels, pane.plane) // 2)
+            pane.slider.blockSignals(False)
+            self._show(pane.plane, pane.slider.value(), reset_camera=True)
+
+    def clear_volume(self):
+        """Beendet das Vorausladen und gibt alle Verweise auf das Volumen frei."""
+        self.frame_timer.stop()
+        self.settle_timer.stop()
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+            self.prefetcher.join()
+            self.prefetcher = None
+        self.buffer.clear()
+        self.voxels = None
+        self.current = [None, None, None]
+        self._pending = {}
+        self._unsettled = set()
+        for pane in self.panes:
+            pane.clear()
+
+    def set_slice(self, plane, index):
+        """Setzt den Slider einer Ebene; die Anzeige folgt gebündelt wie bei Benutzereingaben."""
+        self.panes[plane].slider.setValue(index)
+
+    def request_slice(self, plane, index):
+        """Merkt sich nur die Zielposition; angewendet wird beim nächsten Bildtakt."""
+        if self.voxels is None:
+            return
+        self._pending[plane] = index
+        if not self.frame_timer.isActive():
+            self.frame_timer.start()
+        self.settle_timer.start()  # Neustart bei jedem Ereignis
+
+    def apply_pending(self):
+        with tracer.span("apply_slice_updates", "mpr"):
+            pending, self._pending = self._pending, {}
+            for plane, index in pending.items():
+                if index != self.current[plane]:
+                    self._show(plane, index)
+                    self._unsettled.add(plane)
+
+    def emit_settled(self):
+        unsettled, self._unsettled = self._unsettled, set()
+        for plane in sorted(unsettled):
+            self.slice_settled.emit(plane, self.current[plane])
+
+    def _show(self, plane, index, reset_camera=False):
+        previous = self.current[plane]
+        image = self.buffer.get(plane, index)
+        if image is None:
+            image = extract_slice(self.voxels, plane, index)
+            self.buffer.put(plane, index, image)
+        self.current[plane] = index
+        self.panes[plane].show_image(image, slice_spacing(self.spacing, plane), reset_camera)
+
+        direction = 1 if previous is None or index >= previous else -1
+        self.prefetcher.request(plane, index, direction)
@@ -0,0 +1,263 @@
+# Standardbibliotheken
+import hashlib
+import math
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Drittanbieter-Bibliotheken
+import numpy as np
+from vtkmodules.vtkCommonCore import vtkSMPTools
+from vtkmodules.vtkCommonDataModel import vtkImageData
+from vtkmodules.vtkImagingCore import vtkImageResample
+from vtkmodules.vtkImagingGeneral import vtkImageGaussianSmooth
+
+# Projektmodule
+from instrumentation import tracer
+from roi_stats import voxel_volume_view
+from session import image_data_bytes
+from volume_cache import get_content_hash, set_content_hash, wrap_as_image_data
+
+# Schritte in ihrer festen Reihenfolge: Zuschneiden zuerst, damit die teuren Filter auf weniger Voxeln laufen
+STEP_LABELS = OrderedDict([
+    ("crop", "Zuschneiden"),
+    ("clamp", "Intensitäten begrenzen"),
+    ("resample", "Isotrop resampeln"),
+    ("smooth", "Glätten"),
+])
+
+# Ein Schritt mit seinen Parametern (Tupel, geht in den Cache-Schlüssel ein):
+#   crop: (x0, x1, y0, y1, z0, z1) als Anteile 0..1 je Achse
+#   clamp: (untere, obere Grenze)
+#   resample: (Spacing in mm,), 0 = kleinstes Spacing des Eingangs
+#   smooth: (Standardabweichung in mm,)
+PreprocessingStep = namedtuple("PreprocessingStep", ["name", "params"])
+
+# Anzahl Threads für die VTK-Filter und die blockweisen NumPy-Schritte
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Speicherbudget für Zwischenergebnisse (über THORAX_PREPROCESSING_BUDGET_MB änderbar)
+DEFAULT_MEMORY_BYTES = int(os.environ.get("THORAX_PREPROCESSING_BUDGET_MB", 1024)) * 1024 * 1024
+
+# Radius des Gauß-Kerns in Standardabweichungen
+GAUSSIAN_RADIUS_FACTOR = 3.0
+
+
+def _configure_threads(algorithm, workers):
+    """Threads eines vtkThreadedImageAlgorithm; SMP nur, wenn VTK mit einem parallelen SMP-Backend gebaut ist."""
+    algorithm.SetNumberOfThreads(workers)
+    if vtkSMPTools.GetBackend() != "Sequential":
+        algorithm.SetEnableSMP(True)
+
+
+def _detach_output(algorithm):
+    """Übernimmt die Ausgabe eines Filters ohne Verbindung zur Pipeline (ohne Kopie der Voxel)."""
+    output = vtkImageData()
+    output.ShallowCopy(algorithm.GetOutput())
+    return output
+
+
+def _world_origin(image_data):
+    """Weltposition des ersten Voxels (der Extent der Ergebnisse beginnt immer bei 0)."""
+    start = image_data.GetExtent()[::2]
+    return tuple(image_data.GetOrigin()[axis] + start[axis] * image_data.GetSpacing()[axis] for axis in range(3))
+
+
+def _wrap_voxels(voxels, spacing, origin, name):
+    nz, ny, nx = voxels.shape
+    return wrap_as_image_data(voxels.reshape(-1), {
+        "name": name,
+        "extent": [0, nx - 1, 0, ny - 1, 0, nz - 1],
+        "spacing": list(spacing),
+        "origin": list(origin),
+        "content_hash": "",  # Wird von run_preprocessing durch den Schritt-Schlüssel ersetzt
+    })
+
+
+def _scalar_name(image_data):
+    return image_data.GetPointData().GetScalars().GetName() or "scalars"
+
+
+def _index_range(lower, upper, size):
+    """Anteile einer Achse als Index-Slice mit mindestens einem Voxel."""
+    start = min(int(math.floor(lower * size)), size - 1)
+    return slice(start, min(size, max(start + 1, int(math.ceil(upper * size)))))
+
+
+def crop_volume(image_data, x0, x1, y0, y1, z0, z1, workers=DEFAULT_WORKERS):
+    """Schneidet das Volumen auf Anteile 0..1 jeder Achse zu."""
+    voxels = voxel_volume_view(image_data)
+    nz, ny, nx = voxels.shape
+    parts = (_index_range(x0, x1, nx), _index_range(y0, y1, ny), _index_range(z0, z1, nz))
+    cropped = np.ascontiguousarray(voxels[parts[2], parts[1], parts[0]])
+    spacing = image_data.GetSpacing()
+    origin = tuple(value + part.start * spacing[axis]
+                   for axis, (value, part) in enumerate(zip(_world_origin(image_data), parts)))
+    return _wrap_voxels(cropped, spacing, origin, _scalar_name(image_data))
+
+
+def clamp_volume(image_data, lower, upper, workers=DEFAULT_WORKERS):
+    """Begrenzt die Intensitäten auf [lower, upper]; die z-Blöcke werden parallel bearbeitet."""
+    voxels = voxel_volume_view(image_data)
+    if np.issubdtype(voxels.dtype, np.integer):
+        info = np.iinfo(voxels.dtype)
+        lower, upper = max(math.ceil(lower), info.min), min(math.floor(upper), info.max)
+    clamped = np.empty_like(voxels)
+    bounds = np.linspace(0, voxels.shape[0], min(workers, voxels.shape[0]) + 1).astype(int)
+    with ThreadPoolExecutor(max_workers=len(bounds) - 1) as executor:
+        list(executor.map(lambda start, stop: np.clip(voxels[start:stop], lower, upper, out=clamped[start:stop]),
+                          bounds[:-1], bounds[1:]))
+    return _wrap_voxels(clamped, image_data.GetSpacing(), _world_origin(image_data), _scalar_name(image_data))
+
+
+def resample_isotropic(image_data, spacing=0.0, workers=DEFAULT_WORKERS):
+    """Resampelt linear auf isotropes Spacing (0 = kleinstes Spacing des Eingangs)."""
+    target = spacing or min(image_data.GetSpacing())
+    resample = vtkImageResample()
+    resample.SetInputData(image_data)
+    for axis in range(3):
+        resample.SetAxisOutputSpacing(axis, target)
+    resample.SetInterpolationModeToLinear()
+    _configure_threads(resample, workers)
+    resample.Update()
+    return _detach_output(resample)
+
+
+def smooth_volume(image_data, sigma, workers=DEFAULT_WORKERS):
+    """Gauß-Glättung mit Standardabweichung in mm (pro Achse in Voxel umgerechnet)."""
+    smooth = vtkImageGaussianSmooth()
+    smooth.SetInputData(image_data)
+    smooth.SetDimensionality(3)
+    smooth.SetStandardDeviations(*(sigma / axis_spacing for axis_spacing in image_data.GetSpacing()))
+    smooth.SetRadiusFactor(GAUSSIAN_RADIUS_FACTOR)
+    _configure_threads(smooth, workers)
+    smooth.Update()
+    return _detach_output(smooth)
+
+
+STEP_FUNCTIONS = {
+    "crop": crop_volume,
+    "clamp": clamp_volume,
+    "resample": resample_isotropic,
+    "smooth": smooth_volume,
+}
+
+
+def build_steps(crop=None, clamp=None, spacing=None, sigma=None):
+    """Stellt die aktiven Schritte in fester Reihenfolge zusammen (None = Schritt aus)."""
+    steps = []
+    if crop is not None and tuple(crop) != (0.0, 1.0, 0.0, 1.0, 0.0, 1.0):
+        steps.append(PreprocessingStep("crop", tuple(float(value) for value in crop)))
+    if clamp is not None:
+        steps.append(PreprocessingStep("clamp", (float(clamp[0]), float(clamp[1]))))
+    if spacing is not None:
+        steps.append(PreprocessingStep("resample", (float(spacing),)))
+    if sigma:
+        steps.append(PreprocessingStep("smooth", (float(sigma),)))
+    return tuple(steps)
+
+
+def input_key(image_data):
+    """Schlüssel des Eingangs aus Inhalts-Hash und Geometrie."""
+    identity = f"{get_content_hash(image_data)}|{image_data.GetDimensions()}|{image_data.GetSpacing()}|" \
+               f"{_world_origin(image_data)}"
+    return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+
+def step_keys(base_key, steps):
+    """Verkettete Schlüssel: jeder Schritt hängt vom Schlüssel seines Vorgängers ab."""
+    keys = []
+    for step in steps:
+        base_key = hashlib.sha1(f"{base_key}|{step.name}|{step.params!r}".encode("utf-8")).hexdigest()
+        keys.append(base_key)
+    return keys
+
+
+class PreprocessingCache:
+    """Zwischenergebnisse je Schritt-Schlüssel: LRU im Speicher, optional dauerhaft im Volumen-Cache."""
+
+    def __init__(self, volume_cache=None, max_bytes=DEFAULT_MEMORY_BYTES):
+        self.volume_cache = volume_cache
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Liefert eine flache Kopie (eigenes vtkImageData, gemeinsame Voxel) oder None."""
+        with self._lock:
+            image_data = self._entries.get(key)
+            if image_data is not None:
+                self._entries.move_to_end(key)
+        if image_data is None and self.volume_cache is not None:
+            image_data = self.volume_cache.load(key)  # Gemappt von der Festplatte
+            if image_data is not None:
+                self._remember(key, image_data)
+        if image_data is None:
+            return None
+        result = vtkImageData()
+        result.ShallowCopy(image_data)
+        return result
+
+    def put(self, key, image_data):
+        """Speichert ein Ergebnis; auf der Festplatte als gemappte Binärdatei für spätere Sitzungen."""
+        if self.volume_cache is not None:
+            try:
+                self.volume_cache.store(key, image_data)  # Setzt auch den Inhalts-Hash
+            except OSError:
+                pass  # Ohne Platz im Cache-Verzeichnis bleibt es beim Speicher-Cache
+        self._remember(key, image_data)
+
+    def _remember(self, key, image_data):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= image_data_bytes(previous)
+            self._entries[key] = image_data
+            self.current_bytes += image_data_bytes(image_data)
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= image_data_bytes(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+def run_preprocessing(image_data, steps, cache=None, progress_callback=None, abort_callback=None,
+                      workers=DEFAULT_WORKERS):
+    """Wendet die Schritte an und liefert (vtkImageData, Schlüssel des letzten Schritts).
+
+    Gerechnet wird erst ab dem letzten zwischengespeicherten Schritt; ändert sich ein Parameter,
+    bleiben die Ergebnisse davor gültig. Ohne Schritte wird der Eingang mit Schlüssel None geliefert,
+    bei Abbruch (None, None).
+    """
+    if not steps:
+        return image_data, None
+    keys = step_keys(input_key(image_data), steps)
+
+    # Vom Ende her den letzten bereits berechneten Schritt suchen
+    start, current = 0, image_data
+    if cache is not None:
+        for index in range(len(steps), 0, -1):
+            cached = cache.get(keys[index - 1])
+            if cached is not None:
+                start, current = index, cached
+                break
+
+    for index in range(start, len(steps)):
+        if abort_callback is not None and abort_callback():
+            return None, None
+        step = steps[index]
+        with tracer.span(f"preprocess_{step.name}", "load", params=list(step.params)):
+            current = STEP_FUNCTIONS[step.name](current, *step.params, workers=workers)
+        set_content_hash(current, keys[index])  # Eindeutig aus Eingang und Parametern
+        if cache is not None:
+            cache.put(keys[index], current)
+        if progress_callback is not None:
+            progress_callback((index + 1 - start) / (len(steps) - start))
+    if progress_callback is not None and start == len(steps):
+        progress_callback(1.0)
+    return current, keys[-1]
@@ -0,0 +1,94 @@
+"""Dialog zur Konfiguration der Vorverarbeitung (Zuschneiden, Begrenzen, Resampeln, Glätten)."""
+
+# Drittanbieter-Bibliotheken
+from PyQt5.QtWidgets import (
+    QDialog, QDialogButtonBox, QDoubleSpinBox, QFormLayout, QGridLayout, QGroupBox, QLabel, QSpinBox, QVBoxLayout
+)
+
+# Projektmodule
+from preprocessing import STEP_LABELS, build_steps
+
+# Wertebereich der Intensitätsgrenzen (Hounsfield-Einheiten)
+CLAMP_RANGE = (-3000, 5000)
+DEFAULT_CLAMP = (-1024, 3071)
+
+
+class PreprocessingDialog(QDialog):
+    """Jeder Schritt ist eine abschaltbare Gruppe; die Reihenfolge ist fest."""
+
+    def __init__(self, steps=(), parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Vorverarbeitung")
+        params = {step.name: step.params for step in steps}
+        layout = QVBoxLayout(self)
+
+        # Zuschneiden: Anteile je Achse in Prozent
+        self.crop_group = self._group("crop", params, layout)
+        crop_layout = QGridLayout(self.crop_group)
+        crop = params.get("crop", (0.0, 1.0, 0.0, 1.0, 0.0, 1.0))
+        self.crop_spins = []
+        for row, axis in enumerate("XYZ"):
+            crop_layout.addWidget(QLabel(f"{axis} von/bis (%)"), row, 0)
+            for column in range(2):
+                spin = QSpinBox()
+                spin.setRange(0, 100)
+                spin.setValue(round(crop[2 * row + column] * 100))
+                crop_layout.addWidget(spin, row, column + 1)
+                self.crop_spins.append(spin)
+
+        self.clamp_group = self._group("clamp", params, layout)
+        clamp_layout = QFormLayout(self.clamp_group)
+        clamp = params.get("clamp", DEFAULT_CLAMP)
+        self.clamp_lower = QSpinBox()
+        self.clamp_upper = QSpinBox()
+        for spin, value in ((self.clamp_lower, clamp[0]), (self.clamp_upper, clamp[1])):
+            spin.setRange(*CLAMP_RANGE)
+            spin.setValue(int(value))
+        clamp_layout.addRow("Untere Grenze:", self.clamp_lower)
+        clamp_layout.addRow("Obere Grenze:", self.clamp_upper)
+
+        self.resample_group = self._group("resample", params, layout)
+        resample_layout = QFormLayout(self.resample_group)
+        self.spacing_spin = QDoubleSpinBox()
+        self.spacing_spin.setRange(0.0, 10.0)
+        self.spacing_spin.setSingleStep(0.1)
+        self.spacing_spin.setSuffix(" mm")
+        self.spacing_spin.setSpecialValueText("Kleinstes Spacing")  # Wert 0
+        self.spacing_spin.setValue(params.get("resample", (0.0,))[0])
+        resample_layout.addRow("Spacing:", self.spacing_spin)
+
+        self.smooth_group = self._group("smooth", params, layout)
+        smooth_layout = QFormLayout(self.smooth_group)
+        self.sigma_spin = QDoubleSpinBox()
+        self.sigma_spin.setRange(0.1, 10.0)
+        self.sigma_spin.setSingleStep(0.1)
+        self.sigma_spin.setSuffix(" mm")
+        self.sigma_spin.setValue(params.get("smooth", (1.0,))[0])
+        smooth_layout.addRow("Standardabweichung:", self.sigma_spin)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+    @staticmethod
+    def _group(name, params, layout):
+        group = QGroupBox(STEP_LABELS[name])
+        group.setCheckable(True)
+        group.setChecked(name in params)
+        layout.addWidget(group)
+        return group
+
+    def steps(self):
+        """Liefert die eingestellten Schritte als PreprocessingStep-Tupel."""
+        crop = None
+        if self.crop_group.isChecked():
+            values = [spin.value() / 100 for spin in self.crop_spins]
+            crop = [value for axis in range(3)
+                    for value in sorted(values[2 * axis:2 * axis + 2])]  # von <= bis
+        clamp = None
+        if self.clamp_group.isChecked():
+            clamp = sorted((self.clamp_lower.value(), self.clamp_upper.value()))
+        spacing = self.spacing_spin.value() if self.resample_group.isChecked() else None
+        sigma = self.sigma_spin.value() if self.smooth_group.isChecked() else None
+        return build_steps(crop, clamp, spacing, sigma)
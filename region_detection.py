@@ -0,0 +1,290 @@
+# Standardbibliotheken
+import hashlib
+import os
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Drittanbieter-Bibliotheken
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkCommonDataModel import vtkImageData
+from vtkmodules.vtkImagingMorphological import vtkImageConnectivityFilter
+
+# Projektmodule
+from annotations import REGION_COLORS
+from instrumentation import tracer
+from roi_stats import voxel_volume_view
+from volume_cache import DEFAULT_CACHE_DIR, get_content_hash
+
+# HU-Fenster je Region: untere/obere Grenze (None = offen), Anzahl der größten Komponenten,
+# Ausschluss von Komponenten am seitlichen Rand (Luft außerhalb des Körpers) und Beschreibung
+RegionWindow = namedtuple("RegionWindow", ["lower", "upper", "max_regions", "exclude_border", "description"])
+REGION_WINDOWS = OrderedDict([
+    ("Lunge", RegionWindow(-950.0, -400.0, 2, True, "Sauerstoffaufnahme und Gasaustausch.")),
+    ("Mediastinum", RegionWindow(0.0, 100.0, 1, False, "Herz und große Gefäße: Blutpumpe für den Körper.")),
+    ("Knochen", RegionWindow(250.0, None, 1, False, "Rippen und Wirbelsäule: Schutz des Brustkorbs und der Organe.")),
+])
+
+# Kleinere Komponenten werden verworfen (Milliliter)
+MIN_REGION_VOLUME_ML = 5.0
+
+# Die Erkennung läuft auf der feinsten Pyramidenstufe mit höchstens so vielen Voxeln
+DETECTION_VOXEL_BUDGET = 256 ** 3
+
+# Anzahl der z-Blöcke, die parallel gelabelt werden
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+REGION_CACHE_DIR = os.path.join(DEFAULT_CACHE_DIR, "regions")
+
+# Eine erkannte Region in Weltkoordinaten; bounds als (xmin, xmax, ymin, ymax, zmin, zmax)
+Region = namedtuple("Region", ["label", "name", "window", "voxel_count", "volume_ml", "centroid", "bounds"])
+
+
+def _label_slab(mask):
+    """Labelt die 6-zusammenhängenden Komponenten eines (z, y, x) Masken-Blocks mit vtkImageConnectivityFilter."""
+    nz, ny, nx = mask.shape
+    image = vtkImageData()
+    image.SetDimensions(nx, ny, nz)
+    image.GetPointData().SetScalars(numpy_support.numpy_to_vtk(mask.reshape(-1), deep=False))
+
+    connectivity = vtkImageConnectivityFilter()
+    connectivity.SetInputData(image)
+    connectivity.SetScalarRange(1, 1)
+    connectivity.SetExtractionModeToAllRegions()
+    connectivity.SetLabelModeToSizeRank()
+    connectivity.SetLabelScalarTypeToInt()
+    connectivity.GenerateRegionExtentsOff()
+    connectivity.Update()
+
+    labels = numpy_support.vtk_to_numpy(connectivity.GetOutput().GetPointData().GetScalars())
+    return labels.reshape(nz, ny, nx), connectivity.GetNumberOfExtractedRegions()
+
+
+def _find_root(parents, label):
+    while parents[label] != label:
+        parents[label] = parents[parents[label]]
+        label = parents[label]
+    return label
+
+
+def label_components(mask, workers=DEFAULT_WORKERS):
+    """Labelt Komponenten blockweise in mehreren Threads und verbindet sie an den Blockgrenzen.
+
+    Liefert ein int32-Labelvolumen (0 = Hintergrund, fortlaufende Labels) und die Anzahl der Labels.
+    """
+    mask = np.ascontiguousarray(mask, dtype=np.uint8)
+    nz = mask.shape[0]
+    slab_count = max(1, min(workers, nz))
+    starts = np.linspace(0, nz, slab_count + 1).astype(int)
+    slabs = [mask[start:stop] for start, stop in zip(starts[:-1], starts[1:])]
+
+    # Die VTK-Wrapper geben den GIL während Update() frei, so laufen die Blöcke parallel
+    with ThreadPoolExecutor(max_workers=slab_count) as executor:
+        results = list(executor.map(_label_slab, slabs))
+
+    labels = np.empty(mask.shape, dtype=np.int32)
+    offset = 0
+    for (start, stop), (slab_labels, count) in zip(zip(starts[:-1], starts[1:]), results):
+        labels[start:stop] = np.where(slab_labels > 0, slab_labels + offset, 0)
+        offset += count
+    if slab_count == 1:
+        return labels, offset
+
+    # Komponenten, die sich an einer Blockgrenze berühren, zusammenführen (Union-Find)
+    parents = np.arange(offset + 1)
+    for boundary in starts[1:-1]:
+        below, above = labels[boundary - 1].ravel(), labels[boundary].ravel()
+        touching = (below > 0) & (above > 0)
+        pairs = np.unique(np.stack([below[touching], above[touching]], axis=1), axis=0)
+        for first, second in pairs:
+            root_first, root_second = _find_root(parents, first), _find_root(parents, second)
+            if root_first != root_second:
+                parents[max(root_first, root_second)] = min(root_first, root_second)
+
+    roots = np.array([_find_root(parents, label) for label in range(offset + 1)])
+    unique_roots, compact = np.unique(roots, return_inverse=True)
+    return compact.astype(np.int32)[labels], len(unique_roots) - 1
+
+
+def _border_labels(labels):
+    """Labels, die den seitlichen Rand (x/y) des Volumens berühren."""
+    border = np.concatenate([labels[:, 0, :].ravel(), labels[:, -1, :].ravel(),
+                             labels[:, :, 0].ravel(), labels[:, :, -1].ravel()])
+    return np.unique(border[border > 0])
+
+
+def _region_profiles(labels, count):
+    """Voxelanzahl je Label entlang z, y und x, Schicht für Schicht berechnet."""
+    nz, ny, nx = labels.shape
+    profiles = [np.zeros((count, size), dtype=np.int64) for size in (nz, ny, nx)]
+    y_index = np.arange(ny)[:, None]
+    x_index = np.arange(nx)[None, :]
+    for z in range(nz):
+        plane = labels[z].astype(np.int64)
+        profiles[0][:, z] = np.bincount(plane.ravel(), minlength=count)
+        profiles[1] += np.bincount((plane * ny + y_index).ravel(), minlength=count * ny).reshape(count, ny)
+        profiles[2] += np.bincount((plane * nx + x_index).ravel(), minlength=count * nx).reshape(count, nx)
+    return profiles
+
+
+class RegionMap:
+    """Labelvolumen der erkannten Regionen samt Tabelle mit Schwerpunkten, Volumina und Bounding-Boxen."""
+
+    def __init__(self, labels, regions, origin, spacing):
+        self.labels = labels  # (z, y, x), 0 = keine Region
+        self.regions = regions
+        self.origin = tuple(origin)
+        self.spacing = tuple(spacing)
+
+    @property
+    def nbytes(self):
+        return self.labels.nbytes
+
+    def to_annotations(self):
+        """Annotationen für Labels und Legende, eine pro Region am Schwerpunkt."""
+        colors = dict(zip(REGION_WINDOWS, REGION_COLORS))
+        return [{
+            "name": region.name,
+            "position": region.centroid,
+            "description": f"{REGION_WINDOWS[region.window].description} Volumen: {region.volume_ml:.0f} ml.",
+            "category": region.window,
+            "color": colors.get(region.window, REGION_COLORS[0]),
+        } for region in self.regions]
+
+    def save(self, path):
+        """Speichert Labels und Regionstabelle als komprimierte .npz Datei."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp-{os.getpid()}.npz"
+        np.savez_compressed(
+            temp_path, labels=self.labels, origin=self.origin, spacing=self.spacing,
+            names=np.array([region.name for region in self.regions], dtype=str),
+            windows=np.array([region.window for region in self.regions], dtype=str),
+            voxel_counts=np.array([region.voxel_count for region in self.regions], dtype=np.int64),
+            volumes=np.array([region.volume_ml for region in self.regions], dtype=np.float64),
+            centroids=np.array([region.centroid for region in self.regions], dtype=np.float64).reshape(-1, 3),
+            bounds=np.array([region.bounds for region in self.regions], dtype=np.float64).reshape(-1, 6))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            regions = [Region(label, str(name), str(window), int(voxel_count), float(volume),
+                              tuple(centroid), tuple(bounds))
+                       for label, (name, window, voxel_count, volume, centroid, bounds) in enumerate(zip(
+                           data["names"], data["windows"], data["voxel_counts"], data["volumes"],
+                           data["centroids"], data["bounds"]), start=1)]
+            return cls(data["labels"], regions, data["origin"], data["spacing"])
+
+
+def detection_level(pyramid, max_voxels=DETECTION_VOXEL_BUDGET):
+    """Feinste Pyramidenstufe (Faktor, vtkImageData), die ins Voxelbudget passt."""
+    for factor, image_data in pyramid:
+        nx, ny, nz = image_data.GetDimensions()
+        if nx * ny * nz <= max_voxels:
+            return factor, image_data
+    return pyramid[-1]
+
+
+def detect_regions(image_data, windows=REGION_WINDOWS, min_volume_ml=MIN_REGION_VOLUME_ML, workers=DEFAULT_WORKERS):
+    """Erkennt die Regionen eines Volumens über HU-Fenster und Zusammenhangskomponenten."""
+    voxels = voxel_volume_view(image_data)
+    spacing = image_data.GetSpacing()
+    start = image_data.GetExtent()[::2]
+    origin = tuple(image_data.GetOrigin()[axis] + start[axis] * spacing[axis] for axis in range(3))
+    voxel_ml = spacing[0] * spacing[1] * spacing[2] / 1000.0
+    min_voxels = max(1, int(np.ceil(min_volume_ml / voxel_ml)))
+
+    region_labels = np.zeros(voxels.shape, dtype=np.uint8)
+    kept = []  # (Name des Fensters, Voxelanzahl) je vergebenem Label
+    for window_name, window in windows.items():
+        with tracer.span("threshold", "regions", window=window_name):
+            mask = voxels >= window.lower
+            if window.upper is not None:
+                mask &= voxels <= window.upper
+        with tracer.span("label_components", "regions", window=window_name):
+            labels, count = label_components(mask, workers)
+        if count == 0:
+            continue
+
+        counts = np.bincount(labels.ravel(), minlength=count + 1)
+        counts[0] = 0
+        if window.exclude_border:
+            counts[_border_labels(labels)] = 0
+        candidates = np.argsort(counts)[::-1][:window.max_regions]
+        candidates = candidates[counts[candidates] >= min_voxels]
+        if len(candidates) == 0:
+            continue
+
+        # Fenster überlappen nicht, daher genügt ein gemeinsames Labelvolumen
+        lookup = np.zeros(count + 1, dtype=np.uint8)
+        lookup[candidates] = np.arange(len(kept) + 1, len(kept) + 1 + len(candidates))
+        np.maximum(region_labels, lookup[labels], out=region_labels)
+        kept.extend((window_name, int(counts[label])) for label in candidates)
+
+    with tracer.span("region_statistics", "regions"):
+        profiles = _region_profiles(region_labels, len(kept) + 1)
+
+    regions = []
+    for label, (window_name, voxel_count) in enumerate(kept, start=1):
+        centroid, bounds = [], []
+        # Profile liegen in (z, y, x), Weltkoordinaten in (x, y, z)
+        for axis, profile in zip((2, 1, 0), profiles[::-1]):
+            row = profile[label]
+            occupied = np.flatnonzero(row)
+            centroid.append(origin[axis] + spacing[axis] * float(row @ np.arange(len(row))) / voxel_count)
+            bounds += [origin[axis] + spacing[axis] * occupied[0], origin[axis] + spacing[axis] * occupied[-1]]
+        number = sum(1 for name, _ in kept[:label] if name == window_name)
+        total = sum(1 for name, _ in kept if name == window_name)
+        name = f"{window_name} {number}" if total > 1 else window_name
+        regions.append(Region(label, name, window_name, voxel_count, voxel_count * voxel_ml,
+                              tuple(centroid), tuple(float(value) for value in bounds)))
+    return RegionMap(region_labels, regions, origin, spacing)
+
+
+def region_key(image_data, windows=REGION_WINDOWS, min_volume_ml=MIN_REGION_VOLUME_ML):
+    """Cache-Schlüssel aus Inhalts-Hash und Erkennungsparametern."""
+    parameters = repr(([(name, window[:4]) for name, window in windows.items()], min_volume_ml))
+    return f"{get_content_hash(image_data)}_{hashlib.sha1(parameters.encode('utf-8')).hexdigest()[:12]}"
+
+
+def load_or_detect_regions(image_data, cache_dir=REGION_CACHE_DIR, **kwargs):
+    """Liefert die Regionen aus dem Festplatten-Cache oder erkennt sie einmalig."""
+    path = os.path.join(cache_dir, region_key(image_data) + ".npz")
+    if os.path.exists(path):
+        try:
+            with tracer.span("read_regions", "regions"):
+                region_map = RegionMap.load(path)
+            os.utime(path)  # Zugriffszeitpunkt für die LRU-Verdrängung des Volumen-Caches
+            return region_map
+        except (OSError, ValueError, KeyError):
+            pass  # Beschädigte Cache-Datei: neu berechnen
+    region_map = detect_regions(image_data, **kwargs)
+    try:
+        region_map.save(path)
+    except OSError:
+        pass  # Ohne beschreibbares Verzeichnis wird bei jedem Laden neu erkannt
+    return region_map
+
+
+class RegionDetector(QThread):
+    """Erkennt die Regionen einer Studie im Hintergrund."""
+
+    detected = pyqtSignal(str, object)  # Dateipfad der Studie, RegionMap
+    failed = pyqtSignal(str, str)  # Dateipfad der Studie, Fehlermeldung
+
+    def __init__(self, filepath, pyramid, cache_dir=REGION_CACHE_DIR, parent=None):
+        super().__init__(parent)
+        self.filepath = filepath
+        self.pyramid = pyramid
+        self.cache_dir = cache_dir
+
+    def run(self):
+        try:
+            with tracer.span("detect_regions", "regions", filepath=self.filepath):
+                _, image_data = detection_level(self.pyramid)
+                region_map = load_or_detect_regions(image_data, self.cache_dir)
+        except Exception as error:  # Fehler dürfen den Worker-Thread nicht stillschweigend beenden
+            self.failed.emit(self.filepath, str(error))
+        else:
+            self.detected.emit(self.filepath, region_map)
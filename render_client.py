@@ -0,0 +1,162 @@
+"""Skriptbarer Thin Client für render_server.py.
+
+Ohne --server wird ein Render-Server im selben Prozess gestartet, so lässt sich die
+Kette ohne externen Dienst testen.
+
+Beispiel:
+    python render_client.py --volume coronacases_org_004.vti --frames 24 --output frames
+"""
+
+# Standardbibliotheken
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+# Projektmodule
+from render_server import DEFAULT_FRAME_SIZE, FRAME_FORMATS, RenderServer
+
+# Drehwinkel pro Bild beim Umkreisen des Volumens
+DEFAULT_ORBIT_STEP = 15.0
+
+
+class RenderServerError(Exception):
+    """Fehlerantwort des Render-Servers."""
+
+
+class RenderClient:
+    """Spricht die JSON/HTTP-API des Render-Servers an."""
+
+    def __init__(self, url, timeout=60.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method, path, body=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        request = Request(self.url + path, data=data, method=method,
+                          headers={"Content-Type": "application/json"} if data is not None else {})
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                return response.headers, response.read()
+        except HTTPError as error:
+            try:
+                message = json.loads(error.read())["error"]
+            except (ValueError, KeyError):
+                message = error.reason
+            raise RenderServerError(f"{error.code}: {message}") from None
+
+    def _json(self, method, path, body=None):
+        _, payload = self._request(method, path, body)
+        return json.loads(payload)
+
+    def volumes(self):
+        return self._json("GET", "/volumes")["volumes"]
+
+    def open_session(self, volume, size=DEFAULT_FRAME_SIZE):
+        """Öffnet eine Sitzung auf einem Volumen (Pfad auf dem Server) und liefert ihren Zustand."""
+        return self._json("POST", "/sessions", {"volume": volume, "size": list(size)})
+
+    def command(self, session_id, **command):
+        """Sendet einen Befehl, z. B. camera={"azimuth": 10}, slice=40, window="Lunge" oder roi=[...]."""
+        return self._json("POST", f"/sessions/{session_id}/commands", command)
+
+    def frame(self, session_id, quality="auto", frame_format="jpeg"):
+        """Liefert (Bilddaten, Qualität, Renderzeit in Sekunden)."""
+        headers, data = self._request("GET", f"/sessions/{session_id}/frame?quality={quality}&format={frame_format}")
+        return data, headers.get("X-Frame-Quality"), float(headers.get("X-Render-Time", "nan"))
+
+    def close_session(self, session_id):
+        return self._json("DELETE", f"/sessions/{session_id}")
+
+
+def run_orbit(client, volume, frames, output=None, frame_format="jpeg", step=DEFAULT_ORBIT_STEP,
+              size=DEFAULT_FRAME_SIZE):
+    """Dreht die Kamera interaktiv um das Volumen und holt zum Schluss ein Bild in voller Qualität."""
+    session = client.open_session(volume, size)
+    session_id = session["session"]
+    timings = {"interactive": [], "final": []}
+    sizes = {"interactive": [], "final": []}
+    try:
+        for number in range(frames):
+            started = time.perf_counter()
+            client.command(session_id, camera={"azimuth": step}, interacting=True)
+            data, quality, _ = client.frame(session_id, "auto", frame_format)
+            timings[quality].append(time.perf_counter() - started)
+            sizes[quality].append(len(data))
+            if output:
+                with open(os.path.join(output, f"frame_{number:04d}.{frame_format}"), "wb") as frame_file:
+                    frame_file.write(data)
+
+        # Ruhezustand: volles Bild
+        started = time.perf_counter()
+        client.command(session_id, interacting=False)
+        data, quality, _ = client.frame(session_id, "auto", frame_format)
+        timings[quality].append(time.perf_counter() - started)
+        sizes[quality].append(len(data))
+        if output:
+            with open(os.path.join(output, f"final.{frame_format}"), "wb") as frame_file:
+                frame_file.write(data)
+    finally:
+        client.close_session(session_id)
+    return {quality: {"frames": len(values),
+                      "median_ms": statistics.median(values) * 1000 if values else None,
+                      "median_bytes": statistics.median(sizes[quality]) if sizes[quality] else None}
+            for quality, values in timings.items()}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Thin Client für den Render-Server")
+    parser.add_argument("--server", default=None, help="URL des Servers (ohne: Server im selben Prozess)")
+    parser.add_argument("--volume", required=True, help="Pfad des Volumens auf dem Server")
+    parser.add_argument("--frames", type=int, default=24, help="Anzahl Bilder beim Umkreisen")
+    parser.add_argument("--output", default=None, help="Bilder in dieses Verzeichnis schreiben")
+    parser.add_argument("--format", default="jpeg", choices=sorted(FRAME_FORMATS))
+    parser.add_argument("--size", nargs=2, type=int, default=list(DEFAULT_FRAME_SIZE), metavar=("BREITE", "HÖHE"))
+    parser.add_argument("--sessions", type=int, default=1, help="Gleichzeitige Sitzungen auf demselben Volumen")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = None
+    if args.server is None:
+        server = RenderServer(("127.0.0.1", 0))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = args.server or server.url
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+
+    results = [None] * args.sessions
+
+    def worker(index):
+        output = os.path.join(args.output, f"session_{index}") if args.output and args.sessions > 1 else args.output
+        if output:
+            os.makedirs(output, exist_ok=True)
+        try:
+            results[index] = run_orbit(RenderClient(url), args.volume, args.frames, output, args.format,
+                                       size=args.size)
+        except (OSError, RenderServerError) as error:
+            results[index] = {"error": str(error)}
+
+    try:
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(args.sessions)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    print(json.dumps(results, indent=2))
+    return 1 if any("error" in result for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,597 @@
+"""Render-Server: hält Volumen in einem Prozess und liefert komprimierte Bilder an Thin Clients.
+
+Alle Sitzungen teilen sich eine geladene Kopie jedes Volumens und ein Offscreen-Renderfenster.
+Befehle (Kamera, Schnitt, Farbschema, Fenster, ROI) und Bilder laufen über eine JSON/HTTP-API.
+
+Beispiel:
+    python render_server.py --port 8765 --preload coronacases_org_004.vti
+    python render_client.py --server http://127.0.0.1:8765 --volume coronacases_org_004.vti --output frames
+"""
+
+# Standardbibliotheken
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Drittanbieter-Bibliotheken
+import vtk
+from vtk.util import numpy_support
+
+# Projektmodule
+from batch_render import VIEW_DIRECTIONS, create_render_window, create_slice, set_camera_view
+from histogram import DEFAULT_BINS, compute_histogram_counts
+from instrumentation import tracer
+from roi_stats import RoiStatistics, bounds_to_index_box, voxel_volume_view
+from transfer_functions import COLOR_MAP_NAMES, DEFAULT_WINDOW_PRESET, TransferFunctionLibrary
+from volume_cache import VolumeCache, load_cached_vti
+from volume_io import load_vti_file
+
+# Nur lokal erreichbar, solange nichts anderes angegeben wird
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_FRAME_SIZE = (512, 512)
+MAX_FRAME_SIZE = 4096
+
+# Während der Interaktion: halbe Auflösung, stärkere JPEG-Kompression und gröbere Abtastung im Volumen-Mapper
+INTERACTIVE_SCALE = 0.5
+INTERACTIVE_JPEG_QUALITY = 50
+FINAL_JPEG_QUALITY = 90
+INTERACTIVE_UPDATE_RATE = 15.0
+STILL_UPDATE_RATE = 0.0001
+
+# So lange nach dem letzten interaktiven Befehl liefert quality=auto noch Interaktionsbilder
+IDLE_DELAY_S = 0.3
+
+FRAME_FORMATS = {"jpeg": "image/jpeg", "png": "image/png"}
+FRAME_QUALITIES = ("auto", "interactive", "final")
+
+
+class SharedVolume:
+    """Ein geladenes Volumen, das alle Sitzungen nur lesend verwenden."""
+
+    def __init__(self, filepath, image_data, bins=DEFAULT_BINS):
+        self.filepath = filepath
+        self.name = os.path.basename(filepath)
+        self.image_data = image_data
+        self.voxels = voxel_volume_view(image_data)
+        self.histogram = compute_histogram_counts(self.voxels, bins)
+        self.scalar_range = (float(self.histogram.edges[0]), float(self.histogram.edges[-1]))
+        self.spacing = image_data.GetSpacing()
+        start = image_data.GetExtent()[::2]
+        self.origin = tuple(image_data.GetOrigin()[axis] + start[axis] * self.spacing[axis] for axis in range(3))
+        nz, ny, nx = self.voxels.shape
+        self.extent = (0, nx - 1, 0, ny - 1, 0, nz - 1)
+        self.sessions = 0
+        self.pinned = False  # Vorab geladene Volumen bleiben auch ohne Sitzung im Speicher
+        self.mapper = None  # Gemeinsamer Volumen-Mapper, wird im Render-Thread angelegt
+
+    def get_mapper(self):
+        """Ein Mapper pro Volumen, damit die Voxel nur einmal auf die GPU geladen werden."""
+        if self.mapper is None:
+            self.mapper = vtk.vtkSmartVolumeMapper()
+            self.mapper.SetInputData(self.image_data)
+        return self.mapper
+
+    def describe(self):
+        nx, ny, nz = self.image_data.GetDimensions()
+        return {"filepath": self.filepath, "name": self.name, "dimensions": [nx, ny, nz],
+                "spacing": list(self.spacing), "scalar_range": list(self.scalar_range),
+                "sessions": self.sessions, "pinned": self.pinned}
+
+
+class VolumeStore:
+    """Lädt jedes Volumen einmal und zählt die Sitzungen, die es verwenden."""
+
+    def __init__(self, cache=None):
+        self.cache = cache
+        self._volumes = {}
+        self._loading = {}  # Dateipfad -> Lock, solange das Volumen geladen wird
+        self._lock = threading.Lock()
+
+    def acquire(self, filepath, pin=False):
+        """Liefert das geteilte Volumen einer Datei und lädt es beim ersten Zugriff.
+
+        Geladen wird außerhalb der Store-Sperre; nur Anfragen für dieselbe Datei warten aufeinander.
+        """
+        filepath = os.path.abspath(filepath)
+        with self._lock:
+            volume = self._volumes.get(filepath)
+            if volume is not None:
+                return self._register(volume, pin)
+            load_lock = self._loading.setdefault(filepath, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                volume = self._volumes.get(filepath)  # Inzwischen von einer anderen Sitzung geladen
+                if volume is not None:
+                    return self._register(volume, pin)
+            try:
+                with tracer.span("load_volume", "server", filepath=filepath):
+                    if self.cache is not None:
+                        image_data = load_cached_vti(filepath, self.cache)
+                    else:
+                        image_data = load_vti_file(filepath)
+                if image_data is None or image_data.GetPointData().GetScalars() is None:
+                    raise IOError(f"Keine Bilddaten in {filepath} gefunden.")
+                volume = SharedVolume(filepath, image_data)
+                with self._lock:
+                    self._volumes[filepath] = volume
+                    return self._register(volume, pin)
+            finally:
+                with self._lock:
+                    if self._loading.get(filepath) is load_lock:
+                        del self._loading[filepath]
+
+    @staticmethod
+    def _register(volume, pin):
+        if pin:
+            volume.pinned = True
+        else:
+            volume.sessions += 1
+        return volume
+
+    def release(self, volume):
+        """Gibt ein Volumen frei, sobald es keine Sitzung mehr verwendet."""
+        with self._lock:
+            volume.sessions -= 1
+            if volume.sessions <= 0 and not volume.pinned:
+                self._volumes.pop(volume.filepath, None)
+                return True
+        return False
+
+    def volumes(self):
+        with self._lock:
+            return [volume.describe() for volume in self._volumes.values()]
+
+
+class RenderSession:
+    """Zustand eines Clients: eigener Renderer, Kamera und Transferfunktion auf einem geteilten Volumen.
+
+    Alle Methoden außer is_interacting laufen im Render-Thread.
+    """
+
+    def __init__(self, session_id, volume, size=DEFAULT_FRAME_SIZE):
+        self.id = session_id
+        self.volume = volume
+        self.size = tuple(size)
+        self.color_map = "Standard"
+        self.window_preset = DEFAULT_WINDOW_PRESET
+        self.last_interaction = 0.0
+        self.transfer_functions = TransferFunctionLibrary(volume.histogram)
+        self.transfer_function = None
+
+        self.renderer = vtk.vtkRenderer()
+        self.volume_actor = vtk.vtkVolume()
+        self.volume_actor.SetMapper(volume.get_mapper())
+        self.renderer.AddVolume(self.volume_actor)
+        self._apply_transfer_function()
+        set_camera_view(self.renderer, "front")
+
+        self.slice_actor = None
+        self.roi_outline = None
+        self.roi_statistics = None
+
+    def is_interacting(self):
+        return time.monotonic() - self.last_interaction < IDLE_DELAY_S
+
+    def _apply_transfer_function(self, keep_window=False):
+        function = self.transfer_functions.get(self.window_preset, self.color_map)
+        if keep_window and self.transfer_function is not None:
+            function.set_window(*self.transfer_function.window)
+        function.apply(self.volume_actor.GetProperty())
+        self.transfer_function = function
+
+    def apply(self, command):
+        """Führt einen Befehl aus und liefert den neuen Zustand (bei ROI samt Statistik)."""
+        if "interacting" in command:
+            self.last_interaction = time.monotonic() if command["interacting"] else 0.0
+        if "size" in command:
+            width, height = (int(value) for value in command["size"])
+            if not (0 < width <= MAX_FRAME_SIZE and 0 < height <= MAX_FRAME_SIZE):
+                raise ValueError(f"Ungültige Bildgröße: {width}x{height}")
+            self.size = (width, height)
+        if "camera" in command:
+            self._apply_camera(command["camera"])
+        if "color_map" in command:
+            if command["color_map"] not in COLOR_MAP_NAMES:
+                raise ValueError(f"Unbekanntes Farbschema: {command['color_map']}")
+            self.color_map = command["color_map"]
+            self._apply_transfer_function(keep_window=True)
+        if "window" in command:
+            if command["window"] not in self.transfer_functions.windows:
+                raise ValueError(f"Unbekanntes Fenster-Preset: {command['window']}")
+            self.window_preset = command["window"]
+            self._apply_transfer_function()
+        if "level" in command or "width" in command:
+            self.transfer_function.set_level_width(float(command.get("level", self.transfer_function.level)),
+                                                   float(command.get("width", self.transfer_function.width)))
+        if "slice" in command:
+            self._apply_slice(command["slice"])
+        result = self.describe()
+        if "roi" in command:
+            result["roi"] = self._apply_roi(command["roi"])
+        return result
+
+    def _apply_camera(self, camera_command):
+        camera = self.renderer.GetActiveCamera()
+        if "view" in camera_command:
+            if camera_command["view"] not in VIEW_DIRECTIONS:
+                raise ValueError(f"Unbekannte Ansicht: {camera_command['view']}")
+            set_camera_view(self.renderer, camera_command["view"])
+        for key, setter in (("position", camera.SetPosition), ("focal_point", camera.SetFocalPoint),
+                            ("view_up", camera.SetViewUp)):
+            if key in camera_command:
+                setter(*(float(value) for value in camera_command[key]))
+        for key, method in (("azimuth", camera.Azimuth), ("elevation", camera.Elevation),
+                            ("roll", camera.Roll), ("zoom", camera.Zoom), ("dolly", camera.Dolly)):
+            if key in camera_command:
+                method(float(camera_command[key]))
+        if camera_command.get("reset"):
+            self.renderer.ResetCamera()
+        camera.OrthogonalizeViewUp()
+        self.renderer.ResetCameraClippingRange()
+
+    def _apply_slice(self, slice_number):
+        """Blendet einen axialen Schnitt ein (None blendet ihn aus)."""
+        if slice_number is None:
+            if self.slice_actor is not None:
+                self.slice_actor.SetVisibility(False)
+            return
+        slice_number = min(max(int(slice_number), 0), self.volume.extent[5])
+        slice_number += self.volume.image_data.GetExtent()[4]
+        if self.slice_actor is None:
+            self.slice_actor = create_slice(self.volume.image_data, slice_number)
+            self.renderer.AddViewProp(self.slice_actor)
+        self.slice_actor.GetMapper().SetSliceNumber(slice_number)
+        self.slice_actor.SetVisibility(True)
+
+    def _apply_roi(self, bounds):
+        """Zeigt die ROI als Umriss an und berechnet ihre Statistik (None entfernt die ROI)."""
+        if bounds is None:
+            if self.roi_outline is not None:
+                self.roi_outline.SetVisibility(False)
+            return None
+        bounds = [float(value) for value in bounds]
+        if len(bounds) != 6:
+            raise ValueError("Die ROI braucht sechs Grenzen (xmin, xmax, ymin, ymax, zmin, zmax).")
+        if self.roi_outline is None:
+            self.roi_outline = vtk.vtkActor()
+            self.roi_outline.SetMapper(vtk.vtkPolyDataMapper())
+            self.roi_outline.GetProperty().SetColor(1.0, 1.0, 0.0)
+            self.renderer.AddActor(self.roi_outline)
+        outline = vtk.vtkOutlineSource()
+        outline.SetBounds(bounds)
+        self.roi_outline.GetMapper().SetInputConnection(outline.GetOutputPort())
+        self.roi_outline.SetVisibility(True)
+
+        box = bounds_to_index_box(bounds, self.volume.origin, self.volume.spacing, self.volume.extent)
+        if box is None:
+            return {"count": 0}
+        if self.roi_statistics is None:
+            self.roi_statistics = RoiStatistics(self.volume.voxels, self.volume.histogram.edges, self.volume.spacing)
+        with tracer.span("roi_statistics", "server", session=self.id):
+            stats = self.roi_statistics.compute(box)
+        return {"count": stats.count, "mean": stats.mean, "std": stats.std, "min": float(stats.min),
+                "max": float(stats.max), "volume_mm3": stats.volume_mm3, "box": list(stats.box),
+                "percentiles": {str(q): value for q, value in stats.percentiles.items()}}
+
+    def describe(self):
+        camera = self.renderer.GetActiveCamera()
+        return {"session": self.id, "volume": self.volume.filepath, "size": list(self.size),
+                "color_map": self.color_map, "window": self.window_preset,
+                "level": self.transfer_function.level, "width": self.transfer_function.width,
+                "camera": {"position": list(camera.GetPosition()), "focal_point": list(camera.GetFocalPoint()),
+                           "view_up": list(camera.GetViewUp())}}
+
+    def release(self):
+        self.renderer.RemoveAllViewProps()
+        self.volume_actor = None
+        self.slice_actor = None
+        self.roi_outline = None
+        self.roi_statistics = None
+
+
+class RenderThread(threading.Thread):
+    """Besitzt das Offscreen-Renderfenster; alle VTK-Aufrufe der Sitzungen laufen hier nacheinander."""
+
+    def __init__(self):
+        super().__init__(name="render", daemon=True)
+        self._tasks = queue.Queue()
+        self.render_window = None
+        self._window_to_image = None
+
+    def call(self, function, *args):
+        """Führt function im Render-Thread aus und wartet auf das Ergebnis."""
+        future = Future()
+        self._tasks.put((future, function, args))
+        return future.result()
+
+    def stop(self):
+        self._tasks.put(None)
+
+    def run(self):
+        self.render_window = create_render_window(DEFAULT_FRAME_SIZE)
+        self._window_to_image = vtk.vtkWindowToImageFilter()
+        self._window_to_image.SetInput(self.render_window)
+        self._window_to_image.ReadFrontBufferOff()
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                break
+            future, function, args = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(function(*args))
+            except Exception as error:  # Fehler gehen an den wartenden Request-Thread
+                future.set_exception(error)
+        self.render_window.Finalize()
+
+    def add_session(self, session):
+        """Alle Renderer hängen am selben Fenster; gezeichnet wird nur der der angefragten Sitzung."""
+        session.renderer.DrawOff()
+        self.render_window.AddRenderer(session.renderer)
+
+    def remove_session(self, session):
+        self.render_window.RemoveRenderer(session.renderer)
+        session.release()
+
+    def render_frame(self, session, interactive, frame_format):
+        """Rendert eine Sitzung und liefert das komprimierte Bild als Bytes."""
+        width, height = session.size
+        if interactive:
+            width, height = max(1, int(width * INTERACTIVE_SCALE)), max(1, int(height * INTERACTIVE_SCALE))
+        renderers = self.render_window.GetRenderers()
+        renderers.InitTraversal()
+        for _ in range(renderers.GetNumberOfItems()):
+            renderer = renderers.GetNextItem()
+            renderer.SetDraw(renderer is session.renderer)
+
+        with tracer.span("render_frame", "server", session=session.id, interactive=interactive):
+            self.render_window.SetSize(width, height)
+            self.render_window.SetDesiredUpdateRate(INTERACTIVE_UPDATE_RATE if interactive else STILL_UPDATE_RATE)
+            self.render_window.Render()
+            self._window_to_image.Modified()
+            self._window_to_image.Update()
+
+        with tracer.span("encode_frame", "server", format=frame_format):
+            if frame_format == "png":
+                writer = vtk.vtkPNGWriter()
+            else:
+                writer = vtk.vtkJPEGWriter()
+                writer.SetQuality(INTERACTIVE_JPEG_QUALITY if interactive else FINAL_JPEG_QUALITY)
+            writer.WriteToMemoryOn()
+            writer.SetInputConnection(self._window_to_image.GetOutputPort())
+            writer.Write()
+            return numpy_support.vtk_to_numpy(writer.GetResult()).tobytes()
+
+
+class RenderServer(ThreadingHTTPServer):
+    """HTTP-Server mit geteilten Volumen, Sitzungen und einem Render-Thread."""
+
+    daemon_threads = True
+
+    def __init__(self, address=(DEFAULT_HOST, DEFAULT_PORT), cache=None, verbose=False):
+        super().__init__(address, RenderRequestHandler)
+        self.verbose = verbose
+        self.store = VolumeStore(cache)
+        self.render_thread = RenderThread()
+        self.render_thread.start()
+        self.sessions = {}
+        self._sessions_lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def preload(self, filepath):
+        return self.store.acquire(filepath, pin=True)
+
+    def create_session(self, filepath, size=DEFAULT_FRAME_SIZE):
+        volume = self.store.acquire(filepath)
+        session_id = uuid.uuid4().hex[:12]
+        try:
+            session = self.render_thread.call(RenderSession, session_id, volume, size)
+            self.render_thread.call(self.render_thread.add_session, session)
+        except Exception:
+            self.store.release(volume)
+            raise
+        with self._sessions_lock:
+            self.sessions[session_id] = session
+        return session
+
+    def get_session(self, session_id):
+        with self._sessions_lock:
+            session = self.sessions.get(session_id)
+        if session is None:
+            raise KeyError(f"Unbekannte Sitzung: {session_id}")
+        return session
+
+    def close_session(self, session_id):
+        with self._sessions_lock:
+            session = self.sessions.pop(session_id, None)
+        if session is None:
+            raise KeyError(f"Unbekannte Sitzung: {session_id}")
+        volume = session.volume
+        self.render_thread.call(self.render_thread.remove_session, session)
+        if self.store.release(volume):
+            self.render_thread.call(self._release_mapper, volume)
+
+    @staticmethod
+    def _release_mapper(volume):
+        volume.mapper = None
+
+    def command(self, session_id, command):
+        session = self.get_session(session_id)
+        with tracer.span("session_command", "server", session=session_id):
+            return self.render_thread.call(session.apply, command)
+
+    def frame(self, session_id, quality="auto", frame_format="jpeg"):
+        """Liefert (Bytes, interaktiv?) für eine Sitzung; auto richtet sich nach dem letzten Befehl."""
+        session = self.get_session(session_id)
+        interactive = session.is_interacting() if quality == "auto" else quality == "interactive"
+        return self.render_thread.call(self.render_thread.render_frame, session, interactive, frame_format), interactive
+
+    def server_close(self):
+        with self._sessions_lock:
+            session_ids = list(self.sessions)
+        for session_id in session_ids:
+            self.close_session(session_id)
+        self.render_thread.stop()
+        self.render_thread.join()
+        super().server_close()
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """JSON-API:
+
+    GET    /volumes                         geladene Volumen
+    GET    /sessions                        offene Sitzungen
+    POST   /sessions                        {"volume": Pfad, "size": [b, h]} -> neue Sitzung
+    POST   /sessions/<id>/commands          {"camera": {...}, "slice": n, "color_map": ..., "window": ...,
+                                             "level": ..., "width": ..., "roi": [6 Grenzen], "interacting": bool}
+    GET    /sessions/<id>/frame             ?quality=auto|interactive|final&format=jpeg|png
+    DELETE /sessions/<id>
+    """
+
+    server_version = "ThoraxRenderServer/1.0"
+    protocol_version = "HTTP/1.1"  # Keep-Alive für viele kleine Bildanfragen
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        if parts == ["volumes"]:
+            self._send_json(200, {"volumes": self.server.store.volumes()})
+        elif parts == ["sessions"]:
+            with self.server._sessions_lock:
+                sessions = list(self.server.sessions)
+            self._send_json(200, {"sessions": sessions})
+        elif len(parts) == 3 and parts[0] == "sessions" and parts[2] == "frame":
+            query = parse_qs(url.query)
+            quality = query.get("quality", ["auto"])[0]
+            frame_format = query.get("format", ["jpeg"])[0]
+            if quality not in FRAME_QUALITIES or frame_format not in FRAME_FORMATS:
+                self._send_json(400, {"error": "Ungültige Qualität oder ungültiges Format."})
+                return
+            self._handle(lambda: self._send_frame(parts[1], quality, frame_format))
+        else:
+            self._send_json(404, {"error": f"Unbekannter Pfad: {url.path}"})
+
+    def do_POST(self):
+        parts = [part for part in urlparse(self.path).path.split("/") if part]
+        body = self._read_json()
+        if body is None:
+            return
+        if parts == ["sessions"]:
+            if "volume" not in body:
+                self._send_json(400, {"error": "Feld 'volume' fehlt."})
+                return
+            self._handle(lambda: self._create_session(body))
+        elif len(parts) == 3 and parts[0] == "sessions" and parts[2] == "commands":
+            self._handle(lambda: self._send_json(200, self.server.command(parts[1], body)))
+        else:
+            self._send_json(404, {"error": f"Unbekannter Pfad: {self.path}"})
+
+    def do_DELETE(self):
+        parts = [part for part in urlparse(self.path).path.split("/") if part]
+        if len(parts) == 2 and parts[0] == "sessions":
+            self._handle(lambda: self._close_session(parts[1]))
+        else:
+            self._send_json(404, {"error": f"Unbekannter Pfad: {self.path}"})
+
+    def _handle(self, action):
+        """Übersetzt Fehler in HTTP-Statuscodes."""
+        try:
+            action()
+        except KeyError as error:
+            self._send_json(404, {"error": str(error.args[0]) if error.args else str(error)})
+        except (ValueError, TypeError) as error:
+            self._send_json(400, {"error": str(error)})
+        except OSError as error:
+            self._send_json(404, {"error": str(error)})
+        except Exception as error:  # z. B. vom Render-Thread weitergereicht; sonst bricht die Verbindung ab
+            self._send_json(500, {"error": str(error)})
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as error:
+            self._send_json(400, {"error": f"Ungültiges JSON: {error}"})
+            return None
+        if not isinstance(body, dict):
+            self._send_json(400, {"error": "Es wird ein JSON-Objekt erwartet."})
+            return None
+        return body
+
+    def _create_session(self, body):
+        session = self.server.create_session(body["volume"], body.get("size", DEFAULT_FRAME_SIZE))
+        self._send_json(201, self.server.render_thread.call(session.describe))
+
+    def _close_session(self, session_id):
+        self.server.close_session(session_id)
+        self._send_json(200, {"closed": session_id})
+
+    def _send_frame(self, session_id, quality, frame_format):
+        started = time.perf_counter()
+        data, interactive = self.server.frame(session_id, quality, frame_format)
+        self.send_response(200)
+        self.send_header("Content-Type", FRAME_FORMATS[frame_format])
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("X-Frame-Quality", "interactive" if interactive else "final")
+        self.send_header("X-Render-Time", f"{time.perf_counter() - started:.4f}")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status, data):
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offscreen-Render-Server für Thin Clients")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Adresse (Standard: nur lokal)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--preload", nargs="*", default=[], help="Volumen, die beim Start geladen werden")
+    parser.add_argument("--cache-dir", default=None, help="Volumen-Cache für schnelle Ladevorgänge verwenden")
+    parser.add_argument("--verbose", action="store_true", help="Anfragen protokollieren")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    cache = VolumeCache(args.cache_dir) if args.cache_dir else None
+    server = RenderServer((args.host, args.port), cache, args.verbose)
+    for filepath in args.preload:
+        volume = server.preload(filepath)
+        print(f"Geladen: {volume.name} {volume.describe()['dimensions']}")
+    print(f"Render-Server läuft auf {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+# Standardbibliotheken
+import math
+from collections import namedtuple
+
+# Drittanbieter-Bibliotheken
+import numpy as np
+from vtkmodules.util import numpy_support
+
+# Projektmodule
+from histogram import Histogram, histogram_percentiles
+
+# Perzentile, die für die ROI angezeigt werden
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Ergebnis der ROI-Statistik; box ist (i0, i1, j0, j1, k0, k1) inklusive, relativ zum Extent
+RoiStats = namedtuple("RoiStats", [
+    "count", "mean", "std", "min", "max", "percentiles", "histogram", "box", "volume_mm3"])
+
+# Zwischenergebnis pro z-Schicht für die inkrementelle Berechnung; min_count/max_count zählen die Voxel
+# mit dem Extremwert, damit Minimum und Maximum beim Entfernen von Streifen gültig bleiben
+_SliceStats = namedtuple("_SliceStats", [
+    "count", "total", "total_sq", "min", "min_count", "max", "max_count", "counts"])
+
+
+def voxel_volume_view(image_data):
+    """Liefert die Skalare als (z, y, x)-View auf den VTK-Speicher, ohne Kopie."""
+    scalars = numpy_support.vtk_to_numpy(image_data.GetPointData().GetScalars())
+    nx, ny, nz = image_data.GetDimensions()
+    if scalars.ndim == 2:
+        return scalars.reshape(nz, ny, nx, -1)[..., 0]  # Nur die erste Komponente
+    return scalars.reshape(nz, ny, nx)
+
+
+def _rect_area(rect):
+    i0, i1, j0, j1 = rect
+    return (i1 - i0 + 1) * (j1 - j0 + 1)
+
+
+def _rect_difference(rect, other):
+    """Zerlegt rect ohne other in höchstens vier Rechtecke (i0, i1, j0, j1), Grenzen inklusive."""
+    i0, i1, j0, j1 = rect
+    inner_i0, inner_i1 = max(i0, other[0]), min(i1, other[1])
+    inner_j0, inner_j1 = max(j0, other[2]), min(j1, other[3])
+    if inner_i0 > inner_i1 or inner_j0 > inner_j1:
+        return [rect]
+    parts = [
+        (i0, i1, j0, inner_j0 - 1),  # Zeilen davor
+        (i0, i1, inner_j1 + 1, j1),  # Zeilen danach
+        (i0, inner_i0 - 1, inner_j0, inner_j1),  # Links im Überlappungsband
+        (inner_i1 + 1, i1, inner_j0, inner_j1),  # Rechts im Überlappungsband
+    ]
+    return [part for part in parts if part[0] <= part[1] and part[2] <= part[3]]
+
+
+def _add_stats(stats, other):
+    minimum, min_count = stats.min, stats.min_count
+    if other.min < minimum:
+        minimum, min_count = other.min, other.min_count
+    elif other.min == minimum:
+        min_count += other.min_count
+    maximum, max_count = stats.max, stats.max_count
+    if other.max > maximum:
+        maximum, max_count = other.max, other.max_count
+    elif other.max == maximum:
+        max_count += other.max_count
+    return _SliceStats(stats.count + other.count, stats.total + other.total, stats.total_sq + other.total_sq,
+                       minimum, min_count, maximum, max_count, stats.counts + other.counts)
+
+
+def _subtract_stats(stats, other):
+    """Entfernt einen enthaltenen Teil; None, wenn dabei das letzte Minimum oder Maximum wegfällt."""
+    min_count = stats.min_count - (other.min_count if other.min == stats.min else 0)
+    max_count = stats.max_count - (other.max_count if other.max == stats.max else 0)
+    if min_count <= 0 or max_count <= 0:
+        return None
+    return _SliceStats(stats.count - other.count, stats.total - other.total, stats.total_sq - other.total_sq,
+                       stats.min, min_count, stats.max, max_count, stats.counts - other.counts)
+
+
+def bounds_to_index_box(bounds, origin, spacing, extent):
+    """Rechnet Weltkoordinaten-Grenzen unter Beachtung von Origin und Spacing in Voxel-Indizes um.
+
+    Liefert (i0, i1, j0, j1, k0, k1) inklusive und relativ zum Extent-Anfang oder None,
+    wenn die Box keinen Voxel enthält.
+    """
+    box = []
+    for axis in range(3):
+        low = (bounds[2 * axis] - origin[axis]) / spacing[axis]
+        high = (bounds[2 * axis + 1] - origin[axis]) / spacing[axis]
+        if low > high:  # Negatives Spacing
+            low, high = high, low
+        first = max(math.ceil(low - 1e-6), extent[2 * axis])
+        last = min(math.floor(high + 1e-6), extent[2 * axis + 1])
+        if first > last:
+            return None
+        box.extend((first - extent[2 * axis], last - extent[2 * axis]))
+    return tuple(box)
+
+
+class RoiStatistics:
+    """Berechnet Histogramm und Kennwerte einer quaderförmigen ROI auf Views des Voxel-Arrays.
+
+    Die Werte werden pro z-Schicht zusammen mit dem x/y-Ausschnitt zwischengespeichert, für den sie
+    gelten. Ändert sich nur z, werden nur neu hinzugekommene Schichten berechnet; ändert sich x/y
+    (Ziehen einer Seitenfläche oder Verschieben der Box), werden pro Schicht nur die hinzugekommenen
+    und weggefallenen Streifen verrechnet.
+    """
+
+    def __init__(self, voxels, edges, spacing=(1.0, 1.0, 1.0), percentiles=DEFAULT_PERCENTILES):
+        self.voxels = voxels  # (z, y, x)-Array oder View, z. B. aus voxel_volume_view
+        self.edges = np.asarray(edges)
+        self.spacing = spacing
+        self.percentiles = percentiles
+        self._slice_cache = {}  # z -> (x/y-Ausschnitt, _SliceStats)
+
+    def compute(self, box):
+        """Berechnet die Statistik für eine Index-Box aus bounds_to_index_box."""
+        i0, i1, j0, j1, k0, k1 = box
+        rect = (i0, i1, j0, j1)
+
+        bins = len(self.edges) - 1
+        count, total, total_sq = 0, 0.0, 0.0
+        minimum, maximum = math.inf, -math.inf
+        counts = np.zeros(bins, dtype=np.int64)
+        for k in range(k0, k1 + 1):
+            stats = self._cached_slice_stats(k, rect)
+            count += stats.count
+            total += stats.total
+            total_sq += stats.total_sq
+            minimum = min(minimum, stats.min)
+            maximum = max(maximum, stats.max)
+            counts += stats.counts
+
+        mean = total / count if count else float("nan")
+        variance = max(total_sq / count - mean * mean, 0.0) if count else float("nan")
+        histogram = Histogram(counts, self.edges)
+        voxel_volume = abs(self.spacing[0] * self.spacing[1] * self.spacing[2])
+        return RoiStats(count, mean, math.sqrt(variance), minimum, maximum,
+                        histogram_percentiles(histogram, self.percentiles), histogram, box, count * voxel_volume)
+
+    def _cached_slice_stats(self, k, rect):
+        """Kennwerte einer z-Schicht, wenn möglich aus dem Zwischenspeicher nachgeführt."""
+        cached = self._slice_cache.get(k)
+        if cached is not None and cached[0] == rect:
+            return cached[1]
+        stats = self._update_slice_stats(k, *cached, rect) if cached is not None else None
+        if stats is None:
+            stats = self._rect_stats(k, rect)
+        self._slice_cache[k] = (rect, stats)
+        return stats
+
+    def _update_slice_stats(self, k, old_rect, stats, rect):
+        """Führt die Kennwerte auf einen neuen Ausschnitt nach; None, wenn Neuberechnen günstiger ist."""
+        added = _rect_difference(rect, old_rect)
+        removed = _rect_difference(old_rect, rect)
+        if sum(_rect_area(part) for part in added + removed) >= _rect_area(rect):
+            return None
+        for part in added:  # Zuerst hinzufügen, damit gleiche Extremwerte mitgezählt werden
+            stats = _add_stats(stats, self._rect_stats(k, part))
+        for part in removed:
+            stats = _subtract_stats(stats, self._rect_stats(k, part))
+            if stats is None:
+                return None
+        return stats
+
+    def _rect_stats(self, k, rect):
+        i0, i1, j0, j1 = rect
+        return self._slice_stats(self.voxels[k, j0:j1 + 1, i0:i1 + 1])
+
+    def _slice_stats(self, plane):
+        """Kennwerte einer z-Schicht der ROI; nur die Schicht selbst wird zusammenhängend kopiert."""
+        values = np.asarray(plane, dtype=np.float64).reshape(-1)
+        low, high = self.edges[0], self.edges[-1]
+        bins = len(self.edges) - 1
+        inside = values[(values >= low) & (values <= high)]
+        indices = ((inside - low) * (bins / (high - low))).astype(np.int64)
+        np.clip(indices, 0, bins - 1, out=indices)
+        minimum, maximum = values.min(), values.max()
+        return _SliceStats(
+            values.size,
+            float(values.sum()),
+            float(np.dot(values, values)),
+            float(minimum),
+            int(np.count_nonzero(values == minimum)),
+            float(maximum),
+            int(np.count_nonzero(values == maximum)),
+            np.bincount(indices, minlength=bins),
+        )
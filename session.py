@@ -0,0 +1,160 @@
+# Standardbibliotheken
+import os
+import time
+from collections import OrderedDict
+
+# Drittanbieter-Bibliotheken
+from vtkmodules.vtkCommonExecutionModel import vtkTrivialProducer
+from vtkmodules.vtkRenderingCore import vtkVolume
+from vtkmodules.vtkRenderingVolumeOpenGL2 import vtkSmartVolumeMapper
+
+# Projektmodule
+from roi_stats import voxel_volume_view
+from transfer_functions import TransferFunctionLibrary
+
+# Speicherbudget für gleichzeitig geladene Studien (über THORAX_SESSION_BUDGET_MB änderbar)
+DEFAULT_SESSION_BUDGET = int(os.environ.get("THORAX_SESSION_BUDGET_MB", 4096)) * 1024 * 1024
+
+
+def image_data_bytes(image_data):
+    """Speicherbedarf eines vtkImageData-Objekts in Bytes."""
+    return image_data.GetActualMemorySize() * 1024 if image_data is not None else 0
+
+
+class Study:
+    """Ein geladenes Volumen mit Pipeline, Volumen-Actor und abgeleiteten Daten."""
+
+    def __init__(self, result):
+        self.filepath = result.filepath
+        self.name = os.path.basename(result.filepath)
+        self.image_data = result.image_data
+        self.histogram = result.histogram
+        self.scalar_range = result.scalar_range
+        self.pyramid = result.pyramid
+        self.bricked = result.bricked
+        self.preprocessing = result.preprocessing  # Schritte, mit denen image_data erzeugt wurde
+
+        # Voxel in voller Auflösung für Schnitte und ROI: Brick-Volumen oder View ohne Kopie.
+        # origin ist die Weltposition von voxels[0, 0, 0], extent beginnt immer bei 0.
+        if self.bricked is not None:
+            self.voxels = self.bricked
+            self.spacing = self.bricked.spacing
+            self.origin = self.bricked.origin
+        else:
+            self.voxels = voxel_volume_view(result.image_data)
+            self.spacing = result.image_data.GetSpacing()
+            start = result.image_data.GetExtent()[::2]
+            self.origin = tuple(result.image_data.GetOrigin()[axis] + start[axis] * self.spacing[axis]
+                                for axis in range(3))
+        nz, ny, nx = self.voxels.shape
+        self.extent = (0, nx - 1, 0, ny - 1, 0, nz - 1)
+        self.lod_controller = None  # Wird beim ersten Aktivieren angelegt
+        self.transfer_functions = TransferFunctionLibrary(result.histogram)  # Fenster einmalig pro Volumen
+        self.regions = None  # RegionMap der automatischen Regionserkennung (False nach Fehlschlag)
+        self.last_used = time.monotonic()
+
+        # Pipeline: vtkTrivialProducer speist image_data in Mapper und Schnitt-Widget ein
+        self.source = vtkTrivialProducer()
+        self.source.SetOutput(self.image_data)
+        volume_mapper = vtkSmartVolumeMapper()
+        volume_mapper.SetInputConnection(self.source.GetOutputPort())
+        self.volume = vtkVolume()
+        self.volume.SetMapper(volume_mapper)
+
+    def memory_usage(self):
+        """Speicherbedarf in Bytes, aufgeteilt in Volumen, Detailstufen, Histogramm und Regionen."""
+        pyramid = sum(image_data_bytes(level_data) for factor, level_data in self.pyramid or [] if factor != 1)
+        histogram = self.histogram.counts.nbytes + self.histogram.edges.nbytes if self.histogram else 0
+        regions = self.regions.nbytes if self.regions else 0
+        volume = image_data_bytes(self.image_data)
+        if self.bricked is not None:
+            volume += self.bricked.cache.current_bytes  # Zwischengespeicherte Bricks
+        return {"volume": volume, "pyramid": pyramid, "histogram": histogram, "regions": regions,
+                "total": volume + pyramid + histogram + regions}
+
+    def release(self):
+        """Gibt alle Verweise frei, damit Volumen, Pyramide und GPU-Ressourcen abgebaut werden können."""
+        if self.lod_controller is not None:
+            self.lod_controller.detach()
+            self.lod_controller = None
+        if self.volume is not None:
+            self.volume.GetMapper().RemoveAllInputConnections(0)
+            self.volume = None
+        self.source = None
+        self.voxels = None
+        if self.bricked is not None:
+            self.bricked.cache.clear()
+            self.bricked = None
+        self.pyramid = None
+        self.histogram = None
+        self.regions = None
+        self.image_data = None
+
+
+class SessionManager:
+    """Hält mehrere Studien gleichzeitig geladen und verdrängt die am längsten ungenutzten bei Überschreitung des Budgets."""
+
+    def __init__(self, max_bytes=DEFAULT_SESSION_BUDGET):
+        self.max_bytes = max_bytes
+        self._studies = OrderedDict()  # filepath -> Study, zuletzt genutzte am Ende
+
+    def __contains__(self, filepath):
+        return filepath in self._studies
+
+    def __len__(self):
+        return len(self._studies)
+
+    def studies(self):
+        """Alle Studien, die am längsten ungenutzte zuerst."""
+        return list(self._studies.values())
+
+    def get(self, filepath):
+        """Liefert eine geladene Studie und markiert sie als zuletzt genutzt."""
+        study = self._studies.get(filepath)
+        if study is not None:
+            self._studies.move_to_end(filepath)
+            study.last_used = time.monotonic()
+        return study
+
+    def peek(self, filepath):
+        """Liefert eine geladene Studie, ohne sie als zuletzt genutzt zu markieren."""
+        return self._studies.get(filepath)
+
+    def add(self, study):
+        """Nimmt eine Studie auf und liefert die dafür verdrängten Studien (noch nicht freigegeben)."""
+        previous = self._studies.pop(study.filepath, None)
+        self._studies[study.filepath] = study
+        evicted = [previous] if previous is not None and previous is not study else []
+        return evicted + self.evict(keep=study.filepath)
+
+    def remove(self, filepath):
+        return self._studies.pop(filepath, None)
+
+    def total_bytes(self):
+        return sum(study.memory_usage()["total"] for study in self._studies.values())
+
+    def evict(self, keep=None):
+        """Entfernt die am längsten ungenutzten Studien, bis das Budget eingehalten wird."""
+        evicted = []
+        total = self.total_bytes()
+        for filepath in list(self._studies):
+            if total <= self.max_bytes:
+                break
+            if filepath == keep:
+                continue
+            study = self._studies.pop(filepath)
+            total -= study.memory_usage()["total"]
+            evicted.append(study)
+        return evicted
+
+    def memory_report(self):
+        """Speicherbedarf pro Studie (zuletzt genutzte zuerst) und insgesamt."""
+        studies = [{"name": study.name, "filepath": study.filepath, **study.memory_usage()}
+                   for study in reversed(self._studies.values())]
+        return {"studies": studies, "total": sum(entry["total"] for entry in studies), "budget": self.max_bytes}
+
+    def clear(self):
+        """Entfernt alle Studien und gibt sie frei."""
+        for study in self._studies.values():
+            study.release()
+        self._studies.clear()
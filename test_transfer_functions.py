@@ -0,0 +1,45 @@
+# Drittanbieter-Bibliotheken
+import pytest
+
+# Projektmodule
+from transfer_functions import COLOR_MAPS, TransferFunction
+
+
+def _color_nodes(function):
+    nodes = []
+    for index in range(function.color_function.GetSize()):
+        node = [0.0] * 6
+        function.color_function.GetNodeValue(index, node)
+        nodes.append(tuple(node[:4]))
+    return nodes
+
+
+def _opacity_nodes(function):
+    nodes = []
+    for index in range(function.opacity_function.GetSize()):
+        node = [0.0] * 4
+        function.opacity_function.GetNodeValue(index, node)
+        nodes.append(tuple(node[:2]))
+    return nodes
+
+
+def _expected_color_nodes(color_map_name, lower, upper):
+    return [(lower + position * (upper - lower), *rgb) for position, rgb in COLOR_MAPS[color_map_name]]
+
+
+@pytest.mark.parametrize("color_map_name", list(COLOR_MAPS))
+@pytest.mark.parametrize("window", [(100.0, 110.0), (-100.0, -90.0), (5.0, 500.0)])
+def test_set_window_beyond_own_width(color_map_name, window):
+    """Verschiebt das Fenster weiter als seine Breite (nach rechts und links) und zurück."""
+    function = TransferFunction(color_map_name, (0.0, 10.0), opacity=0.8)
+    color_function, opacity_function = function.color_function, function.opacity_function
+
+    for lower, upper in (window, (0.0, 10.0)):
+        function.set_window(lower, upper)
+        assert function.window == (lower, upper)
+        assert _color_nodes(function) == pytest.approx(_expected_color_nodes(color_map_name, lower, upper))
+        assert _opacity_nodes(function) == pytest.approx([(lower, 0.0), (upper, 0.8)])
+
+    # Die zwischengespeicherten VTK-Objekte bleiben dieselben
+    assert function.color_function is color_function
+    assert function.opacity_function is opacity_function
@@ -0,0 +1,123 @@
+# Standardbibliotheken
+from collections import OrderedDict, namedtuple
+
+# Drittanbieter-Bibliotheken
+from vtkmodules.vtkCommonDataModel import vtkPiecewiseFunction
+from vtkmodules.vtkRenderingCore import vtkColorTransferFunction
+
+# Projektmodule
+from histogram import compute_histogram_counts, histogram_percentiles
+
+# Verfügbare Farbschemata (Reihenfolge entspricht dem Dropdown in der GUI)
+COLOR_MAP_NAMES = ["Standard", "Graustufen", "Heiß/Kalt"]
+
+# Farbverlauf je Schema als (relative Position im Fenster, RGB)
+COLOR_MAPS = {
+    "Standard": [(0.0, (0.0, 0.0, 0.0)), (1.0, (0.0, 1.0, 1.0))],
+    "Graustufen": [(0.0, (0.0, 0.0, 0.0)), (1.0, (1.0, 1.0, 1.0))],
+    "Heiß/Kalt": [(0.0, (0.0, 0.0, 0.0)), (1.0, (1.0, 0.5, 0.3))],
+}
+
+# Fenster in Hounsfield-Einheiten (Lage, Breite) und maximale Opazität. Liegt die Fensterlage
+# außerhalb des Datenbereichs (z. B. keine CT-Daten), wird das Fenster aus den Perzentilen bestimmt.
+WindowPreset = namedtuple("WindowPreset", ["level", "width", "opacity", "percentiles"])
+WINDOW_PRESETS = OrderedDict([
+    ("Gesamt", WindowPreset(None, None, 1.0, (1.0, 99.0))),
+    ("Lunge", WindowPreset(-600.0, 1500.0, 0.6, (1.0, 60.0))),
+    ("Mediastinum", WindowPreset(40.0, 400.0, 0.8, (40.0, 99.0))),
+    ("Knochen", WindowPreset(500.0, 2000.0, 1.0, (95.0, 99.9))),
+])
+WINDOW_PRESET_NAMES = list(WINDOW_PRESETS)
+DEFAULT_WINDOW_PRESET = "Gesamt"
+
+
+def compute_windows(histogram, presets=WINDOW_PRESETS):
+    """Berechnet die Fenster (untere, obere Grenze) aller Presets einmalig aus dem Histogramm."""
+    low, high = float(histogram.edges[0]), float(histogram.edges[-1])
+    percentiles = histogram_percentiles(
+        histogram, sorted({q for preset in presets.values() for q in preset.percentiles}))
+    windows = OrderedDict()
+    for name, preset in presets.items():
+        if preset.level is not None and low <= preset.level <= high:
+            lower, upper = preset.level - preset.width / 2, preset.level + preset.width / 2
+        else:
+            lower, upper = (percentiles[q] for q in preset.percentiles)
+            if not lower < upper:  # Leeres oder konstantes Volumen
+                lower, upper = low, max(high, low + 1.0)
+        windows[name] = (lower, upper)
+    return windows
+
+
+class TransferFunction:
+    """Farb- und Opazitätsfunktion eines Presets; Fensteränderungen verschieben nur die Stützstellen."""
+
+    def __init__(self, color_map_name, window, opacity=1.0):
+        self.color_map_name = color_map_name
+        self.opacity = opacity
+        self.color_function = vtkColorTransferFunction()
+        self.opacity_function = vtkPiecewiseFunction()
+        self.window = None
+        self.set_window(*window)
+
+    @property
+    def level(self):
+        return (self.window[0] + self.window[1]) / 2
+
+    @property
+    def width(self):
+        return self.window[1] - self.window[0]
+
+    def set_window(self, lower, upper):
+        """Setzt die Stützstellen neu, behält aber die VTK-Objekte (Mapper und Properties bleiben verbunden).
+
+        SetNodeValue ist hier ungeeignet: VTK sortiert die Stützstellen nach jedem Aufruf neu, sodass ein
+        Verschieben um mehr als die Fensterbreite die Funktion verfälscht.
+        """
+        upper = max(upper, lower + 1e-3)
+        if (lower, upper) == self.window:
+            return
+        self.window = (lower, upper)
+        self.color_function.RemoveAllPoints()
+        for position, rgb in COLOR_MAPS[self.color_map_name]:
+            self.color_function.AddRGBPoint(lower + position * (upper - lower), *rgb)
+        self.opacity_function.RemoveAllPoints()
+        self.opacity_function.AddPoint(lower, 0.0)  # Unter dem Fenster: vollständig transparent
+        self.opacity_function.AddPoint(upper, self.opacity)
+
+    def set_level_width(self, level, width):
+        self.set_window(level - width / 2, level + width / 2)
+
+    def apply(self, volume_property):
+        """Hängt die Funktionen an eine vtkVolumeProperty (nur wenn sie dort noch nicht hängen)."""
+        if volume_property.GetRGBTransferFunction() is not self.color_function:
+            volume_property.SetColor(self.color_function)
+        if volume_property.GetScalarOpacity() is not self.opacity_function:
+            volume_property.SetScalarOpacity(self.opacity_function)
+
+
+class TransferFunctionLibrary:
+    """Transferfunktionen eines Volumens: Fenster einmalig aus dem Histogramm, Funktionen je Preset und Farbschema zwischengespeichert."""
+
+    def __init__(self, histogram, presets=WINDOW_PRESETS):
+        self.presets = presets
+        self.windows = compute_windows(histogram, presets)
+        self._functions = {}
+
+    def get(self, preset_name, color_map_name):
+        """Liefert die zwischengespeicherten Funktionen; angelegt wird nur beim ersten Zugriff."""
+        key = (preset_name, color_map_name)
+        if key not in self._functions:
+            self._functions[key] = TransferFunction(
+                color_map_name, self.windows[preset_name], self.presets[preset_name].opacity)
+        return self._functions[key]
+
+    def reset(self, preset_name):
+        """Setzt das Fenster eines Presets in allen Farbschemata auf den berechneten Wert zurück."""
+        for (name, _), function in self._functions.items():
+            if name == preset_name:
+                function.set_window(*self.windows[preset_name])
+
+
+def create_transfer_function(voxels, color_map_name="Standard", preset_name=DEFAULT_WINDOW_PRESET):
+    """Transferfunktion für Skripte ohne gecachtes Histogramm (berechnet das Histogramm einmal)."""
+    return TransferFunctionLibrary(compute_histogram_counts(voxels)).get(preset_name, color_map_name)
@@ -0,0 +1,288 @@
+# Standardbibliotheken
+import hashlib
+import json
+import os
+
+# Drittanbieter-Bibliotheken
+import numpy as np
+from vtkmodules.util import numpy_support
+from vtkmodules.vtkCommonCore import vtkStringArray
+from vtkmodules.vtkCommonDataModel import vtkImageData
+
+# Projektmodule
+from histogram import Histogram
+from volume_io import load_vti_file
+
+# Cache-Verzeichnis (über THORAX_CACHE_DIR überschreibbar) und Größenlimit
+DEFAULT_CACHE_DIR = os.environ.get(
+    "THORAX_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "thorax_visualization"))
+DEFAULT_MAX_BYTES = 8 * 1024 ** 3
+
+# Dateiformat: Magic, JSON-Header und ab DATA_OFFSET die rohen, seitenweise ausgerichteten Voxel
+MAGIC = b"THXVOL1\n"
+DATA_OFFSET = 4096
+FILE_SUFFIX = ".vol"
+
+# Name des Feld-Arrays, in dem der Inhalts-Hash am vtkImageData hängt
+CONTENT_HASH_FIELD = "ContentHash"
+
+HASH_CHUNK_SIZE = 1 << 24
+
+
+def source_key(filepath):
+    """Bildet den Cache-Schlüssel einer Quelldatei aus Pfad, Größe und Änderungszeit."""
+    stat = os.stat(filepath)
+    identity = f"{os.path.abspath(filepath)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+
+def hash_array(array):
+    """Berechnet einen Inhalts-Hash über die rohen Bytes eines Arrays."""
+    flat = np.ascontiguousarray(array).reshape(-1).view(np.uint8)
+    digest = hashlib.blake2b(digest_size=16)
+    for start in range(0, flat.size, HASH_CHUNK_SIZE):
+        digest.update(flat[start:start + HASH_CHUNK_SIZE])
+    return digest.hexdigest()
+
+
+def get_content_hash(image_data):
+    """Liefert den Inhalts-Hash eines Volumens und berechnet ihn bei Bedarf einmalig."""
+    field = image_data.GetFieldData().GetAbstractArray(CONTENT_HASH_FIELD)
+    if field is not None:
+        return field.GetValue(0)
+    content_hash = hash_array(numpy_support.vtk_to_numpy(image_data.GetPointData().GetScalars()))
+    set_content_hash(image_data, content_hash)
+    return content_hash
+
+
+def set_content_hash(image_data, content_hash):
+    """Hängt den Inhalts-Hash als Feld-Array an das vtkImageData."""
+    field = vtkStringArray()
+    field.SetName(CONTENT_HASH_FIELD)
+    field.InsertNextValue(content_hash)
+    image_data.GetFieldData().AddArray(field)
+
+
+def _encode_header(metadata):
+    """Magic und JSON-Header, auf DATA_OFFSET aufgefüllt."""
+    header = MAGIC + json.dumps(metadata).encode("utf-8")
+    if len(header) > DATA_OFFSET:
+        raise ValueError("Cache-Header ist zu groß.")
+    return header.ljust(DATA_OFFSET, b"\0")
+
+
+def wrap_as_image_data(array, metadata):
+    """Verpackt ein (gemapptes) NumPy-Array ohne Kopie als vtkImageData."""
+    scalars = numpy_support.numpy_to_vtk(array, deep=False)  # hält eine Referenz auf das Array
+    scalars.SetName(metadata["name"])
+
+    image_data = vtkImageData()
+    image_data.SetExtent(metadata["extent"])
+    image_data.SetSpacing(metadata["spacing"])
+    image_data.SetOrigin(metadata["origin"])
+    image_data.GetPointData().SetScalars(scalars)
+    set_content_hash(image_data, metadata["content_hash"])
+    return image_data
+
+
+class VolumeCache:
+    """Festplatten-Cache, der Volumen als rohe Binärdateien ablegt und per Memory-Map lädt."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key + FILE_SUFFIX)
+
+    def read_metadata(self, key):
+        """Liest den Header eines Cache-Eintrags oder None, wenn er fehlt oder ungültig ist."""
+        try:
+            with open(self.path_for(key), "rb") as cache_file:
+                header = cache_file.read(DATA_OFFSET)
+        except OSError:
+            return None
+        if not header.startswith(MAGIC):
+            return None
+        try:
+            return json.loads(header[len(MAGIC):].rstrip(b"\0").decode("utf-8"))
+        except ValueError:
+            return None
+
+    def load(self, key):
+        """Lädt einen Eintrag als vtkImageData über eine Memory-Map (Seiten werden bei Bedarf eingelesen)."""
+        metadata = self.read_metadata(key)
+        if metadata is None:
+            return None
+        path = self.path_for(key)
+        if os.path.getsize(path) < DATA_OFFSET + metadata["nbytes"]:
+            return None  # Abgebrochener Schreibvorgang
+
+        # Copy-on-write, damit VTK einen beschreibbaren Puffer erhält, ohne die Datei zu verändern
+        array = np.memmap(path, dtype=np.dtype(metadata["dtype"]), mode="c",
+                          offset=DATA_OFFSET, shape=tuple(metadata["shape"]))
+        os.utime(path)  # Zugriffszeitpunkt für die LRU-Verdrängung
+        return wrap_as_image_data(array, metadata)
+
+    def store(self, key, image_data, source=None):
+        """Schreibt ein Volumen als Binärdatei in den Cache und verdrängt alte Einträge."""
+        scalars = image_data.GetPointData().GetScalars()
+        array = np.ascontiguousarray(numpy_support.vtk_to_numpy(scalars))
+        metadata = {
+            "extent": list(image_data.GetExtent()),
+            "spacing": list(image_data.GetSpacing()),
+            "origin": list(image_data.GetOrigin()),
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "nbytes": int(array.nbytes),
+            "name": scalars.GetName() or "scalars",
+            "content_hash": hash_array(array),
+            "source": source,
+        }
+        self._write(key, metadata, array)
+        set_content_hash(image_data, metadata["content_hash"])
+        self.evict(keep=(key,))
+        return metadata
+
+    def _write(self, key, metadata, array):
+        header = _encode_header(metadata)
+
+        # Erst in eine temporäre Datei schreiben, damit nie halbe Einträge sichtbar werden
+        temp_path = self._temp_path(key)
+        with open(temp_path, "wb") as cache_file:
+            cache_file.write(header)
+            array.tofile(cache_file)
+        os.replace(temp_path, self.path_for(key))
+
+    def _temp_path(self, key):
+        return f"{self.path_for(key)}.tmp-{os.getpid()}"
+
+    def allocate(self, key, shape, dtype):
+        """Legt einen Eintrag als temporäre Datei an und liefert ein beschreibbares Memory-Map-Array (z, y, x).
+
+        Das Array wird an Ort und Stelle befüllt, sodass das Volumen nie ein zweites Mal im Speicher liegt;
+        sichtbar wird der Eintrag erst mit commit(), verworfen mit discard().
+        """
+        return np.memmap(self._temp_path(key), dtype=np.dtype(dtype), mode="w+", offset=DATA_OFFSET, shape=tuple(shape))
+
+    def commit(self, key, array, spacing, origin, name="scalars", source=None):
+        """Schreibt den Header eines mit allocate() befüllten Eintrags, veröffentlicht ihn und lädt ihn."""
+        array.flush()
+        depth, rows, columns = array.shape
+        metadata = {
+            "extent": [0, columns - 1, 0, rows - 1, 0, depth - 1],
+            "spacing": list(spacing),
+            "origin": list(origin),
+            "dtype": array.dtype.str,
+            "shape": [int(array.size)],
+            "nbytes": int(array.nbytes),
+            "name": name,
+            "content_hash": hash_array(array),
+            "source": source,
+        }
+        temp_path = self._temp_path(key)
+        with open(temp_path, "r+b") as cache_file:
+            cache_file.write(_encode_header(metadata))
+        os.replace(temp_path, self.path_for(key))
+        self.evict(keep=(key,))
+        return self.load(key)
+
+    def discard(self, key):
+        """Löscht einen mit allocate() angelegten, nicht veröffentlichten Eintrag."""
+        try:
+            os.remove(self._temp_path(key))
+        except OSError:
+            pass
+
+    def load_histogram(self, key, bins):
+        """Lädt die zu einem Eintrag gespeicherten Histogramm-Häufigkeiten."""
+        try:
+            with np.load(self._histogram_path(key, bins)) as data:
+                return Histogram(data["counts"], data["edges"])
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def store_histogram(self, key, histogram):
+        """Speichert Histogramm-Häufigkeiten neben dem Volumen, damit sie nicht neu berechnet werden."""
+        path = self._histogram_path(key, len(histogram.counts))
+        temp_path = f"{path}.tmp-{os.getpid()}.npz"
+        np.savez(temp_path, counts=histogram.counts, edges=histogram.edges)
+        os.replace(temp_path, path)
+
+    def _histogram_path(self, key, bins):
+        return os.path.join(self.cache_dir, f"{key}.hist{bins}.npz")
+
+    def entries(self):
+        """Listet die Cache-Einträge als (Pfad, Größe, letzter Zugriff).
+
+        Ein Volumen zählt zusammen mit seinen Nebendateien (Histogramme, LOD-Stufen); die Dateien in den
+        Unterverzeichnissen (meshes/ der Isoflächen, regions/ der Regionserkennung) sind eigene Einträge.
+        """
+        groups = {}
+        for directory, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if ".tmp-" in name:
+                    continue  # Laufender Schreibvorgang
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if directory == self.cache_dir:
+                    path = self.path_for(name.split(".", 1)[0])
+                size, accessed = groups.get(path, (0, 0.0))
+                groups[path] = (size + stat.st_size, max(accessed, stat.st_mtime))
+        return [(path, size, accessed) for path, (size, accessed) in groups.items()]
+
+    def total_bytes(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=()):
+        """Löscht die am längsten nicht benutzten Einträge, bis das Größenlimit eingehalten wird."""
+        keep_paths = {self.path_for(key.split(".", 1)[0]) for key in keep}
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if path in keep_paths:
+                continue
+            if self._remove_entry(path):
+                total -= size
+
+    def _remove_entry(self, path):
+        """Löscht eine Cache-Datei; bei Volumen samt zugehöriger Nebendateien."""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # Nur noch Nebendateien übrig
+        except OSError:
+            return False  # z. B. unter Windows noch gemappt
+        if os.path.dirname(path) != self.cache_dir:
+            return True
+        prefix = os.path.basename(path)[:-len(FILE_SUFFIX)] + "."
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(prefix):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+        return True
+
+
+def load_cached_vti(filepath, cache, progress_callback=None, abort_callback=None):
+    """Lädt eine .vti Datei aus dem Cache oder konvertiert sie beim ersten Zugriff."""
+    key = source_key(filepath)
+    image_data = cache.load(key)
+    if image_data is not None:
+        if progress_callback is not None:
+            progress_callback(1.0)
+        return image_data
+
+    image_data = load_vti_file(filepath, progress_callback, abort_callback)
+    if abort_callback is not None and abort_callback():
+        return image_data
+    if image_data is not None and image_data.GetPointData().GetScalars() is not None:
+        cache.store(key, image_data, source=os.path.abspath(filepath))
+    return image_data
@@ -0,0 +1,30 @@
+# Drittanbieter-Bibliotheken
+from vtkmodules.numpy_interface import dataset_adapter as dsa  # type: ignore
+from vtkmodules.vtkCommonCore import vtkCommand
+from vtkmodules.vtkIOXML import vtkXMLImageDataReader
+
+
+# Funktion zum Laden der .vti Datei
+def load_vti_file(filepath, progress_callback=None, abort_callback=None):
+    """Lädt die .vti Datei mit den medizinischen Bilddaten."""
+    reader = vtkXMLImageDataReader()
+    reader.SetFileName(filepath)
+
+    if progress_callback is not None or abort_callback is not None:
+        def on_progress(obj, event):
+            if progress_callback is not None:
+                progress_callback(obj.GetProgress())
+            if abort_callback is not None and abort_callback():
+                obj.SetAbortExecute(1)  # Reader bricht beim nächsten Block ab
+        reader.AddObserver(vtkCommand.ProgressEvent, on_progress)
+
+    reader.Update()
+    return reader.GetOutput()
+
+
+# Funktion, um die Voxel-Daten in ein NumPy-Array zu konvertieren
+def extract_voxel_data(image_data):
+    """Extrahiert die Voxel-Daten als NumPy-Array."""
+    point_data = image_data.GetPointData().GetScalars()
+    np_array = dsa.WrapDataObject(image_data).PointData[point_data.GetName()]
+    return np_array